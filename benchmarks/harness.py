@@ -0,0 +1,313 @@
+"""
+Benchmark harness sweeping payload sizes, task durations, workers, clients and transports.
+
+Examples:
+    python -m benchmarks.harness --output results.json
+    python -m benchmarks.harness --payload-sizes 4,65536 --workers 1,4 --baseline results.json
+"""
+
+import argparse
+import itertools
+import json
+import multiprocessing
+import sys
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, wait
+from math import ceil
+from typing import Optional
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None  # type: ignore[assignment]
+
+from rte import Server, GrpcServer, RemoteServer, Worker, BatchClient, Result
+from rte.server import WorkerInterface
+
+PORT = 50061
+READY_TIMEOUT = 30.0  # Seconds for all workers to connect
+_SPAWN = multiprocessing.get_context("spawn")  # Forking a process that uses gRPC is unsafe
+
+
+class SleepingWorker(Worker):
+    "Returns every task unchanged after sleeping 'duration' seconds."
+
+    def __init__(self, server: WorkerInterface, refresh_time: float, duration: float) -> None:
+        super().__init__(server, refresh_time)
+        self._duration = duration
+
+    def execute_task(self, task: bytes) -> bytes:
+        if self._duration:
+            time.sleep(self._duration)
+        return task
+
+    def on_cancel(self) -> None:
+        pass
+
+
+class LatencyClient(BatchClient):
+    "Records the time from submission to collection of every task."
+
+    def __init__(self, server, refresh_time: float) -> None:
+        super().__init__(server, refresh_time, timed=True)
+        self.latencies: list[float] = []
+
+    def on_result(self, result: Result) -> None:
+        ts = result.timestamps
+        if ts is not None and ts.submitted is not None and ts.collected is not None:
+            self.latencies.append(ts.collected - ts.submitted)
+        super().on_result(result)
+
+
+def _run_remote_worker(target: str, duration: float) -> None:
+    SleepingWorker(RemoteServer(target), 1, duration).run()
+
+
+def _echo(task: bytes, duration: float) -> bytes:
+    if duration:
+        time.sleep(duration)
+    return task
+
+
+def _percentile(values: list[float], q: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, max(0, ceil(q * len(values)) - 1))]
+
+
+def _usage() -> tuple[float, Optional[float]]:
+    """
+    Returns the CPU seconds of this process and its children, and their peak RSS in MiB.
+    The peak is over the lifetime of the process, so 'run' needs a fresh process per configuration.
+    """
+    if resource is None:
+        return time.process_time(), None
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    cpu = own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+    scale = 1 if sys.platform == "darwin" else 1024  # ru_maxrss is in bytes on macOS
+    return cpu, max(own.ru_maxrss, children.ru_maxrss) * scale / 2**20
+
+
+def _wait_until_ready(server: Server, workers: list) -> None:
+    "Waits until all workers wait for tasks, and raises RuntimeError if they do not."
+    deadline = time.monotonic() + READY_TIMEOUT
+    while server.stats()["rte_waiting_workers"] < len(workers):
+        dead = sum(not worker.is_alive() for worker in workers)
+        if dead or time.monotonic() > deadline:
+            ready = server.stats()["rte_waiting_workers"]
+            raise RuntimeError(
+                f"Only {ready} of {len(workers)} workers became ready, {dead} exited"
+            )
+        time.sleep(0.01)
+
+
+def _run_rte(config: dict, tasks: list[bytes]) -> tuple[list[float], float]:
+    "Solves the tasks with rte and returns the latency of every task and the total time."
+    server = Server(task_timeout=10)
+    grpc_server = None
+    if config["transport"] == "grpc":
+        grpc_server = GrpcServer(server, PORT)
+        grpc_server.start()
+
+    def connect():
+        return server if grpc_server is None else RemoteServer(f"localhost:{PORT}")
+
+    workers: list = []
+    for _ in range(config["workers"]):
+        if config["worker_mode"] == "process":
+            args = (f"localhost:{PORT}", config["duration"])
+            workers.append(_SPAWN.Process(target=_run_remote_worker, args=args))
+        else:
+            worker = SleepingWorker(connect(), 1, config["duration"])
+            # Daemon threads, so a worker stuck before connecting does not keep the process alive
+            workers.append(threading.Thread(target=worker.run, daemon=True))
+    for worker in workers:
+        worker.start()
+    try:
+        _wait_until_ready(server, workers)
+    except RuntimeError:
+        server.release_waiting_workers()
+        for worker in workers:
+            if isinstance(worker, multiprocessing.process.BaseProcess):
+                worker.terminate()
+        server.stop()
+        if grpc_server is not None:
+            grpc_server.stop(0)
+        raise
+
+    latencies: list[float] = []
+    lock = threading.Lock()
+
+    def solve(share: list[bytes]) -> None:
+        client = LatencyClient(connect(), refresh_time=0.001)
+        client.solve(share)
+        with lock:
+            latencies.extend(client.latencies)
+
+    clients = [
+        threading.Thread(target=solve, args=(tasks[i :: config["clients"]],))
+        for i in range(config["clients"])
+    ]
+    start = time.perf_counter()
+    for client in clients:
+        client.start()
+    for client in clients:
+        client.join()
+    elapsed = time.perf_counter() - start
+
+    server.release_waiting_workers()
+    for worker in workers:
+        worker.join()
+    server.stop()
+    if grpc_server is not None:
+        grpc_server.stop(0)
+    return latencies, elapsed
+
+
+def _run_process_pool(config: dict, tasks: list[bytes]) -> tuple[list[float], float]:
+    "Runs the tasks on a ProcessPoolExecutor for reference, like '_run_rte'."
+    latencies: list[float] = []
+    with ProcessPoolExecutor(config["workers"], mp_context=_SPAWN) as executor:
+        list(executor.map(_echo, [b""] * config["workers"], [0.0] * config["workers"]))  # Warm up
+        futures = []
+        start = time.perf_counter()
+        for task in tasks:
+            submitted = time.monotonic()
+            future = executor.submit(_echo, task, config["duration"])
+            future.add_done_callback(
+                lambda _, submitted=submitted: latencies.append(time.monotonic() - submitted)
+            )
+            futures.append(future)
+        wait(futures)
+        elapsed = time.perf_counter() - start
+    return latencies, elapsed
+
+
+def run(config: dict, num_tasks: int) -> dict:
+    """
+    Runs one configuration and returns its measurements.
+    Throughput excludes starting the workers; CPU time includes it.
+    """
+    tasks = [bytes(config["payload_size"]) for _ in range(num_tasks)]
+    cpu_before, _ = _usage()
+    if config["transport"] == "process_pool":
+        latencies, elapsed = _run_process_pool(config, tasks)
+    else:
+        latencies, elapsed = _run_rte(config, tasks)
+    cpu_after, peak_rss = _usage()
+    return {
+        "config": config,
+        "throughput": num_tasks / elapsed,
+        "latency_p50": _percentile(latencies, 0.5),
+        "latency_p99": _percentile(latencies, 0.99),
+        "cpu_seconds": cpu_after - cpu_before,
+        "peak_rss_mib": peak_rss,
+    }
+
+
+def run_isolated(config: dict, num_tasks: int) -> dict:
+    "Runs one configuration in a new process, so its peak RSS is its own."
+    with ProcessPoolExecutor(1, mp_context=_SPAWN) as executor:
+        return executor.submit(run, config, num_tasks).result()
+
+
+def configs(args: argparse.Namespace) -> list[dict]:
+    "Returns the configurations to run, skipping combinations that are not possible."
+    result = []
+    for payload_size, duration, workers, worker_mode, clients, transport in itertools.product(
+        args.payload_sizes,
+        args.durations,
+        args.workers,
+        args.worker_modes,
+        args.clients,
+        args.transports,
+    ):
+        if transport == "local" and worker_mode == "process":
+            continue  # A local server cannot be shared with other processes
+        if transport == "process_pool" and (worker_mode == "thread" or clients > 1):
+            continue  # The reference always uses processes and a single submitter
+        result.append(
+            {
+                "payload_size": payload_size,
+                "duration": duration,
+                "workers": workers,
+                "worker_mode": worker_mode,
+                "clients": clients,
+                "transport": transport,
+            }
+        )
+    return result
+
+
+def _key(config: dict) -> str:
+    return json.dumps(config, sort_keys=True)
+
+
+def compare(results: list[dict], baseline: list[dict], tolerance: float) -> bool:
+    """
+    Prints the change of every result against the baseline.
+    Returns False if any throughput dropped or p99 latency grew by more than 'tolerance'.
+    """
+    previous = {_key(r["config"]): r for r in baseline}
+    ok = True
+    for result in results:
+        old = previous.get(_key(result["config"]))
+        if old is None:
+            continue
+        throughput = result["throughput"] / old["throughput"] - 1
+        latency = result["latency_p99"] / max(old["latency_p99"], 1e-9) - 1
+        regressed = throughput < -tolerance or latency > tolerance
+        ok = ok and not regressed
+        print(
+            f"{'REGRESSION ' if regressed else ''}{_key(result['config'])}: "
+            f"throughput {throughput:+.1%}, p99 latency {latency:+.1%}"
+        )
+    return ok
+
+
+def _list(convert):
+    return lambda text: [convert(item) for item in text.split(",")]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--tasks", type=int, default=200, help="Tasks per configuration.")
+    parser.add_argument("--payload-sizes", type=_list(int), default=[4, 1024, 1 << 20])
+    parser.add_argument("--durations", type=_list(float), default=[0.0, 0.001])
+    parser.add_argument("--workers", type=_list(int), default=[1, 4])
+    parser.add_argument("--worker-modes", type=_list(str), default=["thread", "process"])
+    parser.add_argument("--clients", type=_list(int), default=[1, 4])
+    parser.add_argument(
+        "--transports", type=_list(str), default=["local", "grpc", "process_pool"]
+    )
+    parser.add_argument("--output", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare the results to this JSON file.")
+    parser.add_argument(
+        "--tolerance", type=float, default=0.1, help="Allowed relative regression."
+    )
+    args = parser.parse_args()
+
+    results = []
+    for config in configs(args):
+        result = run_isolated(config, args.tasks)
+        results.append(result)
+        rss = result["peak_rss_mib"]
+        print(
+            f"{_key(config)}: {result['throughput']:.0f} tasks/s, "
+            f"p50 {result['latency_p50'] * 1e3:.2f} ms, p99 {result['latency_p99'] * 1e3:.2f} ms, "
+            f"{result['cpu_seconds']:.2f} CPU s"
+            + ("" if rss is None else f", {rss:.0f} MiB peak RSS")
+        )
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(results, file, indent=2)
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as file:
+            baseline = json.load(file)
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
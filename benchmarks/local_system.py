@@ -17,10 +17,10 @@ def work(server):
     worker.run()
 
 
-def throuput(thread_count: int) -> float:
+def throuput(thread_count: int, queue_ahead: int = 0, chunksize=None) -> float:
     num_tasks = 1000
     tasks = [i.to_bytes(4) for i in range(num_tasks)]
-    server = Server(task_timeout=10)
+    server = Server(task_timeout=10, queue_ahead=queue_ahead)
 
     threads = []
     for _ in range(thread_count):
@@ -30,7 +30,10 @@ def throuput(thread_count: int) -> float:
 
     client = BatchClient(server, refresh_time=0.001)
     start = time.perf_counter()
-    client.solve(tasks)
+    if chunksize is None:
+        client.solve(tasks)
+    else:
+        client.map(tasks, chunksize)
     end = time.perf_counter()
 
     server.release_waiting_workers()
@@ -45,3 +48,7 @@ def throuput(thread_count: int) -> float:
 if __name__ == "__main__":
     for i in range(1, multiprocessing.cpu_count() + 1):
         print(f"Throuput with {i} threads: {throuput(i)}")
+    for queue_ahead in [0, 1, 4, 16, 64]:
+        print(f"Throuput with queue ahead {queue_ahead}: {throuput(1, queue_ahead)}")
+    for chunksize in [1, 16, "auto"]:
+        print(f"Throuput with chunksize {chunksize}: {throuput(1, chunksize=chunksize)}")
@@ -0,0 +1,67 @@
+"""
+Benchmark of the resident memory per task queued on a server, with and without the arena.
+
+Examples:
+    python -m benchmarks.memory
+    python -m benchmarks.memory --tasks 10000000 --payload-sizes 8
+"""
+
+import argparse
+import gc
+import multiprocessing
+import os
+import resource
+from concurrent.futures import ProcessPoolExecutor
+
+from rte import Server, Task
+
+_SPAWN = multiprocessing.get_context("spawn")
+
+
+def _rss() -> int:
+    "Returns the resident memory of this process in bytes."
+    try:
+        with open("/proc/self/statm", encoding="utf-8") as file:
+            return int(file.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except FileNotFoundError:  # Not Linux, so only the peak is known
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(tasks: int, payload_size: int, arena: bool) -> float:
+    "Queues the tasks on a new server and returns the growth of the RSS per task in bytes."
+    server = Server(task_timeout=1e6, arena=arena)
+    session = "0" * 32  # Like the UUID of a client
+    try:
+        gc.collect()
+        before = _rss()
+        for task_id in range(tasks):
+            server.add_task(Task(task_id, os.urandom(payload_size), session=session))
+        gc.collect()
+        return (_rss() - before) / tasks
+    finally:
+        server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--tasks", type=int, default=1_000_000, help="Tasks queued per run.")
+    parser.add_argument(
+        "--payload-sizes",
+        type=lambda text: [int(item) for item in text.split(",")],
+        default=[8, 256],
+    )
+    args = parser.parse_args()
+
+    for payload_size in args.payload_sizes:
+        for arena in (False, True):
+            # A fresh process per run, so memory freed by earlier runs does not hide growth
+            with ProcessPoolExecutor(1, mp_context=_SPAWN) as executor:
+                per_task = executor.submit(measure, args.tasks, payload_size, arena).result()
+            print(
+                f"payload_size={payload_size}, arena={arena}: {per_task:.0f} bytes per queued "
+                f"task, {per_task / max(payload_size, 1):.1f}x the payload"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+import statistics
+import threading
+import time
+from rte import Server, Worker, BatchClient, Registry
+
+
+class TrivialWorker(Worker):
+    def execute_task(self, task: bytes) -> bytes:
+        return task
+
+    def on_cancel(self) -> None:
+        pass
+
+
+def throuput(enabled: bool, num_tasks: int = 5000) -> float:
+    tasks = [i.to_bytes(4, "big") for i in range(num_tasks)]
+    server = Server(task_timeout=10, queue_ahead=16, metrics=Registry(enabled))
+    worker = TrivialWorker(server, refresh_time=1, metrics=Registry(enabled))
+    thread = threading.Thread(target=worker.run)
+    thread.start()
+
+    client = BatchClient(server, refresh_time=0.001, metrics=Registry(enabled))
+    start = time.perf_counter()
+    client.solve(tasks)
+    end = time.perf_counter()
+
+    server.release_waiting_workers()
+    server.stop()
+    thread.join()
+    return num_tasks / (end - start)
+
+
+if __name__ == "__main__":
+    # Alternate the runs and take the median ratio, to reduce noise.
+    ratios = []
+    for _ in range(11):
+        with_metrics = throuput(True)
+        without_metrics = throuput(False)
+        ratios.append(with_metrics / without_metrics)
+        print(f"Throuput with metrics: {with_metrics:.0f}, without metrics: {without_metrics:.0f}")
+    print(f"Overhead: {100 * (1 - statistics.median(ratios)):.1f}%")
@@ -0,0 +1,320 @@
+"""
+Microbenchmarks of the per-operation cost of the server's data structures under contention.
+
+Every benchmark is repeated until it ran for a minimum time, and its median is reported.
+Every run is appended to a history file, and compared against the median of the previous runs
+on the same machine and Python build, so regressions in these hot paths are caught.
+Run it on a free-threaded build to see how the server scales with threads and shards
+without the GIL.
+
+Examples:
+    python -m benchmarks.micro
+    python -m benchmarks.micro --hearts 1000,10000 --threads 1,8 --check
+    python -m benchmarks.micro --threads 1 --shards 1 --hearts 1000 --results 10000
+    python -m benchmarks.micro --threads 1 --shards 1 --hearts 1000 --array-sizes 1048576
+"""
+
+import argparse
+import json
+import pickle
+import platform
+import statistics
+import subprocess
+import sys
+import threading
+import time
+from typing import Callable
+
+from rte import Server, Task, Result
+from rte.codecs import Codec, MsgpackCodec, NumpyCodec, PickleCodec, RawCodec, msgpack, numpy
+from rte.grpc_server import results_from_proto, results_to_proto
+from rte.heartbeat import MultiHeartbeatMonitor
+from rte.rte_pb2 import ResultBatch
+from rte.id_generator import IdGenerator
+
+HISTORY = "benchmarks/micro_history.jsonl"
+HISTORY_VERSION = 2  # Version 1 entries have no "version" and may lack "machine"
+MIN_REPEATS = 5
+MIN_SECONDS = 1.0  # Benchmarks are repeated until they ran at least this long in total
+MIN_HISTORY = 3  # Previous runs needed before a regression is reported
+CODEC_REPEATS = 10  # Encodings and decodings per codec benchmark
+
+
+def _contended(threads: int, body: Callable[[int], None]) -> float:
+    "Runs 'body(thread_index)' on all threads at once and returns the wall time in seconds."
+    barrier = threading.Barrier(threads + 1)
+
+    def run(index: int) -> None:
+        barrier.wait()
+        body(index)
+        barrier.wait()
+
+    workers = [threading.Thread(target=run, args=(i,)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    barrier.wait()
+    elapsed = time.perf_counter() - start
+    for worker in workers:
+        worker.join()
+    return elapsed
+
+
+def bench_id_generator(threads: int, ops: int) -> dict[str, float]:
+    generator = IdGenerator()
+    per_thread = ops // threads
+
+    def body(_: int) -> None:
+        for _ in range(per_thread):
+            generator()
+
+    return {"IdGenerator.__call__": _contended(threads, body) / (per_thread * threads)}
+
+
+def bench_heartbeats(hearts: int) -> dict[str, float]:
+    monitor = MultiHeartbeatMonitor(threshold=1e6)  # Never checks on its own
+    try:
+        timings = {}
+        start = time.perf_counter()
+        for heart_id in range(hearts):
+            monitor.add(heart_id)
+        timings["add"] = time.perf_counter() - start
+        start = time.perf_counter()
+        for heart_id in range(hearts):
+            monitor.beat(heart_id)
+        timings["beat"] = time.perf_counter() - start
+        start = time.perf_counter()
+        monitor._check()  # pylint: disable=protected-access
+        timings["_check_heartbeats"] = time.perf_counter() - start
+        start = time.perf_counter()
+        for heart_id in range(hearts):
+            monitor.remove(heart_id)
+        timings["remove"] = time.perf_counter() - start
+    finally:
+        monitor.stop()
+        monitor.join()
+    # Checking scans all hearts, so its cost is reported per heart as well
+    return {f"MultiHeartbeatMonitor.{name}": t / hearts for name, t in timings.items()}
+
+
+def bench_server(threads: int, ops: int, shards: int) -> dict[str, float]:
+    "Each thread adds, gets, finishes and collects its share of the tasks in lockstep phases."
+    server = Server(task_timeout=1e6, shards=shards)
+    per_thread = ops // threads
+    task_ids = [list(range(i * per_thread, (i + 1) * per_thread)) for i in range(threads)]
+    dispatched: list[list[int]] = [[] for _ in range(threads)]
+
+    def add_task(index: int) -> None:
+        for task_id in task_ids[index]:
+            server.add_task(Task(task_id, b"task"))
+
+    def get_task(index: int) -> None:
+        for _ in range(per_thread):
+            task = server.get_task()
+            if task is not None:
+                dispatched[index].append(task.id)
+
+    def set_result(index: int) -> None:
+        for task_id in dispatched[index]:
+            server.set_result(Result(task_id, True, b"result"))
+
+    def get_results(index: int) -> None:
+        for task_id in task_ids[index]:
+            server.get_results([task_id])
+
+    timings = {}
+    try:
+        for body in (add_task, get_task, set_result, get_results):
+            timings[f"Server.{body.__name__}"] = _contended(threads, body) / (per_thread * threads)
+    finally:
+        server.stop()
+    return timings
+
+
+def bench_result_batch(results: int) -> dict[str, float]:
+    "Encodes and decodes the results of a poll of which every other task is done."
+    batch = [Result(i, True, bytes(64)) if i % 2 == 0 else None for i in range(results)]
+    timings = {}
+    start = time.perf_counter()
+    wire = results_to_proto(batch).SerializeToString()
+    timings["results_to_proto"] = time.perf_counter() - start
+    start = time.perf_counter()
+    results_from_proto(ResultBatch.FromString(wire))
+    timings["results_from_proto"] = time.perf_counter() - start
+    start = time.perf_counter()
+    results_from_proto(ResultBatch.FromString(wire), zero_copy=True)
+    timings["results_from_proto(zero_copy)"] = time.perf_counter() - start
+    # Reported per polled task, including those without a result
+    return {name: t / results for name, t in timings.items()}
+
+
+class _InBandPickle(Codec):
+    "What users hand-roll without a codec, for reference: buffers are copied into the stream."
+
+    def encode(self, obj) -> bytes:
+        return pickle.dumps(obj)
+
+    def decode(self, data: bytes):
+        return pickle.loads(data)
+
+
+def bench_codecs(size: int) -> dict[str, float]:
+    "Encodes and decodes a payload of 'size' bytes with every codec whose package is installed."
+    payload = bytes(size)
+    codecs: list[tuple[str, Codec, object]] = [("RawCodec", RawCodec(), payload)]
+    if msgpack is not None:
+        codecs.append(("MsgpackCodec", MsgpackCodec(), {"data": payload}))
+    if numpy is not None:
+        array = numpy.zeros(size // 8)
+        codecs.append(("pickle", _InBandPickle(), array))
+        codecs.append(("PickleCodec", PickleCodec(), array))
+        codecs.append(("NumpyCodec", NumpyCodec(), array))
+    timings = {}
+    for name, codec, obj in codecs:
+        # Repeated, so buffers are reused rather than fresh pages faulted in every time
+        start = time.perf_counter()
+        for _ in range(CODEC_REPEATS):
+            data = codec.encode(obj)
+        timings[f"{name}.encode"] = (time.perf_counter() - start) / CODEC_REPEATS
+        start = time.perf_counter()
+        for _ in range(CODEC_REPEATS):
+            codec.decode(data)
+        timings[f"{name}.decode"] = (time.perf_counter() - start) / CODEC_REPEATS
+    return timings
+
+
+def run(args: argparse.Namespace) -> dict[str, float]:
+    "Returns the median seconds per operation of every benchmark."
+    benchmarks: list[tuple[str, Callable[[], dict[str, float]]]] = []
+    for threads in args.threads:
+        benchmarks.append((f"threads={threads}", lambda t=threads: bench_id_generator(t, args.ops)))
+        for shards in args.shards:
+            benchmarks.append(
+                (
+                    f"threads={threads}, shards={shards}",
+                    lambda t=threads, s=shards: bench_server(t, args.ops, s),
+                )
+            )
+    for hearts in args.hearts:
+        benchmarks.append((f"hearts={hearts}", lambda h=hearts: bench_heartbeats(h)))
+    for results in args.results:
+        benchmarks.append((f"results={results}", lambda r=results: bench_result_batch(r)))
+    for size in args.array_sizes:
+        benchmarks.append((f"bytes={size}", lambda s=size: bench_codecs(s)))
+
+    results = {}
+    for suffix, bench in benchmarks:
+        samples: dict[str, list[float]] = {}
+        repeats = 0
+        start = time.perf_counter()
+        while repeats < MIN_REPEATS or time.perf_counter() - start < MIN_SECONDS:
+            for name, seconds in bench().items():
+                samples.setdefault(name, []).append(seconds)
+            repeats += 1
+        for name, values in samples.items():
+            results[f"{name} [{suffix}]"] = statistics.median(values)
+            print(f"{name} [{suffix}]: {statistics.median(values) * 1e9:.0f} ns/op")
+    return results
+
+
+def _commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return ""
+
+
+def _load_history(path: str) -> list[dict]:
+    try:
+        with open(path, encoding="utf-8") as file:
+            return [json.loads(line) for line in file if line.strip()]
+    except FileNotFoundError:
+        return []
+
+
+def regressions(results: dict[str, float], history: list[dict], tolerance: float) -> list[str]:
+    """
+    Returns the benchmarks slower than the median of the history by more than 'tolerance'.
+    Benchmarks with fewer than MIN_HISTORY previous runs are not compared.
+    """
+    slower = []
+    for name, seconds in results.items():
+        previous = [run["results"][name] for run in history if name in run["results"]]
+        if len(previous) < MIN_HISTORY:
+            continue
+        if seconds > statistics.median(previous) * (1 + tolerance):
+            change = seconds / statistics.median(previous) - 1
+            slower.append(f"{name}: {change:+.0%} against the median of {len(previous)} runs")
+    return slower
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0].strip())
+    parser.add_argument("--ops", type=int, default=64_000, help="Operations per benchmark.")
+    parser.add_argument(
+        "--threads",
+        type=lambda text: [int(item) for item in text.split(",")],
+        default=[1, 4, 16, 64],
+    )
+    parser.add_argument(
+        "--shards",
+        type=lambda text: [int(item) for item in text.split(",")],
+        default=[1, 16],
+        help="Numbers of server shards to compare.",
+    )
+    parser.add_argument(
+        "--hearts",
+        type=lambda text: [int(item) for item in text.split(",")],
+        default=[1_000, 10_000, 100_000, 1_000_000],
+    )
+    parser.add_argument(
+        "--results",
+        type=lambda text: [int(item) for item in text.split(",")],
+        default=[10_000],
+        help="Numbers of polled tasks per get_results message.",
+    )
+    parser.add_argument(
+        "--array-sizes",
+        type=lambda text: [int(item) for item in text.split(",")],
+        default=[1024, 1 << 20],
+        help="Sizes in bytes of the payloads encoded and decoded by the codecs.",
+    )
+    parser.add_argument("--history", default=HISTORY, help="JSON lines file of previous runs.")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown.")
+    parser.add_argument("--check", action="store_true", help="Exit non-zero on a regression.")
+    parser.add_argument("--no-save", action="store_true", help="Do not append to the history.")
+    args = parser.parse_args()
+
+    results = run(args)
+    python = f"{platform.python_implementation()} {platform.python_version()}"
+    if not getattr(sys, "_is_gil_enabled", lambda: True)():
+        python += " free-threaded"
+    machine = platform.node()
+    history = [
+        entry
+        for entry in _load_history(args.history)
+        if entry.get("python") == python and entry.get("machine") == machine
+    ]
+    slower = regressions(results, history, args.tolerance)
+    for line in slower:
+        print(f"REGRESSION {line}")
+    if not args.no_save:
+        entry = {
+            "version": HISTORY_VERSION,
+            "time": time.time(),
+            "commit": _commit(),
+            "python": python,
+            "machine": machine,
+            "results": results,
+        }
+        with open(args.history, "a", encoding="utf-8") as file:
+            file.write(json.dumps(entry) + "\n")
+    if args.check and slower:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
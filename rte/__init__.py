@@ -1,13 +1,17 @@
-from .entities import Task, Result
+from .entities import Task, Result, Timestamps
 from .server import Server, ServerInterface, ClientInterface, WorkerInterface
 from .grpc_server import GrpcServer
 from .remote_server import RemoteServer
 from .client import Client, BatchClient
 from .worker import Worker
+from .executor import RteExecutor, TaskFailedError
+from .metrics import Registry, MetricsServer
+from .tracing import Tracer
 
 __all__ = [
     "Task",
     "Result",
+    "Timestamps",
     "Server",
     "ServerInterface",
     "ClientInterface",
@@ -17,4 +21,9 @@ __all__ = [
     "Client",
     "BatchClient",
     "Worker",
+    "RteExecutor",
+    "TaskFailedError",
+    "Registry",
+    "MetricsServer",
+    "Tracer",
 ]
@@ -0,0 +1,168 @@
+from array import array
+from dataclasses import MISSING, fields, replace
+from typing import Optional
+from .entities import Task
+
+_COLUMNS = ("id", "data", "session")  # Fields stored in the arena's columns
+# Other fields and their defaults. Tasks that differ from them keep a template of their fields.
+_DEFAULTS = [
+    (f.name, f.default_factory() if f.default is MISSING else f.default)  # type: ignore[misc]
+    for f in fields(Task)
+    if f.name not in _COLUMNS
+]
+
+
+def _is_plain(task: Task) -> bool:
+    return all(getattr(task, name) == default for name, default in _DEFAULTS)
+
+
+class TaskArena:
+    """
+    Queue of tasks stored in columns, first in first out: IDs and times in arrays and the data
+    of all tasks in one bytearray, instead of an object per task. A task is only created again
+    when it leaves the arena. Not thread-safe.
+    """
+
+    COMPACT_AFTER = 4096  # Tasks that left the front before the columns are shifted
+    SEARCH_LIMIT = 32  # IDs removed at once that are searched one by one, not in one pass
+
+    def __init__(self) -> None:
+        self._ids = array("I")
+        self._queued_at = array("d")
+        self._ends = array("Q")  # End of every task's data, counting from the first byte ever
+        self._sessions = array("i")  # Index into _session_names, -1 for none
+        self._session_names: list[str] = []
+        self._session_indices: dict[str, int] = {}
+        self._data = bytearray()
+        self._base = 0  # Bytes removed from the front of _data
+        self._start = 0  # Start of the data of the first task, counted like _ends
+        self._head = 0  # Column index of the first task
+        self._offset = 0  # Tasks removed from the front of the columns
+        self._templates: dict[int, Task] = {}  # Position -> fields of a task that is not plain
+        self._removed: set[int] = set()  # Positions of removed tasks that 'popleft' skips
+
+    def __len__(self) -> int:
+        return len(self._ids) - self._head - len(self._removed)
+
+    @property
+    def nbytes(self) -> int:
+        "Memory taken by the columns, without the templates."
+        columns = (self._ids, self._queued_at, self._ends, self._sessions)
+        return sum(column.buffer_info()[1] * column.itemsize for column in columns) + len(
+            self._data
+        )
+
+    def append(self, task: Task, queued_at: float) -> None:
+        "Adds a task at the end, with the time it was queued."
+        if not _is_plain(task):
+            self._templates[self._offset + len(self._ids)] = replace(task, data=b"")
+        self._ids.append(task.id)
+        self._queued_at.append(queued_at)
+        self._data += task.data
+        self._ends.append(self._base + len(self._data))
+        self._sessions.append(self._session_index(task.session))
+
+    def _session_index(self, session: Optional[str]) -> int:
+        if session is None:
+            return -1
+        index = self._session_indices.get(session)
+        if index is None:
+            index = self._session_indices[session] = len(self._session_names)
+            self._session_names.append(session)
+        return index
+
+    def first_queued_at(self) -> float:
+        "Returns the time the first task was queued. The arena must not be empty."
+        return self._queued_at[self._head]
+
+    def popleft(self) -> tuple[Task, float]:
+        "Removes the first task and returns it with the time it was queued."
+        head = self._head
+        task = self._task(head)
+        queued_at = self._queued_at[head]
+        self._advance()
+        return task, queued_at
+
+    def remove(self, task_ids: set[int]) -> list[Task]:
+        """
+        Removes the tasks with the given IDs and returns them. The others are not touched:
+        removed tasks are only marked, and skipped once they reach the front.
+        """
+        indices = self._find(task_ids)
+        removed = [self._task(index) for index in indices]
+        self._removed.update(self._offset + index for index in indices)
+        if self._offset + self._head in self._removed:
+            self._removed.remove(self._offset + self._head)
+            self._advance()
+        return removed
+
+    def _find(self, task_ids: set[int]) -> list[int]:
+        "Returns the column indices of the queued tasks with the given IDs."
+        if len(task_ids) > self.SEARCH_LIMIT:  # One pass instead of a search per ID
+            ids, offset, removed = self._ids, self._offset, self._removed
+            return [
+                index
+                for index in range(self._head, len(ids))
+                if ids[index] in task_ids and offset + index not in removed
+            ]
+        indices = []
+        for task_id in task_ids:
+            start = self._head
+            while True:
+                try:
+                    index = self._ids.index(task_id, start)
+                except ValueError:
+                    break
+                if self._offset + index not in self._removed:
+                    indices.append(index)
+                    break
+                start = index + 1
+        return sorted(indices)
+
+    def _task(self, index: int) -> Task:
+        "Creates the task in the given column index again."
+        start = self._start if index == self._head else self._ends[index - 1]
+        data = bytes(self._data[start - self._base : self._ends[index] - self._base])
+        template = self._templates.get(self._offset + index)
+        if template is not None:
+            return replace(template, data=data)
+        session = self._sessions[index]
+        name = None if session < 0 else self._session_names[session]
+        return Task(self._ids[index], data, session=name)
+
+    def _advance(self) -> None:
+        "Drops the first task, then the removed tasks that follow it."
+        while True:
+            self._templates.pop(self._offset + self._head, None)
+            self._start = self._ends[self._head]
+            self._head += 1
+            if self._offset + self._head not in self._removed:
+                break
+            self._removed.remove(self._offset + self._head)
+        if self._head == len(self._ids):
+            self._clear()
+        elif self._head >= self.COMPACT_AFTER and 2 * self._head >= len(self._ids):
+            self._compact()
+
+    def _compact(self) -> None:
+        "Drops the columns of the tasks that left, which 'popleft' only skips."
+        head = self._head
+        for column in (self._ids, self._queued_at, self._ends, self._sessions):
+            del column[:head]
+        del self._data[: self._start - self._base]
+        self._base = self._start
+        self._offset += head
+        self._head = 0
+
+    def _clear(self) -> None:
+        "Frees the columns once the arena is empty, and forgets the sessions."
+        self._offset += len(self._ids)
+        self._ids = array("I")
+        self._queued_at = array("d")
+        self._ends = array("Q")
+        self._sessions = array("i")
+        self._session_names.clear()
+        self._session_indices.clear()
+        self._data = bytearray()
+        self._base = self._start = 0
+        self._head = 0
@@ -0,0 +1,48 @@
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+from typing import Callable, Optional
+
+
+def blob_id(data: bytes) -> str:
+    "Returns the content address of a blob."
+    return hashlib.sha256(data).hexdigest()
+
+
+class BlobCache:
+    "Thread-safe LRU cache of blobs, bounded by their total size in bytes."
+
+    def __init__(self, capacity: int, fetch: Callable[[str], Optional[bytes]]) -> None:
+        self._capacity = capacity
+        self._fetch = fetch
+        self._lock = Lock()
+        self._blobs: OrderedDict[str, memoryview] = OrderedDict()
+        self._size = 0
+
+    def __contains__(self, blob_id: str) -> bool:
+        with self._lock:
+            return blob_id in self._blobs
+
+    def get(self, blob_id: str) -> memoryview:
+        "Returns the blob, fetching it on a cache miss. Raises KeyError if it does not exist."
+        with self._lock:
+            blob = self._blobs.get(blob_id)
+            if blob is not None:
+                self._blobs.move_to_end(blob_id)
+                return blob
+        data = self._fetch(blob_id)
+        if data is None:
+            raise KeyError(f"Blob {blob_id} does not exist")
+        blob = memoryview(data).toreadonly()
+        with self._lock:
+            if blob_id not in self._blobs:
+                self._blobs[blob_id] = blob
+                self._size += blob.nbytes
+                self._evict()
+        return blob
+
+    def _evict(self) -> None:
+        # The most recently used blob is kept, even if it exceeds the capacity on its own.
+        while self._size > self._capacity and len(self._blobs) > 1:
+            _, blob = self._blobs.popitem(last=False)
+            self._size -= blob.nbytes
@@ -0,0 +1,40 @@
+import struct
+from typing import Optional, Sequence
+
+# A chunk is a count followed by one length per item and the concatenated items.
+# A length of -1 marks a missing item, e.g. the result of a failed task.
+_COUNT = struct.Struct("<I")
+_ELAPSED = struct.Struct("<d")
+
+
+def pack(items: Sequence[Optional[bytes]]) -> bytes:
+    "Packs many items into one buffer."
+    lengths = [-1 if item is None else len(item) for item in items]
+    header = _COUNT.pack(len(items)) + struct.pack(f"<{len(items)}q", *lengths)
+    return b"".join([header, *(item for item in items if item is not None)])  # One copy
+
+
+def unpack(data: bytes) -> list[Optional[bytes]]:
+    "Unpacks the items of a buffer created by 'pack'."
+    (count,) = _COUNT.unpack_from(data)
+    lengths = struct.unpack_from(f"<{count}q", data, _COUNT.size)
+    offset = _COUNT.size + 8 * count
+    items: list[Optional[bytes]] = []
+    for length in lengths:
+        if length < 0:
+            items.append(None)
+        else:
+            items.append(data[offset : offset + length])
+            offset += length
+    return items
+
+
+def pack_results(results: Sequence[Optional[bytes]], elapsed: float) -> bytes:
+    "Packs the results of a chunk together with the time it took to execute them."
+    return _ELAPSED.pack(elapsed) + pack(results)
+
+
+def unpack_results(data: bytes) -> tuple[list[Optional[bytes]], float]:
+    "Unpacks a buffer created by 'pack_results' into the results and the execution time."
+    (elapsed,) = _ELAPSED.unpack_from(data)
+    return unpack(data[_ELAPSED.size :]), elapsed
@@ -1,22 +1,54 @@
 import logging
-from dataclasses import dataclass
+import time
+import uuid
+from dataclasses import dataclass, field
+from statistics import median
 from time import sleep
 from collections import deque
 from abc import ABC, abstractmethod
-from typing import Optional
-from .entities import Task, Result
+from itertools import islice
+from math import ceil
+from typing import Any, Iterable, Iterator, Optional, Sequence, Union
+from .entities import Task, Result, Timestamps
+from . import chunking
 from .server import ClientInterface
+from .metrics import Registry
+from .codecs import Codec
 
 
 class Client(ABC):
-    def __init__(self, server: ClientInterface, refresh_time: float) -> None:
+    def __init__(
+        self,
+        server: ClientInterface,
+        refresh_time: float,
+        metrics: Optional[Registry] = None,
+        codec: Optional[Codec] = None,
+    ) -> None:
+        """
+        metrics: Registry to record the client's metrics in. Defaults to a new registry.
+        codec: Converts the objects of tasks to bytes and results back, see 'encode'
+               and 'decode'. The workers need the same codec.
+        """
         self._server = server
+        self._codec = codec
         self._refresh_time = refresh_time
         self._pending_task_ids: set[int] = set()
+        self.session = uuid.uuid4().hex  # Tasks count against the server's limits per session
+        # Rejected task or graph, and the time to offer it again
+        self._held: Optional[tuple[list[Task], float]] = None
+        self.metrics = Registry() if metrics is None else metrics
+        self._collect_time = self.metrics.histogram(
+            "rte_client_collect_seconds", "Time the client takes to poll for results."
+        )
+        self._received = self.metrics.counter("rte_client_results_total", "Received results.")
 
     @abstractmethod
-    def on_request(self, task_id: int) -> Optional[Task]:
-        "Triggered when the client needs a new task."
+    def on_request(self, task_id: int) -> Union[Task, list[Task], None]:
+        """
+        Triggered when the client needs a new task.
+        Returns a task with the given ID, or a graph of tasks for ClientInterface.add_graph
+        whose other IDs come from 'reserve_ids'. Only results of the graph's leaves arrive.
+        """
 
     @abstractmethod
     def on_result(self, result: Result) -> None:
@@ -28,9 +60,15 @@ class Client(ABC):
 
     def _process_tasks(self) -> bool:
         """
-        Requests a new task from the server.
-        Returns True if a task was received and added.
+        Requests a new task from the server, or offers a rejected task again once the server
+        asked to retry. Returns True if a task was received and added.
         """
+        if self._held is not None:
+            tasks, retry_at = self._held
+            if time.monotonic() < retry_at:
+                return False
+            self._held = None
+            return self._add_tasks(tasks)
         task_id = self._server.get_next_id()
         logging.debug("Client received task id: %s", task_id)
         if task_id is None:
@@ -42,10 +80,48 @@ class Client(ABC):
             self._server.return_id(task_id)
             return False
         else:
-            logging.info("Client is adding task: %s", task)
-            self._server.add_task(task)
-            self._pending_task_ids.add(task.id)
-            return True
+            return self._add_tasks([task] if isinstance(task, Task) else task)
+
+    def _add_tasks(self, tasks: list[Task]) -> bool:
+        """
+        Adds a task or a graph, or holds it back if the server is full.
+        Returns True if it was added.
+        """
+        dependencies = set()
+        for task in tasks:
+            if task.session is None:
+                task.session = self.session
+            dependencies.update(task.dependencies)
+        logging.info("Client is adding tasks: %s", tasks)
+        # The results of the leaves are awaited even while held back
+        self._pending_task_ids.update(
+            task.id for task in tasks if task.id not in dependencies and task.reduction is None
+        )
+        try:
+            if len(tasks) == 1:
+                retry_after = self._server.add_task(tasks[0])
+            else:
+                retry_after = self._server.add_graph(tasks)
+        except ValueError:  # An invalid graph, whose IDs the server took back
+            self._pending_task_ids.difference_update(task.id for task in tasks)
+            raise
+        if retry_after is not None:
+            logging.info("Server is full, client retries task %s in %s s", tasks[0].id, retry_after)
+            self._held = (tasks, time.monotonic() + retry_after)
+            return False
+        return True
+
+    def encode(self, obj: Any) -> bytes:
+        "Returns the data of a task with the client's codec, for 'on_request'."
+        return obj if self._codec is None else self._codec.encode(obj)
+
+    def decode(self, data: bytes) -> Any:
+        "Returns the object of a result's data with the client's codec, for 'on_result'."
+        return data if self._codec is None else self._codec.decode(data)
+
+    def reserve_ids(self, count: int) -> list[int]:
+        "Returns IDs for the tasks of a graph that depend on others, see 'on_request'."
+        return self._server.reserve_ids(count)
 
     def _process_results(self) -> bool:
         """
@@ -54,13 +130,18 @@ class Client(ABC):
         """
         if not self._pending_task_ids:
             return False
+        start = time.perf_counter()
         results = self._server.get_results(list(self._pending_task_ids))
+        self._collect_time.observe(time.perf_counter() - start)
         logging.debug("Client received results: %s", results)
         any_result = False
         for result in results:
             if result is not None:
                 any_result = True
                 logging.info("Client received result: %s", result)
+                self._received.inc()
+                if result.timestamps is not None:
+                    result.timestamps.collected = time.monotonic()
                 self.on_result(result)
                 self._pending_task_ids.remove(result.task_id)
         return any_result
@@ -77,48 +158,364 @@ class Client(ABC):
         logging.info("Client is canceling task: %s", task_id)
         self._server.cancel_task(task_id)
 
+    def cancel_tasks(self, task_ids: list[int]) -> None:
+        logging.info("Client is canceling %s tasks", len(task_ids))
+        self._server.cancel_tasks(task_ids)
+
+    def cancel_session(self) -> None:
+        """
+        Cancels every task of the client that has no result yet, with a single request.
+        Their failed results are still received. Call it from the client's thread.
+        """
+        if self._pending_task_ids:
+            self.cancel_tasks(list(self._pending_task_ids))
+
 
 @dataclass
 class _Task:
     index: int
-    attempts: int
     data: bytes
+    size: int = 1  # Number of inputs packed into a chunked task
+    chunked: bool = False
+    sent_at: float = 0.0
+    task_ids: list[int] = field(default_factory=list)  # Running copies
+
+
+# Phases of a task's lifecycle, as (name, start, end) of the timestamps that delimit them
+PHASES = (
+    ("queue", "submitted", "dispatched"),  # Waiting on the server for a worker
+    ("dispatch", "dispatched", "started"),  # Network to the worker and fetching its blobs
+    ("execute", "started", "finished"),
+    ("report", "finished", "stored"),  # Network back to the server
+    ("collect", "stored", "collected"),  # Waiting on the server until polled
+)
+
+
+def _percentile(values: list[float], q: float) -> float:
+    "Returns the nearest-rank q-percentile of sorted values."
+    return values[min(len(values) - 1, max(0, ceil(q * len(values)) - 1))]
 
 
 class BatchClient(Client):
-    def __init__(self, server: ClientInterface, refresh_time: float, attempts: int = 1) -> None:
-        super().__init__(server, refresh_time)
+    def __init__(
+        self,
+        server: ClientInterface,
+        refresh_time: float,
+        attempts: int = 1,
+        speculation: Optional[float] = None,
+        backoff: float = 0.0,
+        metrics: Optional[Registry] = None,
+        timed: bool = False,
+        codec: Optional[Codec] = None,
+    ) -> None:
+        """
+        attempts: Number of times the server tries a task before it counts as failed.
+        backoff: Seconds the server waits before the first retry, doubling with every retry.
+        speculation: Once all tasks are sent, a task that runs longer than 'speculation' times
+                     the median runtime is sent again. The first result wins.
+        timed: Collect the lifecycle timestamps of every task for 'timing_report'.
+        codec: Encodes the tasks of 'solve', 'solve_iter', 'map' and 'reduce' and decodes their
+               results, which are bytes if None. The tasks to 'reduce' are encoded as well, so
+               its reducer must understand the codec's encoding.
+
+        When the server rejects a task because it is full, the client limits its tasks in flight
+        to a window: halved on every rejection and widened by one task on every accepted one.
+        """
+        super().__init__(server, refresh_time, metrics, codec)
         self._attempts = attempts
-        self._tasks: deque[_Task]
-        self._sent_tasks: dict[int, _Task]  # task_id -> task
-        self._results: list[Optional[bytes]]
+        self._backoff = backoff
+        self._speculation = speculation
+        self._timed = timed
+        self._phase_times: dict[str, list[float]] = {name: [] for name, _, _ in PHASES}
+        self._runtimes: deque[float] = deque(maxlen=100)  # Of recently finished tasks
+        self._inputs: Iterator[tuple[int, bytes]] = iter(())
+        self._next_input: Optional[tuple[int, bytes]] = None
+        self._max_in_flight: Optional[int] = None
+        self._window: Optional[int] = None  # Flow-control limit of tasks in flight
+        self._sent_tasks: dict[int, _Task] = {}  # task_id -> task
+        self._done: dict[int, Any] = {}  # index -> result, None if failed
+        self._chunksize: Union[int, str, None] = None
+        self._remaining = 0  # Inputs not yet sent, when chunking
+        self._item_time: Optional[float] = None  # Execution time per input
+        self._overhead = 0.0  # Round-trip time per task beyond execution
+        self._reduction: Optional[int] = None  # ID of the reduction the tasks are sent to
+        self._reduced: Any = None
 
-    def solve(self, tasks: list[bytes]) -> list[Optional[bytes]]:
-        self._tasks = deque(_Task(i, 0, task) for i, task in enumerate(tasks))
+    def solve(self, tasks: list[Any]) -> list[Any]:
+        results = [result for _, result in self.solve_iter(tasks, ordered=True)]
+        return results + [None] * (len(tasks) - len(results))  # Unsent after cancel_session
+
+    def solve_iter(
+        self,
+        tasks: Iterable[Any],
+        max_in_flight: Optional[int] = None,
+        ordered: bool = False,
+    ) -> Iterator[tuple[int, Any]]:
+        """
+        Yields (index, result) pairs while pulling tasks lazily from 'tasks'.
+        At most 'max_in_flight' tasks are sent or buffered at any time.
+        If 'ordered', results are yielded in input order, otherwise as they complete.
+        """
+        if max_in_flight is not None and max_in_flight < 1:
+            raise ValueError("max_in_flight must be positive")
+        self._inputs = enumerate(map(self.encode, tasks))
+        self._next_input = None
+        self._max_in_flight = max_in_flight
+        self._chunksize = None
+        self._sent_tasks = {}
+        self._done = {}
+        next_index = 0
+        try:
+            while not self.is_finished() or self._done:
+                added_task = self._process_tasks()
+                received_result = self._process_results()
+                if ordered:
+                    while next_index in self._done:
+                        yield next_index, self._done.pop(next_index)
+                        next_index += 1
+                else:
+                    while self._done:
+                        yield self._done.popitem()
+                if not added_task and not received_result:
+                    # Sleep if there was no activity
+                    sleep(self._refresh_time)
+        finally:
+            self._abandon()  # The caller stopped early, e.g. with break
+
+    def _abandon(self) -> None:
+        "Cancels the tasks in flight and returns the IDs of held back tasks to the server."
+        self._inputs = iter(())
+        self._next_input = None
+        if self._held is not None:
+            tasks, _ = self._held
+            self._held = None
+            for task in tasks:
+                self._server.return_id(task.id)
+            self._pending_task_ids.difference_update(task.id for task in tasks)
+        task_ids = [tid for tid in self._sent_tasks if tid in self._pending_task_ids]
+        self._sent_tasks = {}
+        if task_ids:
+            self.cancel_tasks(task_ids)
+            self._server.get_results(task_ids)  # Drops the failed results of queued tasks
+            self._pending_task_ids.difference_update(task_ids)
+
+    def map(
+        self, tasks: Sequence[Any], chunksize: Union[int, str] = "auto"
+    ) -> list[Any]:
+        """
+        Solves 'tasks', packing up to 'chunksize' of them into one task on the wire.
+        With chunksize="auto", the chunk size is derived from the measured execution time
+        per task and the round-trip time: guided self-scheduling hands out large chunks
+        early and smaller ones near the end, but never chunks so small that the
+        round-trip dominates their execution time.
+        """
+        if chunksize != "auto" and (not isinstance(chunksize, int) or chunksize < 1):
+            raise ValueError("chunksize must be a positive integer or 'auto'")
+        self._inputs = enumerate(map(self.encode, tasks))
+        self._next_input = None
+        self._max_in_flight = None
         self._sent_tasks = {}
-        self._results = [None] * len(tasks)
+        self._done = {}
+        self._chunksize = chunksize
+        self._remaining = len(tasks)
         super().run()
-        return self._results
+        return [self._done.pop(i, None) for i in range(len(tasks))]
+
+    def reduce(self, tasks: Sequence[Any], reducer: str) -> Any:
+        """
+        Solves 'tasks' and returns their results combined on the server with the named
+        reducer, see reducers.py, or None if any task failed or there are none. Only the
+        combined value is sent back to the client.
+        """
+        if not tasks:
+            return None
+        (reduction_id,) = self.reserve_ids(1)
+        self._server.add_reduction(reduction_id, reducer, len(tasks))
+        self._pending_task_ids.add(reduction_id)
+        self._inputs = enumerate(map(self.encode, tasks))
+        self._next_input = None
+        self._max_in_flight = None
+        self._sent_tasks = {}
+        self._done = {}
+        self._chunksize = None
+        self._reduction = reduction_id
+        self._reduced = None
+        try:
+            super().run()
+        finally:
+            self._reduction = None
+        return self._reduced
+
+    def _auto_chunksize(self) -> int:
+        if self._item_time is None:
+            return 1  # Probe to measure the execution time
+        parallelism = len(self._sent_tasks) + 1
+        guided = ceil(self._remaining / (2 * parallelism))
+        # Smallest chunk whose round-trip adds at most 10% to its execution time
+        smallest = ceil(self._overhead / (0.1 * max(self._item_time, 1e-9)))
+        return max(1, min(self._remaining, max(guided, smallest)))
+
+    def _peek_input(self) -> Optional[tuple[int, bytes]]:
+        if self._next_input is None:
+            self._next_input = next(self._inputs, None)
+        return self._next_input
+
+    def _is_full(self) -> bool:
+        if self._window is not None and len(self._sent_tasks) >= self._window:
+            return True
+        if self._max_in_flight is None:
+            return False
+        in_flight = len(self._sent_tasks) + len(self._done)
+        return in_flight >= self._max_in_flight
+
+    def _process_tasks(self) -> bool:
+        if self._is_full() and self._held is None:
+            return False  # Don't fetch an ID that would only be returned
+        return super()._process_tasks()
+
+    def _add_tasks(self, tasks: list[Task]) -> bool:
+        added = super()._add_tasks(tasks)
+        if not added:
+            self._window = max(1, (self._window or len(self._sent_tasks)) // 2)
+            logging.info("Client shrinks its window to %s tasks", self._window)
+        elif self._window is not None:
+            self._window += 1
+        return added
+
+    def _next_task(self) -> Optional[_Task]:
+        next_input = self._peek_input()
+        if next_input is None:
+            return None
+        self._next_input = None
+        index, data = next_input
+        if self._chunksize is None:
+            return _Task(index, data)
+        if self._chunksize == "auto":
+            size = self._auto_chunksize()
+        else:
+            size = int(self._chunksize)
+        items = [data] + [item for _, item in islice(self._inputs, size - 1)]
+        self._remaining -= len(items)
+        return _Task(index, chunking.pack(items), len(items), chunked=True)
+
+    def _straggler(self) -> Optional[_Task]:
+        "Returns the longest running task if it runs well beyond the usual runtime."
+        if self._speculation is None or len(self._runtimes) < 3:
+            return None
+        candidates = [t for t in self._sent_tasks.values() if len(t.task_ids) == 1]
+        if not candidates:
+            return None
+        oldest = min(candidates, key=lambda t: t.sent_at)
+        if time.monotonic() - oldest.sent_at > self._speculation * median(self._runtimes):
+            return oldest
+        return None
 
     def on_request(self, task_id: int) -> Optional[Task]:
-        if not self._tasks:
+        if self._is_full():
             return None
-        task = self._tasks.popleft()
+        if self._reduction is not None:
+            next_input = self._peek_input()
+            if next_input is None:
+                return None
+            self._next_input = None
+            return Task(
+                task_id,
+                next_input[1],
+                max_attempts=self._attempts,
+                backoff=self._backoff,
+                timed=self._timed,
+                reduction=self._reduction,
+            )
+        task = self._next_task()
+        if task is None:
+            task = self._straggler()
+            if task is None:
+                return None
+            logging.info("Client speculatively resends task %s", task.task_ids[0])
+        else:
+            task.sent_at = time.monotonic()
+        task.task_ids.append(task_id)
         self._sent_tasks[task_id] = task
-        return Task(task_id, task.data)
+        return Task(
+            task_id,
+            task.data,
+            task.chunked,
+            self._attempts,
+            self._backoff,
+            timed=self._timed,
+        )
+
+    def _on_chunk_result(self, task: _Task, data: bytes) -> None:
+        results, elapsed = chunking.unpack_results(data)
+        turnaround = time.monotonic() - task.sent_at
+        item_time = elapsed / task.size
+        if self._item_time is None:
+            self._item_time = item_time
+            self._overhead = max(turnaround - elapsed, 0.0)
+        else:
+            self._item_time += 0.25 * (item_time - self._item_time)
+            self._overhead += 0.25 * (max(turnaround - elapsed, 0.0) - self._overhead)
+        for i, result in enumerate(results):
+            self._done[task.index + i] = None if result is None else self.decode(result)
+
+    def _record_timestamps(self, timestamps: Timestamps) -> None:
+        for name, start, end in PHASES:
+            start_time, end_time = getattr(timestamps, start), getattr(timestamps, end)
+            if start_time is not None and end_time is not None:
+                self._phase_times[name].append(end_time - start_time)
+
+    def timing_report(self) -> dict[str, dict[str, float]]:
+        """
+        Returns the count and the p50, p95 and p99 durations in seconds of every phase
+        of the tasks solved with timed=True, e.g. report["queue"]["p95"].
+        """
+        report = {}
+        for name, durations in self._phase_times.items():
+            values = sorted(durations)
+            report[name] = {"count": len(values)}
+            if values:
+                for q in (50, 95, 99):
+                    report[name][f"p{q}"] = _percentile(values, q / 100)
+        return report
 
     def on_result(self, result: Result) -> None:
-        task = self._sent_tasks.pop(result.task_id)
-        task.attempts += 1
+        if result.timestamps is not None:
+            self._record_timestamps(result.timestamps)
+        if result.task_id == self._reduction:
+            self._reduced = self.decode(result.data) if result.success else None
+            self._inputs = iter(())  # Tasks not sent yet are of no use after a failure
+            self._next_input = None
+            return
+        task = self._sent_tasks.pop(result.task_id, None)
+        if task is None:
+            return  # A copy that lost against a faster one
+        task.task_ids.remove(result.task_id)
+        if not result.success and task.task_ids:
+            return  # Another copy is still running
+        for other_id in task.task_ids:
+            # The first result wins
+            self._sent_tasks.pop(other_id)
+            self.cancel_task(other_id)
+        task.task_ids.clear()
         if result.success:
-            self._results[task.index] = result.data
-        else:
-            if task.attempts < self._attempts:
-                # Retry task
-                self._tasks.appendleft(task)
+            self._runtimes.append(time.monotonic() - task.sent_at)
+            if task.chunked:
+                self._on_chunk_result(task, result.data)
             else:
-                # Task failed
-                self._results[task.index] = None
+                self._done[task.index] = self.decode(result.data)
+        else:
+            # The server already retried the task
+            for i in range(task.size):
+                self._done[task.index + i] = None
+
+    def cancel_session(self) -> None:
+        "Stops sending tasks and cancels those sent. Tasks not sent have no result."
+        self._inputs = iter(())
+        self._next_input = None
+        self._remaining = 0
+        super().cancel_session()
 
     def is_finished(self) -> bool:
-        return not self._tasks and not self._sent_tasks
+        if self._reduction is not None and self._reduction in self._pending_task_ids:
+            return False
+        return not self._sent_tasks and self._peek_input() is None
@@ -0,0 +1,116 @@
+"""
+Codecs convert the objects that clients and workers exchange to and from the bytes of
+Task.data and Result.data, see Client and Worker. Decoding returns views of the received
+bytes where the format allows, so large buffers are not copied again.
+"""
+
+import ast
+import pickle
+import struct
+from abc import ABC, abstractmethod
+from typing import Any
+from . import chunking
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+try:
+    import numpy
+    from numpy.lib import format as npy_format
+except ImportError:
+    numpy = npy_format = None
+
+_ALIGNMENT = 16  # Of the array data in an encoded array, for any dtype
+_ARRAY_HEADER = struct.Struct("<IIB")  # Header size, dtype length, number of dimensions
+
+
+class Codec(ABC):
+    @abstractmethod
+    def encode(self, obj: Any) -> bytes:
+        "Returns the bytes of an object."
+
+    @abstractmethod
+    def decode(self, data: bytes) -> Any:
+        "Returns the object of bytes created by 'encode'."
+
+
+class RawCodec(Codec):
+    "Passes bytes through unchanged."
+
+    def encode(self, obj: Any) -> bytes:
+        return obj
+
+    def decode(self, data: bytes) -> Any:
+        return data
+
+
+class PickleCodec(Codec):
+    """
+    Pickles with protocol 5 and keeps large buffers, e.g. of NumPy arrays, out of the pickle
+    stream, so they are only copied once into the message and not at all when decoded.
+    Decode data only from trusted peers: unpickling can run arbitrary code.
+    """
+
+    def encode(self, obj: Any) -> bytes:
+        buffers: list[pickle.PickleBuffer] = []
+        stream = pickle.dumps(obj, protocol=5, buffer_callback=buffers.append)
+        return chunking.pack([stream, *(buffer.raw() for buffer in buffers)])
+
+    def decode(self, data: bytes) -> Any:
+        stream, *buffers = chunking.unpack(memoryview(data))
+        return pickle.loads(stream, buffers=buffers)  # type: ignore[arg-type]
+
+
+class MsgpackCodec(Codec):
+    "Encodes with MessagePack, which needs the msgpack package."
+
+    def __init__(self) -> None:
+        if msgpack is None:
+            raise ImportError("MsgpackCodec needs the msgpack package")
+
+    def encode(self, obj: Any) -> bytes:
+        return msgpack.packb(obj)
+
+    def decode(self, data: bytes) -> Any:
+        return msgpack.unpackb(data)
+
+
+class NumpyCodec(Codec):
+    """
+    Encodes a NumPy array as its dtype and shape followed by its raw data, which is copied once
+    into the message. The dtype is described like in .npy files, so structured and sub-array
+    dtypes are kept. Decoded arrays are read-only views of the received bytes.
+    """
+
+    def __init__(self) -> None:
+        if numpy is None:
+            raise ImportError("NumpyCodec needs the numpy package")
+
+    def encode(self, obj: Any) -> bytes:
+        array = numpy.asarray(obj)  # ascontiguousarray would turn a scalar into one dimension
+        if not array.flags.c_contiguous:
+            array = numpy.ascontiguousarray(array)
+        if array.dtype.hasobject:
+            raise ValueError("Arrays of Python objects have no raw data")
+        dtype = repr(npy_format.dtype_to_descr(array.dtype)).encode()
+        header = _ARRAY_HEADER.size + len(dtype) + 8 * array.ndim
+        size = -(-header // _ALIGNMENT) * _ALIGNMENT
+        return b"".join(
+            [
+                _ARRAY_HEADER.pack(size, len(dtype), array.ndim),
+                struct.pack(f"<{array.ndim}q", *array.shape),
+                dtype,
+                bytes(size - header),
+                array.data.cast("B") if array.size else b"",
+            ]
+        )
+
+    def decode(self, data: bytes) -> Any:
+        size, dtype_length, ndim = _ARRAY_HEADER.unpack_from(data)
+        shape = struct.unpack_from(f"<{ndim}q", data, _ARRAY_HEADER.size)
+        start = _ARRAY_HEADER.size + 8 * ndim
+        descr = ast.literal_eval(bytes(data[start : start + dtype_length]).decode())
+        dtype = npy_format.descr_to_dtype(descr)
+        return numpy.frombuffer(data, dtype, offset=size).reshape(shape)
@@ -1,14 +1,60 @@
-from dataclasses import dataclass
+from dataclasses import dataclass, field, fields, replace
+from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class Task:
     id: int
     data: bytes
+    chunked: bool = False  # data packs many inputs, see chunking.py
+    max_attempts: int = 1  # The server retries failed and timed out tasks
+    backoff: float = 0.0  # Seconds before the first retry, doubling with every retry
+    blobs: list[str] = field(default_factory=list)  # IDs of blobs the worker needs
+    affinity: Optional[str] = None  # Preferably dispatched to the worker that last had this key
+    timed: bool = False  # The result carries the task's lifecycle timestamps
+    profile: bool = False  # The worker samples its stack, see profiling.py
+    session: Optional[str] = None  # Client session whose queue limits the task counts against
+    # Seconds of the local monotonic clock after which the task is worthless and not run.
+    # On the wire, it is relative to the time the message was sent.
+    deadline: Optional[float] = None
+    # IDs of the tasks of the same graph whose results become the input, see Server.add_graph
+    dependencies: list[int] = field(default_factory=list)
+    reduction: Optional[int] = None  # ID of the reduction combining the result, see reducers.py
+    # Number of the dispatch, set by the server and echoed in the result to fence late results
+    attempt: int = field(default=0, compare=False)
 
 
-@dataclass
+@dataclass(slots=True)
+class Timestamps:
+    """
+    Lifecycle of a task in seconds of the local process's monotonic clock.
+    On the wire, the timestamps are relative to the time the message was sent.
+    """
+
+    submitted: Optional[float] = None  # Added to the server
+    dispatched: Optional[float] = None  # Sent to a worker
+    started: Optional[float] = None  # Execution started on the worker
+    finished: Optional[float] = None  # Execution finished on the worker
+    stored: Optional[float] = None  # Result stored on the server
+    collected: Optional[float] = None  # Result received by the client
+
+    def shifted(self, offset: float) -> "Timestamps":
+        "Returns the timestamps moved by 'offset' seconds, e.g. to convert between clocks."
+        changes = {
+            f.name: getattr(self, f.name) + offset
+            for f in fields(self)
+            if getattr(self, f.name) is not None
+        }
+        return replace(self, **changes)
+
+
+@dataclass(slots=True)
 class Result:
     task_id: int
     success: bool
     data: bytes
+    attempts: int = 1
+    timestamps: Optional[Timestamps] = None
+    profile: dict[str, int] = field(default_factory=dict)  # Samples per collapsed stack
+    attempt: int = 0  # Attempt of the task that produced the result, 0 if unknown
+    expired: bool = False  # Failed because the task's deadline passed before it ran
@@ -0,0 +1,200 @@
+import logging
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from threading import Event, Lock, Thread
+from typing import Iterable, Iterator, Optional
+from .entities import Task, Result
+from .server import ClientInterface
+from .client import Client
+from . import chunking
+
+
+class TaskFailedError(Exception):
+    "Raised by the future of a task that failed or timed out on the server."
+
+
+class _ExecutorClient(Client):
+    "Client that drives the futures of an RteExecutor."
+
+    def __init__(self, server: ClientInterface, refresh_time: float) -> None:
+        super().__init__(server, refresh_time)
+        self._lock = Lock()  # Protects the fields below
+        # Submitted but not sent, as (future, data, chunked)
+        self._queue: deque[tuple[Future, bytes, bool]] = deque()
+        self._futures: dict[int, Future] = {}  # task_id -> future
+        self._task_ids: dict[Future, int] = {}  # future -> task_id
+        self._to_cancel: list[Future] = []
+        self._shutdown = False
+        self._error: Optional[Exception] = None  # Set if the client stopped on an error
+        self._wakeup = Event()
+
+    def submit(self, futures: list[tuple[Future, bytes, bool]]) -> None:
+        with self._lock:
+            if self._error is not None:
+                raise RuntimeError("cannot schedule new futures after an error") from self._error
+            if self._shutdown:
+                raise RuntimeError("cannot schedule new futures after shutdown")
+            self._queue.extend(futures)
+        for future, _, _ in futures:
+            future.add_done_callback(self._on_done)
+        self._wakeup.set()
+
+    def shutdown(self, cancel_futures: bool) -> None:
+        with self._lock:
+            self._shutdown = True
+            queued = [future for future, _, _ in self._queue] if cancel_futures else []
+        for future in queued:
+            future.cancel()
+        self._wakeup.set()
+
+    def _on_done(self, future: Future) -> None:
+        if future.cancelled():
+            with self._lock:
+                self._to_cancel.append(future)
+            self._wakeup.set()
+
+    def _cancel_tasks(self) -> None:
+        with self._lock:
+            if not self._to_cancel:
+                return
+            to_cancel, self._to_cancel = self._to_cancel, []
+            # A canceled task may never get a result, so it is no longer waited for
+            task_ids = [self._task_ids.pop(f) for f in to_cancel if f in self._task_ids]
+            for task_id in task_ids:
+                del self._futures[task_id]
+            self._queue = deque(item for item in self._queue if not item[0].cancelled())
+        for task_id in task_ids:
+            self._pending_task_ids.discard(task_id)
+            self.cancel_task(task_id)
+
+    def on_request(self, task_id: int) -> Optional[Task]:
+        with self._lock:
+            while self._queue:
+                future, data, chunked = self._queue.popleft()
+                if future.cancelled():
+                    continue
+                self._futures[task_id] = future
+                self._task_ids[future] = task_id
+                return Task(task_id, data, chunked=chunked)
+            return None
+
+    def on_result(self, result: Result) -> None:
+        with self._lock:
+            future = self._futures.pop(result.task_id, None)
+            if future is None:
+                return
+            del self._task_ids[future]
+        if not future.set_running_or_notify_cancel():
+            return  # Canceled while running remotely
+        if result.success:
+            future.set_result(result.data)
+        else:
+            future.set_exception(TaskFailedError(f"Task {result.task_id} failed"))
+
+    def is_finished(self) -> bool:
+        with self._lock:
+            return self._shutdown and not self._queue and not self._futures
+
+    def _has_queued(self) -> bool:
+        with self._lock:
+            return bool(self._queue)
+
+    def _fail(self, error: Exception) -> None:
+        "Fails every queued and pending future with 'error' and refuses new ones."
+        with self._lock:
+            self._error = error
+            self._shutdown = True
+            futures = [future for future, _, _ in self._queue] + list(self._futures.values())
+            self._queue.clear()
+            self._futures.clear()
+            self._task_ids.clear()
+        for future in futures:
+            if future.set_running_or_notify_cancel():
+                future.set_exception(error)
+
+    def run(self) -> None:
+        try:
+            self._run()
+        except Exception as error:  # pylint: disable=broad-except
+            logging.exception("Executor failed")
+            self._fail(error)
+
+    def _run(self) -> None:
+        while not self.is_finished():
+            self._cancel_tasks()
+            added_task = False
+            while (self._has_queued() or self._held is not None) and self._process_tasks():
+                added_task = True
+            received_result = self._process_results()
+            if not added_task and not received_result:
+                # Wait if there was no activity, unless woken by a submission
+                self._wakeup.wait(self._refresh_time)
+                self._wakeup.clear()
+
+
+class RteExecutor(Executor):
+    """
+    Executor that runs tasks remotely.
+    A single background thread submits tasks and collects results in batches.
+    """
+
+    def __init__(self, server: ClientInterface, refresh_time: float = 0.01) -> None:
+        self._client = _ExecutorClient(server, refresh_time)
+        self._thread = Thread(target=self._client.run, daemon=True)
+        self._thread.start()
+
+    def submit(self, task: bytes, /) -> Future:  # type: ignore[override]
+        "Schedules a task and returns a future of its result."
+        future: Future = Future()
+        self._client.submit([(future, task, False)])
+        return future
+
+    def map(  # type: ignore[override]
+        self, tasks: Iterable[bytes], timeout: Optional[float] = None, chunksize: int = 1
+    ) -> Iterator[bytes]:
+        """
+        Returns an iterator over the results of 'tasks', in order.
+        With chunksize > 1, up to 'chunksize' tasks are packed into one task on the wire,
+        and a task that fails raises TaskFailedError when its result is reached.
+        """
+        if chunksize < 1:
+            raise ValueError("chunksize must be >= 1.")
+        end_time = None if timeout is None else time.monotonic() + timeout
+        submissions: list[tuple[Future, bytes, bool]] = []
+        if chunksize == 1:
+            submissions = [(Future(), task, False) for task in tasks]
+        else:
+            items = list(tasks)
+            for i in range(0, len(items), chunksize):
+                submissions.append((Future(), chunking.pack(items[i : i + chunksize]), True))
+        self._client.submit(submissions)
+        futures = [future for future, _, _ in submissions]
+
+        def result_iterator() -> Iterator[bytes]:
+            try:
+                futures.reverse()
+                while futures:
+                    future = futures.pop()
+                    if end_time is None:
+                        data = future.result()
+                    else:
+                        data = future.result(end_time - time.monotonic())
+                    if chunksize == 1:
+                        yield data
+                        continue
+                    for result in chunking.unpack_results(data)[0]:
+                        if result is None:
+                            raise TaskFailedError("Task of a chunk failed")
+                        yield result
+            finally:
+                for future in futures:
+                    future.cancel()
+
+        return result_iterator()
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False) -> None:
+        logging.debug("Executor shuts down")
+        self._client.shutdown(cancel_futures)
+        if wait:
+            self._thread.join()
@@ -1,39 +1,236 @@
+import time
 from concurrent import futures
-from typing import Optional
+from dataclasses import asdict, fields
+from itertools import accumulate
+from typing import Iterable, Iterator, Optional, Union
 import grpc
-from .entities import Task, Result
+from .entities import Task, Result, Timestamps
 from .server import ServerInterface
+from .metrics import Histogram, Registry
+from .profiling import SamplingProfiler, format_collapsed
 from .rte_pb2 import (
     Empty as EmptyProto,
     Bool as BoolProto,
     Task as TaskProto,
+    Tasks as TasksProto,
     OptionalTask as OptionalTaskProto,
+    WorkerId as WorkerIdProto,
+    TaskRequest as TaskRequestProto,
     TaskId as TaskIdProto,
     TaskIds as TaskIdsProto,
+    SortedTaskIds as SortedTaskIdsProto,
+    Count as CountProto,
+    Reduction as ReductionProto,
     OptionalTaskId as OptionalTaskIdProto,
+    RetryAfter as RetryAfterProto,
     Result as ResultProto,
-    OptionalResult as OptionalResult,
-    OptionalResults as OptionalResults,
+    ResultBatch as ResultBatchProto,
+    BlobId as BlobIdProto,
+    BlobChunk as BlobChunkProto,
+    Timestamps as TimestampsProto,
+    Profile as ProfileProto,
 )
 from .rte_pb2_grpc import RteServicer, add_RteServicer_to_server
 
+BLOB_CHUNK_SIZE = 1 << 20  # Blobs are streamed in chunks below gRPC's message size limit
+_HANDLER_THREAD_PREFIX = "rte-grpc"
+
+
+def timestamps_to_proto(timestamps: Optional[Timestamps]) -> Optional[TimestampsProto]:
+    "Converts timestamps to a message, relative to the time it is sent."
+    if timestamps is None:
+        return None
+    return TimestampsProto(**asdict(timestamps.shifted(-time.monotonic())))
+
+
+def deadline_to_proto(deadline: Optional[float]) -> Optional[float]:
+    "Converts a deadline to the seconds left at the time the message is sent."
+    return None if deadline is None else deadline - time.monotonic()
+
+
+def deadline_from_proto(message) -> Optional[float]:
+    "Converts the deadline of a received message to the local clock."
+    return message.deadline + time.monotonic() if message.HasField("deadline") else None
+
+
+def task_to_proto(task: Task) -> TaskProto:
+    "Converts a task added by a client to a message."
+    return TaskProto(
+        id=task.id,
+        data=task.data,
+        chunked=task.chunked,
+        max_attempts=task.max_attempts,
+        backoff=task.backoff,
+        blobs=task.blobs,
+        affinity=task.affinity,
+        timed=task.timed,
+        session=task.session,
+        deadline=deadline_to_proto(task.deadline),
+        dependencies=task.dependencies,
+        reduction=task.reduction,
+    )
+
+
+def task_from_proto(message: TaskProto) -> Task:
+    "Converts a message of a task added by a client to a task."
+    return Task(
+        id=message.id,
+        data=message.data,
+        chunked=message.chunked,
+        max_attempts=message.max_attempts,
+        backoff=message.backoff,
+        blobs=list(message.blobs),
+        affinity=message.affinity if message.HasField("affinity") else None,
+        timed=message.timed,
+        session=message.session if message.HasField("session") else None,
+        deadline=deadline_from_proto(message),
+        dependencies=list(message.dependencies),
+        reduction=message.reduction if message.HasField("reduction") else None,
+    )
+
+
+def timestamps_from_proto(message) -> Optional[Timestamps]:
+    "Converts the timestamps of a received message to the local clock."
+    if not message.HasField("timestamps"):
+        return None
+    return _timestamps_from_message(message.timestamps)
+
+
+def _timestamps_from_message(ts: TimestampsProto) -> Timestamps:
+    names = [f.name for f in fields(Timestamps)]
+    relative = Timestamps(**{name: getattr(ts, name) for name in names if ts.HasField(name)})
+    return relative.shifted(time.monotonic())
+
+
+def task_ids_to_proto(task_ids: Iterable[int]) -> SortedTaskIdsProto:
+    "Converts task IDs to a message of their ascending differences."
+    ids = sorted(task_ids)
+    return SortedTaskIdsProto(deltas=[b - a for a, b in zip([0, *ids], ids)])
+
+
+def task_ids_from_proto(message: SortedTaskIdsProto) -> list[int]:
+    "Converts a message created by 'task_ids_to_proto' to the task IDs in ascending order."
+    return list(accumulate(message.deltas))
+
+
+def results_to_proto(results: Iterable[Optional[Result]]) -> ResultBatchProto:
+    "Converts the results that are not None to a columnar message."
+    ready = [r for r in results if r is not None]
+    return ResultBatchProto(
+        task_ids=[r.task_id for r in ready],
+        success=[r.success for r in ready],
+        attempts=[r.attempts for r in ready],
+        expired=[r.expired for r in ready],
+        offsets=[0, *accumulate(len(r.data) for r in ready)],
+        data=b"".join(r.data for r in ready),
+        timestamps={
+            i: timestamps_to_proto(r.timestamps) for i, r in enumerate(ready) if r.timestamps
+        },
+    )
+
+
+def results_from_proto(message: ResultBatchProto, zero_copy: bool = False) -> list[Result]:
+    """
+    Converts a message created by 'results_to_proto' to results.
+    If 'zero_copy', their data are memoryviews into the message's buffer instead of copies.
+    """
+    buffer: Union[bytes, memoryview] = message.data  # Copied out of the message only once
+    if zero_copy:
+        buffer = memoryview(buffer)
+    offsets = message.offsets
+    timestamps = message.timestamps
+    return [
+        Result(
+            task_id=task_id,
+            success=success,
+            data=buffer[start:end],  # type: ignore[arg-type]
+            attempts=attempts,
+            timestamps=_timestamps_from_message(timestamps[i]) if i in timestamps else None,
+            expired=expired,
+        )
+        for i, (task_id, success, attempts, expired, start, end) in enumerate(
+            zip(
+                message.task_ids,
+                message.success,
+                message.attempts,
+                message.expired,
+                offsets,
+                offsets[1:],
+            )
+        )
+    ]
+
+
+class _LatencyInterceptor(grpc.ServerInterceptor):
+    "Records the latency of every unary RPC in a histogram labeled with the method."
+
+    def __init__(self, registry: Registry) -> None:
+        self._registry = registry
+        self._histograms: dict[str, Histogram] = {}
+
+    def _histogram(self, method: str) -> Histogram:
+        histogram = self._histograms.get(method)
+        if histogram is None:
+            histogram = self._registry.histogram(
+                "rte_rpc_seconds", "Latency of RPCs handled by the server.", {"method": method}
+            )
+            self._histograms[method] = histogram
+        return histogram
+
+    def intercept_service(self, continuation, handler_call_details):
+        handler = continuation(handler_call_details)
+        if handler is None or handler.unary_unary is None:
+            return handler
+        behavior = handler.unary_unary
+        histogram = self._histogram(handler_call_details.method.rsplit("/", 1)[-1])
+
+        def timed(request, context):
+            start = time.perf_counter()
+            try:
+                return behavior(request, context)
+            finally:
+                histogram.observe(time.perf_counter() - start)
+
+        return grpc.unary_unary_rpc_method_handler(
+            timed,
+            request_deserializer=handler.request_deserializer,
+            response_serializer=handler.response_serializer,
+        )
+
 
 class GrpcServer(RteServicer):
     """GrpcServer is a server that communicates with the client using gRPC."""
 
-    def __init__(self, server: ServerInterface, port: int) -> None:
+    def __init__(
+        self, server: ServerInterface, port: int, metrics: Optional[Registry] = None
+    ) -> None:
+        """
+        metrics: Registry to record the latency of RPCs in. Defaults to a new registry.
+        """
         self.server = server
-        self.grpc_server = grpc.server(futures.ThreadPoolExecutor(1_000_000_000))
+        self.metrics = Registry() if metrics is None else metrics
+        self.grpc_server = grpc.server(
+            futures.ThreadPoolExecutor(1_000_000_000, thread_name_prefix=_HANDLER_THREAD_PREFIX),
+            interceptors=[_LatencyInterceptor(self.metrics)],
+        )
+        self._profiler = SamplingProfiler(
+            lambda thread: thread.name.startswith(_HANDLER_THREAD_PREFIX)
+        )
         add_RteServicer_to_server(self, self.grpc_server)
         self.grpc_server.add_insecure_port(f"[::]:{port}")
 
     def start(self) -> None:
         self.grpc_server.start()
 
+    def stats(self) -> dict:
+        "Returns the current value of every metric of the gRPC server."
+        return self.metrics.stats()
+
     def wait_for_termination(self) -> None:
         self.grpc_server.wait_for_termination()
 
     def stop(self, grace: Optional[float] = None) -> None:
+        self._profiler.stop()
         self.grpc_server.stop(grace)
 
     def get_next_id(self, request: EmptyProto, context) -> OptionalTaskIdProto:
@@ -46,42 +243,122 @@ class GrpcServer(RteServicer):
         self.server.return_id(request.value)
         return EmptyProto()
 
-    def add_task(self, request: TaskProto, context) -> EmptyProto:
-        self.server.add_task(Task(id=request.id, data=request.data))
+    def add_task(self, request: TaskProto, context) -> RetryAfterProto:
+        return RetryAfterProto(seconds=self.server.add_task(task_from_proto(request)))
+
+    def reserve_ids(self, request: CountProto, context) -> TaskIdsProto:
+        return TaskIdsProto(ids=self.server.reserve_ids(request.value))
+
+    def add_graph(self, request: TasksProto, context) -> RetryAfterProto:
+        tasks = [task_from_proto(task) for task in request.tasks]
+        try:
+            retry_after = self.server.add_graph(tasks)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
+        return RetryAfterProto(seconds=retry_after)
+
+    def add_reduction(self, request: ReductionProto, context) -> EmptyProto:
+        try:
+            self.server.add_reduction(request.id, request.reducer, request.count)
+        except ValueError as e:
+            context.abort(grpc.StatusCode.INVALID_ARGUMENT, str(e))
         return EmptyProto()
 
-    def get_task(self, request: EmptyProto, context) -> OptionalTaskProto:
-        task = self.server.get_task()
+    def register_worker(self, request: WorkerIdProto, context) -> EmptyProto:
+        self.server.register_worker(request.value)
+        return EmptyProto()
+
+    def unregister_worker(self, request: WorkerIdProto, context) -> EmptyProto:
+        self.server.unregister_worker(request.value)
+        return EmptyProto()
+
+    def get_task(self, request: TaskRequestProto, context) -> OptionalTaskProto:
+        timeout = request.timeout if request.HasField("timeout") else None
+        try:
+            task = self.server.get_task(request.worker_id or None, timeout)
+        except TimeoutError:
+            context.abort(grpc.StatusCode.DEADLINE_EXCEEDED, "No task available")
         if task is None:
             return OptionalTaskProto()
-        return OptionalTaskProto(id=task.id, data=task.data)
+        return OptionalTaskProto(
+            id=task.id,
+            data=task.data,
+            chunked=task.chunked,
+            max_attempts=task.max_attempts,
+            backoff=task.backoff,
+            blobs=task.blobs,
+            affinity=task.affinity,
+            timed=task.timed,
+            profile=task.profile,
+            attempt=task.attempt,
+            deadline=deadline_to_proto(task.deadline),
+        )
 
     def set_result(self, request: ResultProto, context) -> EmptyProto:
         self.server.set_result(
-            Result(task_id=request.task_id, success=request.success, data=request.data)
+            Result(
+                task_id=request.task_id,
+                success=request.success,
+                data=request.data,
+                attempts=request.attempts,
+                timestamps=timestamps_from_proto(request),
+                profile=dict(request.profile),
+                attempt=request.attempt,
+                expired=request.expired,
+            )
         )
         return EmptyProto()
 
-    def get_results(self, request: TaskIdsProto, context) -> OptionalResults:
-        results = self.server.get_results(request.ids)
-        return OptionalResults(
-            results=[
-                OptionalResult(
-                    task_id=r.task_id, success=r.success, data=r.data
-                )
-                if r is not None
-                else OptionalResult()
-                for r in results
-            ]
-        )
+    def get_results(self, request: SortedTaskIdsProto, context) -> ResultBatchProto:
+        return results_to_proto(self.server.get_results(task_ids_from_proto(request)))
 
     def cancel_task(self, request: TaskIdProto, context) -> EmptyProto:
         self.server.cancel_task(request.value)
         return EmptyProto()
 
+    def cancel_tasks(self, request: TaskIdsProto, context) -> EmptyProto:
+        self.server.cancel_tasks(list(request.ids))
+        return EmptyProto()
+
     def is_task_canceled(self, request: TaskIdProto, context) -> BoolProto:
         return BoolProto(value=self.server.is_task_canceled(request.value))
 
+    def watch_cancellations(self, request: WorkerIdProto, context) -> Iterator[TaskIdProto]:
+        worker_id = request.value
+        # A broken stream means the worker is gone. Unregistering it also ends the watch.
+        context.add_callback(lambda: self.server.unregister_worker(worker_id))
+        for task_id in self.server.watch_cancellations(worker_id):
+            yield TaskIdProto(value=task_id)
+
+    def put_blob(self, request_iterator: Iterator[BlobChunkProto], context) -> BlobIdProto:
+        data = b"".join(chunk.data for chunk in request_iterator)
+        return BlobIdProto(value=self.server.put_blob(data))
+
+    def get_blob(self, request: BlobIdProto, context) -> Iterator[BlobChunkProto]:
+        data = self.server.get_blob(request.value)
+        if data is None:
+            context.abort(grpc.StatusCode.NOT_FOUND, f"Blob {request.value} does not exist")
+            return
+        view = memoryview(data)
+        for start in range(0, len(view), BLOB_CHUNK_SIZE):
+            yield BlobChunkProto(data=bytes(view[start : start + BLOB_CHUNK_SIZE]))
+
+    def delete_blob(self, request: BlobIdProto, context) -> EmptyProto:
+        self.server.delete_blob(request.value)
+        return EmptyProto()
+
     def release_waiting_workers(self, request: EmptyProto, context) -> EmptyProto:
         self.server.release_waiting_workers()
         return EmptyProto()
+
+    def set_profiling(self, request: BoolProto, context) -> EmptyProto:
+        if request.value:
+            self._profiler.start()
+        else:
+            self._profiler.stop()
+        self.server.set_profiling(request.value)
+        return EmptyProto()
+
+    def get_profile(self, request: EmptyProto, context) -> ProfileProto:
+        collapsed = format_collapsed(self._profiler.samples(), root="grpc")
+        return ProfileProto(collapsed=collapsed + self.server.get_profile())
@@ -70,47 +70,69 @@ class HeartbeatMonitor:
 
 
 class MultiHeartbeatMonitor:
-    "Thread-safe multi-heartbeat monitor."
+    """
+    Thread-safe multi-heartbeat monitor.
+    Hearts are sharded by ID, each shard with its own lock, so beats of different hearts
+    rarely contend. 'on_death' is called without holding any lock of the monitor.
+    """
 
-    def __init__(self, threshold: float, on_death=lambda _: None) -> None:
+    def __init__(self, threshold: float, on_death=lambda _: None, shards: int = 16) -> None:
         self._threshold = threshold
         self._period = threshold / 2
         self._on_death = on_death
         self._stop_event = Event()
-        self._lock = Lock()  # Protects the heartbeats
-        self._heartbeats: dict[int, Heartbeat] = {}
+        # Per shard, a lock protecting the time of the last beat of every heart
+        self._shards: list[tuple[Lock, dict[int, float]]] = [
+            (Lock(), {}) for _ in range(shards)
+        ]
         self._thread = Thread(target=self._check_heartbeats)
         self._thread.start()
 
+    def _shard(self, heart_id: int) -> tuple[Lock, dict[int, float]]:
+        return self._shards[heart_id % len(self._shards)]
+
     def _check_heartbeats(self) -> None:
         while not self._stop_event.wait(self._period):
-            with self._lock:
-                dead_hearts = [
+            self._check()
+
+    def _check(self) -> None:
+        "Removes the dead hearts and reports their deaths."
+        dead_hearts = []
+        for lock, last_beats in self._shards:
+            with lock:
+                now = time.monotonic()
+                dead = [
                     heart_id
-                    for heart_id, heartbeat in self._heartbeats.items()
-                    if not heartbeat.is_alive()
+                    for heart_id, last_beat in last_beats.items()
+                    if now - last_beat >= self._threshold
                 ]
-                for heart_id in dead_hearts:
-                    self._heartbeats.pop(heart_id)
-                    self._on_death(heart_id)
+                for heart_id in dead:
+                    del last_beats[heart_id]
+            dead_hearts.extend(dead)
+        for heart_id in dead_hearts:
+            self._on_death(heart_id)
 
     def add(self, heart_id: int) -> None:
-        with self._lock:
-            self._heartbeats[heart_id] = Heartbeat(self._threshold)
+        lock, last_beats = self._shard(heart_id)
+        with lock:
+            last_beats[heart_id] = time.monotonic()
 
     def remove(self, heart_id: int) -> None:
-        with self._lock:
-            self._heartbeats.pop(heart_id, None)
+        lock, last_beats = self._shard(heart_id)
+        with lock:
+            last_beats.pop(heart_id, None)
 
     def beat(self, heart_id: int) -> None:
-        with self._lock:
-            if heart_id in self._heartbeats:
-                self._heartbeats[heart_id].beat()
+        lock, last_beats = self._shard(heart_id)
+        with lock:
+            if heart_id in last_beats:
+                last_beats[heart_id] = time.monotonic()
 
     def is_alive(self, heart_id: int) -> bool:
-        with self._lock:
-            if heart_id in self._heartbeats:
-                return self._heartbeats[heart_id].is_alive()
+        lock, last_beats = self._shard(heart_id)
+        with lock:
+            if heart_id in last_beats:
+                return time.monotonic() - last_beats[heart_id] < self._threshold
             return False
 
     def stop(self) -> None:
@@ -0,0 +1,279 @@
+import bisect
+from collections import deque
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from threading import Lock, Thread
+from typing import Callable, Optional, Union
+
+Labels = tuple[tuple[str, str], ...]
+
+# Upper bounds in seconds, from 100µs to 100s
+LATENCY_BUCKETS = (
+    0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 25.0, 50.0, 100.0,
+)  # fmt: skip
+
+
+def _format_labels(labels: Labels, extra: str = "") -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class _Pending:
+    """
+    Thread-safe buffer of observations that are folded into a metric in batches.
+    Appending to a deque is atomic, so the hot path takes no lock.
+    """
+
+    FOLD_SIZE = 4096
+
+    def __init__(self, fold: Callable[[float], None]) -> None:
+        self._lock = Lock()  # Protects the folded state
+        self._values: deque[float] = deque()
+        self._fold_one = fold
+
+    def append(self, value: float) -> None:
+        self._values.append(value)
+        if len(self._values) > self.FOLD_SIZE:
+            self.fold()
+
+    def fold(self) -> Lock:
+        "Folds all buffered observations and returns the lock protecting the folded state."
+        with self._lock:
+            while True:
+                try:
+                    value = self._values.popleft()
+                except IndexError:
+                    break
+                self._fold_one(value)
+        return self._lock
+
+
+class Counter:
+    "Thread-safe monotonically increasing value."
+
+    def __init__(self) -> None:
+        self._value = 0.0
+        self._pending = _Pending(self._add)
+
+    def _add(self, amount: float) -> None:
+        self._value += amount
+
+    def inc(self, amount: float = 1) -> None:
+        self._pending.append(amount)
+
+    def value(self) -> float:
+        with self._pending.fold():
+            return self._value
+
+
+class Gauge:
+    "Thread-safe value that can go up and down, or is computed on demand by 'function'."
+
+    def __init__(self, function: Optional[Callable[[], float]] = None) -> None:
+        self._lock = Lock()
+        self._value = 0.0
+        self._function = function
+
+    def set(self, value: float) -> None:
+        with self._lock:
+            self._value = value
+
+    def inc(self, amount: float = 1) -> None:
+        with self._lock:
+            self._value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.inc(-amount)
+
+    def value(self) -> float:
+        if self._function is not None:
+            return self._function()
+        return self._value
+
+
+class Histogram:
+    "Thread-safe distribution of values, counted in cumulative buckets."
+
+    def __init__(self, buckets: tuple[float, ...] = LATENCY_BUCKETS) -> None:
+        self._bounds = buckets
+        self._counts = [0] * (len(buckets) + 1)  # The last bucket is +Inf
+        self._sum = 0.0
+        self._count = 0
+        self._pending = _Pending(self._add)
+
+    def _add(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self._sum += value
+        self._count += 1
+
+    def observe(self, value: float) -> None:
+        self._pending.append(value)
+
+    def snapshot(self) -> dict:
+        "Returns the count, the sum and the cumulative count per upper bound."
+        with self._pending.fold():
+            counts = list(self._counts)
+            total, count = self._sum, self._count
+        cumulative = {}
+        running = 0
+        for bound, bucket_count in zip(self._bounds + (float("inf"),), counts):
+            running += bucket_count
+            cumulative[bound] = running
+        return {"count": count, "sum": total, "buckets": cumulative}
+
+    def quantile(self, q: float) -> float:
+        "Returns the upper bound of the bucket that contains the q-quantile."
+        snapshot = self.snapshot()
+        if snapshot["count"] == 0:
+            return 0.0
+        rank = q * snapshot["count"]
+        for bound, cumulative in snapshot["buckets"].items():
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+
+Metric = Union[Counter, Gauge, Histogram]
+
+
+class _NullMetric:
+    "Metric that records nothing, handed out by a disabled registry."
+
+    def inc(self, amount: float = 1) -> None:
+        pass
+
+    def dec(self, amount: float = 1) -> None:
+        pass
+
+    def set(self, value: float) -> None:
+        pass
+
+    def observe(self, value: float) -> None:
+        pass
+
+
+class Registry:
+    "Thread-safe collection of named metrics."
+
+    def __init__(self, enabled: bool = True) -> None:
+        """
+        enabled: If False, all metrics are no-ops and nothing is exported.
+        """
+        self._enabled = enabled
+        self._lock = Lock()
+        # name -> (type, help text, metric per labels)
+        self._metrics: dict[str, tuple[str, str, dict[Labels, Metric]]] = {}
+
+    def _get(
+        self, kind: str, name: str, help_text: str, labels: Optional[dict[str, str]], create
+    ) -> Metric:
+        if not self._enabled:
+            return _NullMetric()  # type: ignore[return-value]
+        key: Labels = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = (kind, help_text, {})
+            metric_kind, _, metrics = self._metrics[name]
+            if metric_kind != kind:
+                raise ValueError(f"Metric {name} is a {metric_kind}, not a {kind}")
+            if key not in metrics:
+                metrics[key] = create()
+            return metrics[key]
+
+    def counter(
+        self, name: str, help_text: str, labels: Optional[dict[str, str]] = None
+    ) -> Counter:
+        return self._get("counter", name, help_text, labels, Counter)  # type: ignore[return-value]
+
+    def gauge(
+        self,
+        name: str,
+        help_text: str,
+        labels: Optional[dict[str, str]] = None,
+        function: Optional[Callable[[], float]] = None,
+    ) -> Gauge:
+        create = partial(Gauge, function)
+        return self._get("gauge", name, help_text, labels, create)  # type: ignore[return-value]
+
+    def histogram(
+        self,
+        name: str,
+        help_text: str,
+        labels: Optional[dict[str, str]] = None,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> Histogram:
+        create = partial(Histogram, buckets)
+        return self._get("histogram", name, help_text, labels, create)  # type: ignore[return-value]
+
+    def _items(self) -> list[tuple[str, str, str, list[tuple[Labels, Metric]]]]:
+        with self._lock:
+            return [
+                (name, kind, help_text, list(metrics.items()))
+                for name, (kind, help_text, metrics) in self._metrics.items()
+            ]
+
+    def stats(self) -> dict[str, Union[float, dict]]:
+        "Returns the current value of every metric, keyed by name and labels."
+        stats: dict[str, Union[float, dict]] = {}
+        for name, _, _, metrics in self._items():
+            for labels, metric in metrics:
+                key = name + _format_labels(labels)
+                if isinstance(metric, Histogram):
+                    stats[key] = metric.snapshot()
+                else:
+                    stats[key] = metric.value()
+        return stats
+
+    def exposition(self) -> str:
+        "Returns all metrics in the Prometheus text exposition format."
+        lines = []
+        for name, kind, help_text, metrics in self._items():
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, metric in metrics:
+                if isinstance(metric, Histogram):
+                    snapshot = metric.snapshot()
+                    for bound, count in snapshot["buckets"].items():
+                        le = "+Inf" if bound == float("inf") else repr(bound)
+                        bucket_labels = _format_labels(labels, f'le="{le}"')
+                        lines.append(f"{name}_bucket{bucket_labels} {count}")
+                    lines.append(f"{name}_sum{_format_labels(labels)} {snapshot['sum']}")
+                    lines.append(f"{name}_count{_format_labels(labels)} {snapshot['count']}")
+                else:
+                    lines.append(f"{name}{_format_labels(labels)} {metric.value()}")
+        return "\n".join(lines) + "\n"
+
+
+class MetricsServer:
+    "Serves the metrics of a registry in the Prometheus text format over HTTP."
+
+    def __init__(self, registry: Registry, port: int, host: str = "localhost") -> None:
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self) -> None:  # pylint: disable=invalid-name
+                body = registry.exposition().encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "text/plain; version=0.0.4")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args) -> None:  # pylint: disable=redefined-builtin
+                pass
+
+        self._http_server = ThreadingHTTPServer((host, port), Handler)
+        self._thread = Thread(target=self._http_server.serve_forever)
+
+    @property
+    def port(self) -> int:
+        return self._http_server.server_address[1]
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._http_server.shutdown()
+        self._http_server.server_close()
+        self._thread.join()
@@ -0,0 +1,97 @@
+import os
+import sys
+import threading
+from types import FrameType
+from typing import Callable, Optional
+
+
+def _collapse(frame: Optional[FrameType]) -> str:
+    "Returns the stack of a frame from the root, with frames separated by semicolons."
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+        frame = frame.f_back
+    return ";".join(reversed(names))
+
+
+def format_collapsed(samples: dict[str, int], root: str = "") -> str:
+    """
+    Returns samples in the collapsed stack format, one 'stack count' line per stack,
+    which flamegraph.pl and speedscope read. Stacks are prefixed with 'root' if given.
+    """
+    prefix = f"{root};" if root else ""
+    return "".join(f"{prefix}{stack} {count}\n" for stack, count in sorted(samples.items()))
+
+
+def merge_samples(into: dict[str, int], samples: dict[str, int]) -> None:
+    "Adds the counts of 'samples' to 'into'."
+    for stack, count in samples.items():
+        into[stack] = into.get(stack, 0) + count
+
+
+class SamplingProfiler:
+    """
+    Samples the stacks of selected threads at a fixed interval from a background thread
+    and counts how often each stack was seen.
+    """
+
+    def __init__(self, select: Callable[[threading.Thread], bool], interval: float = 0.005):
+        """
+        select: Returns True for the threads to sample.
+        interval: Seconds between samples.
+        """
+        self._select = select
+        self._interval = interval
+        self._lock = threading.Lock()
+        self._samples: dict[str, int] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = threading.Event()
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None
+
+    def start(self) -> None:
+        "Starts sampling, unless already running."
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="rte-profiler", daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        "Stops sampling. The samples are kept."
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._stopped.set()
+            thread.join()
+
+    def _run(self) -> None:
+        while not self._stopped.wait(self._interval):
+            self.sample()
+
+    def sample(self) -> None:
+        "Takes one sample of every selected thread."
+        frames = sys._current_frames()  # pylint: disable=protected-access
+        stacks = [
+            _collapse(frames[thread.ident])
+            for thread in threading.enumerate()
+            if thread.ident in frames and self._select(thread)
+        ]
+        with self._lock:
+            for stack in stacks:
+                self._samples[stack] = self._samples.get(stack, 0) + 1
+
+    def samples(self) -> dict[str, int]:
+        "Returns the number of samples per collapsed stack."
+        with self._lock:
+            return dict(self._samples)
+
+    def drain(self) -> dict[str, int]:
+        "Returns the samples taken since the last drain and forgets them."
+        with self._lock:
+            samples, self._samples = self._samples, {}
+            return samples
@@ -0,0 +1,347 @@
+import bisect
+import itertools
+import math
+import time
+from collections import OrderedDict, deque
+from threading import Condition, Lock
+from typing import MutableSequence, Optional, Sequence
+from .arena import TaskArena
+from .entities import Task
+from .metrics import Histogram
+
+_Entry = tuple[float, int, Task, float]
+
+
+class ReadyQueue:
+    """
+    Thread-safe queue of tasks waiting for a worker.
+    A task with an affinity key is preferably dispatched to the worker that last handled the key.
+    Other workers only get it after it waited 'affinity_wait' seconds.
+    Tasks offered by clients are only admitted while the queue is below its limits,
+    globally and per session. Retries are always queued.
+    Tasks with a deadline are dispatched earliest deadline first, before tasks without one,
+    which are dispatched in order. Tasks whose deadline passed are never dispatched.
+    Removed tasks leave their entries behind, which are skipped and dropped lazily.
+    With an arena, tasks without a deadline or affinity key are kept in a TaskArena,
+    and only those with one are kept as objects.
+    """
+
+    SCAN_LIMIT = 64  # Number of tasks at the front of the queue considered per dispatch
+    MAX_KEYS = 10_000  # Number of affinity keys whose worker is remembered
+
+    def __init__(
+        self,
+        affinity_wait: float,
+        wait_time: Optional[Histogram] = None,
+        max_tasks: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_session_tasks: Optional[int] = None,
+        max_session_bytes: Optional[int] = None,
+        arena: bool = False,
+    ) -> None:
+        """
+        wait_time: Records how long each task waited in the queue.
+        max_tasks, max_bytes: Limits of the queued tasks and their data, unlimited if None.
+        max_session_tasks, max_session_bytes: The same limits per session.
+        A task is admitted into an empty queue or session even if its data exceeds the limit.
+        arena: Keep the tasks without a deadline or affinity key in columns, see TaskArena.
+        """
+        self._affinity_wait = affinity_wait
+        self._wait_time = wait_time
+        self._max_tasks = max_tasks
+        self._max_bytes = max_bytes
+        self._max_session_tasks = max_session_tasks
+        self._max_session_bytes = max_session_bytes
+        lock = Lock()
+        self._condition = Condition(lock)  # Notified when a task is queued
+        self._room = Condition(lock)  # Notified when a task leaves the queue
+        self._expiry = Condition(lock)  # Notified when the earliest deadline changes
+        # Entries are (deadline, sequence number, task, time it was queued)
+        self._tasks: deque[_Entry] = deque()  # Without a deadline, in order
+        self._urgent: list[_Entry] = []  # With a deadline, sorted
+        self._arena = TaskArena() if arena else None  # Replaces _tasks for plain tasks
+        # ID -> task of the live entries in _tasks and _urgent. Other entries were removed.
+        self._index: dict[int, Task] = {}
+        self._stale = 0  # Entries of removed tasks
+        self._sequence = itertools.count()
+        self._bytes = 0
+        self._sessions: dict[str, list[int]] = {}  # Session -> [queued tasks, queued bytes]
+        self._generation = 0  # Incremented by every release
+        self._owners: OrderedDict[str, str] = OrderedDict()  # affinity key -> worker ID
+        self._affinity_hits = 0
+        self._affinity_dispatches = 0
+
+    def __len__(self) -> int:
+        with self._condition:
+            return self._queued()
+
+    def _queued(self) -> int:
+        return len(self._index) + (len(self._arena) if self._arena else 0)
+
+    def _is_live(self, entry: _Entry) -> bool:
+        return self._index.get(entry[2].id) is entry[2]
+
+    @property
+    def bytes(self) -> int:
+        "Size of the data of the queued tasks."
+        with self._condition:
+            return self._bytes
+
+    def put(self, task: Task) -> None:
+        "Queues a task regardless of the limits, e.g. a retry."
+        with self._condition:
+            self._put(task)
+
+    def offer(self, tasks: Sequence[Task], timeout: float = 0.0) -> bool:
+        """
+        Queues the tasks together once the limits admit all of them.
+        Returns False if they did not within 'timeout' seconds.
+        """
+        deadline = time.monotonic() + timeout
+        with self._condition:
+            while not self._admits(tasks):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._room.wait(remaining)
+            for task in tasks:
+                self._put(task)
+            return True
+
+    def _admits(self, tasks: Sequence[Task]) -> bool:
+        queued = self._queued()
+        size = sum(len(task.data) for task in tasks)
+        # One task more than 'queued' is checked, so n tasks need room for n - 1 more
+        if queued and _exceeds(
+            queued + len(tasks) - 1, self._bytes + size, self._max_tasks, self._max_bytes
+        ):
+            return False
+        sessions: dict[str, list[int]] = {}  # Session -> [tasks, bytes] offered
+        for task in tasks:
+            if task.session is not None:
+                offered = sessions.setdefault(task.session, [0, 0])
+                offered[0] += 1
+                offered[1] += len(task.data)
+        for session, (count, size) in sessions.items():
+            usage = self._sessions.get(session)
+            if usage is not None and _exceeds(
+                usage[0] + count - 1,
+                usage[1] + size,
+                self._max_session_tasks,
+                self._max_session_bytes,
+            ):
+                return False
+        return True
+
+    def _put(self, task: Task) -> None:
+        if self._arena is not None and task.deadline is None and task.affinity is None:
+            self._arena.append(task, time.monotonic())
+        elif task.deadline is None:
+            self._index[task.id] = task
+            self._tasks.append((math.inf, 0, task, time.monotonic()))
+        else:
+            self._index[task.id] = task
+            entry = (task.deadline, next(self._sequence), task, time.monotonic())
+            bisect.insort(self._urgent, entry)
+            if self._urgent[0] is entry:
+                self._expiry.notify()
+        self._account(task, 1)
+        if task.affinity is None:
+            self._condition.notify()
+        else:
+            self._condition.notify_all()  # Let the preferred worker take it
+
+    def _account(self, task: Task, sign: int) -> None:
+        "Adds a task that was queued (sign 1) or left the queue (sign -1) to the usage."
+        size = len(task.data)
+        self._bytes += sign * size
+        if task.session is not None:
+            usage = self._sessions.setdefault(task.session, [0, 0])
+            usage[0] += sign
+            usage[1] += sign * size
+            if usage[0] == 0:
+                del self._sessions[task.session]
+        if sign < 0:
+            self._room.notify_all()
+
+    def remove(self, task_ids: set[int]) -> list[int]:
+        "Removes the queued tasks with the given IDs and returns the IDs of those removed."
+        with self._condition:
+            removed = [self._index.pop(task_id) for task_id in task_ids if task_id in self._index]
+            self._stale += len(removed)
+            if self._stale > max(self.SCAN_LIMIT, len(self._index)):
+                self._drop_stale()
+            if self._arena is not None:
+                removed.extend(self._arena.remove(task_ids))
+            for task in removed:
+                self._account(task, -1)
+            return [task.id for task in removed]
+
+    def _drop_stale(self) -> None:
+        "Drops the entries of removed tasks, once they outnumber the others."
+        self._tasks = deque(entry for entry in self._tasks if self._is_live(entry))
+        self._urgent = [entry for entry in self._urgent if self._is_live(entry)]
+        self._stale = 0
+
+    def pop_expired(self, timeout: float) -> list[Task]:
+        """
+        Waits up to 'timeout' seconds for the deadline of a queued task to pass,
+        then removes and returns the tasks whose deadline passed.
+        """
+        with self._condition:
+            now = time.monotonic()
+            if not self._urgent or self._urgent[0][0] > now:
+                if self._urgent:
+                    timeout = min(timeout, self._urgent[0][0] - now)
+                self._expiry.wait(timeout)
+                now = time.monotonic()
+            count = bisect.bisect_right(self._urgent, (now, math.inf))
+            expired = [entry[2] for entry in self._urgent[:count] if self._is_live(entry)]
+            self._stale -= count - len(expired)
+            del self._urgent[:count]
+            for task in expired:
+                del self._index[task.id]
+                self._account(task, -1)
+            return expired
+
+    @property
+    def generation(self) -> int:
+        "Number of releases so far, to pass to 'get'."
+        with self._condition:
+            return self._generation
+
+    def release(self) -> None:
+        "Makes every worker that is waiting, or that read the generation before, receive None."
+        with self._condition:
+            self._generation += 1
+            self._condition.notify_all()
+
+    def get(
+        self,
+        worker_id: Optional[str] = None,
+        generation: Optional[int] = None,
+        timeout: Optional[float] = None,
+    ) -> Optional[Task]:
+        """
+        Blocks until a task is available for the worker or the worker is released.
+        Returns None if the worker was released.
+        generation: Value of 'generation' when the worker started waiting. Defaults to now.
+        timeout: Seconds to wait before raising TimeoutError. Waits indefinitely if None.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._condition:
+            if generation is None:
+                generation = self._generation
+            while True:
+                if self._generation != generation:
+                    return None
+                now = time.monotonic()
+                taken, wake_at = self._take(worker_id, now)
+                if taken is not None:
+                    task, queued_at = taken
+                    self._account(task, -1)
+                    if self._wait_time is not None:
+                        self._wait_time.observe(now - queued_at)
+                    self._on_dispatch(task, worker_id)
+                    return task
+                if deadline is not None:
+                    if now >= deadline:
+                        raise TimeoutError("No task available")
+                    wake_at = deadline if wake_at is None else min(wake_at, deadline)
+                self._condition.wait(None if wake_at is None else wake_at - now)
+
+    def _take(
+        self, worker_id: Optional[str], now: float
+    ) -> tuple[Optional[tuple[Task, float]], Optional[float]]:
+        """
+        Removes the task to dispatch to the worker and returns it with the time it was queued,
+        or returns the time when a task becomes available to the worker.
+        """
+        index, wake_at = self._select(self._urgent, worker_id, now)
+        if index is not None:
+            _, _, task, queued_at = self._urgent.pop(index)
+            del self._index[task.id]
+            return (task, queued_at), None
+        while self._tasks and not self._is_live(self._tasks[0]):
+            self._tasks.popleft()
+            self._stale -= 1
+        index, fifo_wake_at = self._select(self._tasks, worker_id, now)
+        if wake_at is None or (fifo_wake_at is not None and fifo_wake_at < wake_at):
+            wake_at = fifo_wake_at
+        if self._arena is not None and len(self._arena):
+            # The arena's first task goes first if it is older and the other is no affinity hit
+            if index is None or (
+                not self._is_hit(self._tasks[index][2], worker_id)
+                and self._arena.first_queued_at() <= self._tasks[index][3]
+            ):
+                return self._arena.popleft(), None
+        if index is not None:
+            _, _, task, queued_at = self._tasks[index]
+            del self._tasks[index]
+            del self._index[task.id]
+            return (task, queued_at), None
+        return None, wake_at
+
+    def _is_hit(self, task: Task, worker_id: Optional[str]) -> bool:
+        "Returns True if the worker last handled the task's affinity key."
+        if task.affinity is None:
+            return False
+        owner = self._owners.get(task.affinity)
+        return owner is not None and owner == worker_id
+
+    def _select(
+        self, entries: MutableSequence[_Entry], worker_id: Optional[str], now: float
+    ) -> tuple[Optional[int], Optional[float]]:
+        """
+        Returns the index of the entry to dispatch to the worker, preferring affinity hits,
+        or the time when a task becomes available to it. Expired tasks are skipped.
+        """
+        first_eligible = None
+        wake_at = None
+        scanned = 0
+        for index, entry in enumerate(entries):
+            if scanned == self.SCAN_LIMIT:
+                break
+            if not self._is_live(entry):
+                continue  # Removed
+            scanned += 1
+            deadline, _, task, queued_at = entry
+            if deadline <= now:
+                continue  # Left for pop_expired
+            if task.affinity is None:
+                owner = None
+            else:
+                owner = self._owners.get(task.affinity)
+                if owner is not None and owner == worker_id:
+                    return index, None
+            if owner is None or now - queued_at >= self._affinity_wait:
+                if first_eligible is None:
+                    first_eligible = index
+            elif wake_at is None or queued_at + self._affinity_wait < wake_at:
+                wake_at = queued_at + self._affinity_wait
+        return first_eligible, wake_at
+
+    def _on_dispatch(self, task: Task, worker_id: Optional[str]) -> None:
+        if task.affinity is None or worker_id is None:
+            return
+        self._affinity_dispatches += 1
+        if self._owners.get(task.affinity) == worker_id:
+            self._affinity_hits += 1
+        self._owners[task.affinity] = worker_id
+        self._owners.move_to_end(task.affinity)
+        if len(self._owners) > self.MAX_KEYS:
+            self._owners.popitem(last=False)
+
+    def affinity_hit_rate(self) -> float:
+        "Returns the fraction of tasks with an affinity key dispatched to their preferred worker."
+        with self._condition:
+            if self._affinity_dispatches == 0:
+                return 0.0
+            return self._affinity_hits / self._affinity_dispatches
+
+
+def _exceeds(tasks: int, size: int, max_tasks: Optional[int], max_bytes: Optional[int]) -> bool:
+    "Returns True if one more task, making the data 'size' bytes, would exceed the limits."
+    return (max_tasks is not None and tasks >= max_tasks) or (
+        max_bytes is not None and size > max_bytes
+    )
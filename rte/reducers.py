@@ -0,0 +1,45 @@
+"""
+Reducers combine the results of two tasks into one on the server, see Server.add_reduction.
+Results are combined in the order they arrive, so reducers must be associative and commutative.
+The built-in reducers work on little-endian arrays of numbers, element by element.
+"""
+
+import heapq
+import operator
+import struct
+from typing import Callable
+
+Reducer = Callable[[bytes, bytes], bytes]
+
+
+def _unpack(fmt: str, data: bytes) -> tuple:
+    count, rest = divmod(len(data), struct.calcsize(fmt))
+    if rest:
+        raise ValueError(f"Result of {len(data)} bytes is no array of '{fmt}'")
+    return struct.unpack(f"<{count}{fmt}", data)
+
+
+def _elementwise(fmt: str, combine: Callable) -> Reducer:
+    def reduce(a: bytes, b: bytes) -> bytes:
+        if len(a) != len(b):
+            raise ValueError(f"Results of {len(a)} and {len(b)} bytes cannot be combined")
+        values = list(map(combine, _unpack(fmt, a), _unpack(fmt, b)))
+        return struct.pack(f"<{len(values)}{fmt}", *values)
+
+    return reduce
+
+
+def top_k_float64(a: bytes, b: bytes) -> bytes:
+    "Keeps the largest values of both, as many as the longer one has, in descending order."
+    x, y = _unpack("d", a), _unpack("d", b)
+    values = heapq.nlargest(max(len(x), len(y)), x + y)
+    return struct.pack(f"<{len(values)}d", *values)
+
+
+REDUCERS: dict[str, Reducer] = {
+    "sum_int64": _elementwise("q", operator.add),  # Also merges histograms of counts
+    "sum_float64": _elementwise("d", operator.add),
+    "min_float64": _elementwise("d", min),
+    "max_float64": _elementwise("d", max),
+    "top_k_float64": top_k_float64,
+}
@@ -1,23 +1,43 @@
-from typing import Optional
+from typing import Iterator, Optional
 import grpc
 from .entities import Task, Result
 from .server import WorkerInterface, ClientInterface
 from .rte_pb2 import (
     Empty as EmptyProto,
-    Task as TaskProto,
+    Bool as BoolProto,
+    Tasks as TasksProto,
+    WorkerId as WorkerIdProto,
+    TaskRequest as TaskRequestProto,
     TaskId as TaskIdProto,
     TaskIds as TaskIdsProto,
+    Count as CountProto,
+    Reduction as ReductionProto,
     Result as ResultProto,
+    BlobId as BlobIdProto,
+    BlobChunk as BlobChunkProto,
 )
 from .rte_pb2_grpc import RteStub
+from .grpc_server import (
+    BLOB_CHUNK_SIZE,
+    deadline_from_proto,
+    results_from_proto,
+    task_ids_to_proto,
+    task_to_proto,
+    timestamps_to_proto,
+)
 
 
 class RemoteServer(WorkerInterface, ClientInterface):
     """RemoteServer is a client that communicates with the server using gRPC."""
 
-    def __init__(self, target) -> None:
+    def __init__(self, target, zero_copy: bool = False) -> None:
+        """
+        zero_copy: The data of the results from get_results are memoryviews into the received
+                   message instead of a copy each. They keep the whole message alive.
+        """
         channel = grpc.insecure_channel(target)
         self.server = RteStub(channel)
+        self._zero_copy = zero_copy
 
     def get_next_id(self) -> Optional[int]:
         msg = EmptyProto()
@@ -30,40 +50,134 @@ class RemoteServer(WorkerInterface, ClientInterface):
         msg = TaskIdProto(value=task_id)
         self.server.return_id(msg)
 
-    def add_task(self, task: Task) -> None:
-        msg = TaskProto(id=task.id, data=task.data)
-        self.server.add_task(msg)
+    def add_task(self, task: Task) -> Optional[float]:
+        retry_after = self.server.add_task(task_to_proto(task))
+        return retry_after.seconds if retry_after.HasField("seconds") else None
 
-    def get_task(self) -> Optional[Task]:
-        msg = EmptyProto()
-        task = self.server.get_task(msg)
+    def reserve_ids(self, count: int) -> list[int]:
+        msg = CountProto(value=count)
+        return list(self.server.reserve_ids(msg).ids)
+
+    def add_graph(self, tasks: list[Task]) -> Optional[float]:
+        msg = TasksProto(tasks=[task_to_proto(task) for task in tasks])
+        try:
+            retry_after = self.server.add_graph(msg)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+                raise ValueError(e.details()) from e
+            raise
+        return retry_after.seconds if retry_after.HasField("seconds") else None
+
+    def add_reduction(self, reduction_id: int, reducer: str, count: int) -> None:
+        msg = ReductionProto(id=reduction_id, reducer=reducer, count=count)
+        try:
+            self.server.add_reduction(msg)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.INVALID_ARGUMENT:
+                raise ValueError(e.details()) from e
+            raise
+
+    def register_worker(self, worker_id: str) -> None:
+        msg = WorkerIdProto(value=worker_id)
+        self.server.register_worker(msg)
+
+    def unregister_worker(self, worker_id: str) -> None:
+        msg = WorkerIdProto(value=worker_id)
+        self.server.unregister_worker(msg)
+
+    def get_task(
+        self, worker_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Optional[Task]:
+        msg = TaskRequestProto(worker_id=worker_id, timeout=timeout)
+        try:
+            task = self.server.get_task(msg)
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.DEADLINE_EXCEEDED:
+                raise TimeoutError("No task available") from e
+            raise
         if task.HasField("id"):
-            return Task(id=task.id, data=task.data)
+            return Task(
+                id=task.id,
+                data=task.data,
+                chunked=task.chunked,
+                max_attempts=task.max_attempts,
+                backoff=task.backoff,
+                blobs=list(task.blobs),
+                affinity=task.affinity if task.HasField("affinity") else None,
+                timed=task.timed,
+                profile=task.profile,
+                attempt=task.attempt,
+                deadline=deadline_from_proto(task),
+            )
         return None
 
     def set_result(self, result: Result) -> None:
-        msg = ResultProto(task_id=result.task_id, success=result.success, data=result.data)
+        msg = ResultProto(
+            task_id=result.task_id,
+            success=result.success,
+            data=result.data,
+            attempts=result.attempts,
+            timestamps=timestamps_to_proto(result.timestamps),
+            profile=result.profile,
+            attempt=result.attempt,
+            expired=result.expired,
+        )
         self.server.set_result(msg)
 
     def get_results(self, task_ids: list[int]) -> list[Optional[Result]]:
-        msg = TaskIdsProto(ids=task_ids)
-        response = self.server.get_results(msg)
-        return [
-            Result(task_id=r.task_id, success=r.success, data=r.data)
-            if r.HasField("task_id")
-            else None
-            for r in response.results
-        ]
+        response = self.server.get_results(task_ids_to_proto(task_ids))
+        ready = {r.task_id: r for r in results_from_proto(response, self._zero_copy)}
+        return [ready.get(task_id) for task_id in task_ids]
 
     def cancel_task(self, task_id: int) -> None:
         msg = TaskIdProto(value=task_id)
         self.server.cancel_task(msg)
 
+    def cancel_tasks(self, task_ids: list[int]) -> None:
+        msg = TaskIdsProto(ids=task_ids)
+        self.server.cancel_tasks(msg)
+
     def is_task_canceled(self, task_id: int) -> bool:
         msg = TaskIdProto(value=task_id)
         response = self.server.is_task_canceled(msg)
         return response.value
 
+    def watch_cancellations(self, worker_id: str) -> Iterator[int]:
+        msg = WorkerIdProto(value=worker_id)
+        for task_id in self.server.watch_cancellations(msg):
+            yield task_id.value
+
+    def put_blob(self, data: bytes) -> str:
+        view = memoryview(data)
+        chunks = (
+            BlobChunkProto(data=bytes(view[start : start + BLOB_CHUNK_SIZE]))
+            for start in range(0, max(len(view), 1), BLOB_CHUNK_SIZE)
+        )
+        return self.server.put_blob(chunks).value
+
+    def get_blob(self, blob_id: str) -> Optional[bytes]:
+        msg = BlobIdProto(value=blob_id)
+        try:
+            return b"".join(chunk.data for chunk in self.server.get_blob(msg))
+        except grpc.RpcError as e:
+            if e.code() == grpc.StatusCode.NOT_FOUND:
+                return None
+            raise
+
+    def delete_blob(self, blob_id: str) -> None:
+        msg = BlobIdProto(value=blob_id)
+        self.server.delete_blob(msg)
+
     def release_waiting_workers(self) -> None:
         msg = EmptyProto()
         self.server.release_waiting_workers(msg)
+
+    def set_profiling(self, enabled: bool) -> None:
+        "Turns the sampling profiler of the server's handler threads and its workers on or off."
+        msg = BoolProto(value=enabled)
+        self.server.set_profiling(msg)
+
+    def get_profile(self) -> str:
+        "Returns the samples of the server's handler threads and its workers, collapsed."
+        msg = EmptyProto()
+        return self.server.get_profile(msg).collapsed
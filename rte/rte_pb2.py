@@ -14,33 +14,61 @@ _sym_db = _symbol_database.Default()
 
 
 
-DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rrte/rte.proto\"\x07\n\x05\x45mpty\"\x15\n\x04\x42ool\x12\r\n\x05value\x18\x01 \x01(\x08\" \n\x04Task\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\"B\n\x0cOptionalTask\x12\x0f\n\x02id\x18\x01 \x01(\rH\x00\x88\x01\x01\x12\x11\n\x04\x64\x61ta\x18\x02 \x01(\x0cH\x01\x88\x01\x01\x42\x05\n\x03_idB\x07\n\x05_data\"\x17\n\x06TaskId\x12\r\n\x05value\x18\x01 \x01(\r\"\x16\n\x07TaskIds\x12\x0b\n\x03ids\x18\x01 \x03(\r\".\n\x0eOptionalTaskId\x12\x12\n\x05value\x18\x01 \x01(\rH\x00\x88\x01\x01\x42\x08\n\x06_value\"8\n\x06Result\x12\x0f\n\x07task_id\x18\x01 \x01(\r\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\"p\n\x0eOptionalResult\x12\x14\n\x07task_id\x18\x01 \x01(\rH\x00\x88\x01\x01\x12\x14\n\x07success\x18\x02 \x01(\x08H\x01\x88\x01\x01\x12\x11\n\x04\x64\x61ta\x18\x03 \x01(\x0cH\x02\x88\x01\x01\x42\n\n\x08_task_idB\n\n\x08_successB\x07\n\x05_data\"3\n\x0fOptionalResults\x12 \n\x07results\x18\x01 \x03(\x0b\x32\x0f.OptionalResult2\xc2\x02\n\x03Rte\x12&\n\x0bget_next_id\x12\x06.Empty\x1a\x0f.OptionalTaskId\x12\x1c\n\treturn_id\x12\x07.TaskId\x1a\x06.Empty\x12\x19\n\x08\x61\x64\x64_task\x12\x05.Task\x1a\x06.Empty\x12!\n\x08get_task\x12\x06.Empty\x1a\r.OptionalTask\x12\x1d\n\nset_result\x12\x07.Result\x1a\x06.Empty\x12)\n\x0bget_results\x12\x08.TaskIds\x1a\x10.OptionalResults\x12\x1e\n\x0b\x63\x61ncel_task\x12\x07.TaskId\x1a\x06.Empty\x12\"\n\x10is_task_canceled\x12\x07.TaskId\x1a\x05.Bool\x12)\n\x17release_waiting_workers\x12\x06.Empty\x1a\x06.Emptyb\x06proto3')
+DESCRIPTOR = _descriptor_pool.Default().AddSerializedFile(b'\n\rrte/rte.proto\"\x07\n\x05\x45mpty\"\x15\n\x04\x42ool\x12\r\n\x05value\x18\x01 \x01(\x08\"\xbe\x02\n\x04Task\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0c\n\x04\x64\x61ta\x18\x02 \x01(\x0c\x12\x0f\n\x07\x63hunked\x18\x03 \x01(\x08\x12\x14\n\x0cmax_attempts\x18\x04 \x01(\r\x12\x0f\n\x07\x62\x61\x63koff\x18\x05 \x01(\x01\x12\r\n\x05\x62lobs\x18\x06 \x03(\t\x12\x15\n\x08\x61\x66\x66inity\x18\x07 \x01(\tH\x00\x88\x01\x01\x12\r\n\x05timed\x18\x08 \x01(\x08\x12\x0f\n\x07profile\x18\t \x01(\x08\x12\x0f\n\x07\x61ttempt\x18\n \x01(\r\x12\x14\n\x07session\x18\x0b \x01(\tH\x01\x88\x01\x01\x12\x15\n\x08\x64\x65\x61\x64line\x18\x0c \x01(\x01H\x02\x88\x01\x01\x12\x14\n\x0c\x64\x65pendencies\x18\r \x03(\r\x12\x16\n\treduction\x18\x0e \x01(\rH\x03\x88\x01\x01\x42\x0b\n\t_affinityB\n\n\x08_sessionB\x0b\n\t_deadlineB\x0c\n\n_reduction\"\x1d\n\x05Tasks\x12\x14\n\x05tasks\x18\x01 \x03(\x0b\x32\x05.Task\"\xeb\x02\n\x0cOptionalTask\x12\x0f\n\x02id\x18\x01 \x01(\rH\x00\x88\x01\x01\x12\x11\n\x04\x64\x61ta\x18\x02 \x01(\x0cH\x01\x88\x01\x01\x12\x14\n\x07\x63hunked\x18\x03 \x01(\x08H\x02\x88\x01\x01\x12\x19\n\x0cmax_attempts\x18\x04 \x01(\rH\x03\x88\x01\x01\x12\x14\n\x07\x62\x61\x63koff\x18\x05 \x01(\x01H\x04\x88\x01\x01\x12\r\n\x05\x62lobs\x18\x06 \x03(\t\x12\x15\n\x08\x61\x66\x66inity\x18\x07 \x01(\tH\x05\x88\x01\x01\x12\x12\n\x05timed\x18\x08 \x01(\x08H\x06\x88\x01\x01\x12\x14\n\x07profile\x18\t \x01(\x08H\x07\x88\x01\x01\x12\x14\n\x07\x61ttempt\x18\n \x01(\rH\x08\x88\x01\x01\x12\x15\n\x08\x64\x65\x61\x64line\x18\x0c \x01(\x01H\t\x88\x01\x01\x42\x05\n\x03_idB\x07\n\x05_dataB\n\n\x08_chunkedB\x0f\n\r_max_attemptsB\n\n\x08_backoffB\x0b\n\t_affinityB\x08\n\x06_timedB\n\n\x08_profileB\n\n\x08_attemptB\x0b\n\t_deadline\"\x19\n\x08WorkerId\x12\r\n\x05value\x18\x01 \x01(\t\"B\n\x0bTaskRequest\x12\x11\n\tworker_id\x18\x01 \x01(\t\x12\x14\n\x07timeout\x18\x02 \x01(\x01H\x00\x88\x01\x01\x42\n\n\x08_timeout\"\x17\n\x06TaskId\x12\r\n\x05value\x18\x01 \x01(\r\"\x16\n\x07TaskIds\x12\x0b\n\x03ids\x18\x01 \x03(\r\"\x1f\n\rSortedTaskIds\x12\x0e\n\x06\x64\x65ltas\x18\x01 \x03(\r\"\x16\n\x05\x43ount\x12\r\n\x05value\x18\x01 \x01(\r\"7\n\tReduction\x12\n\n\x02id\x18\x01 \x01(\r\x12\x0f\n\x07reducer\x18\x02 \x01(\t\x12\r\n\x05\x63ount\x18\x03 \x01(\r\".\n\x0eOptionalTaskId\x12\x12\n\x05value\x18\x01 \x01(\rH\x00\x88\x01\x01\x42\x08\n\x06_value\".\n\nRetryAfter\x12\x14\n\x07seconds\x18\x01 \x01(\x01H\x00\x88\x01\x01\x42\n\n\x08_seconds\"\xe6\x01\n\nTimestamps\x12\x16\n\tsubmitted\x18\x01 \x01(\x01H\x00\x88\x01\x01\x12\x17\n\ndispatched\x18\x02 \x01(\x01H\x01\x88\x01\x01\x12\x14\n\x07started\x18\x03 \x01(\x01H\x02\x88\x01\x01\x12\x15\n\x08\x66inished\x18\x04 \x01(\x01H\x03\x88\x01\x01\x12\x13\n\x06stored\x18\x05 \x01(\x01H\x04\x88\x01\x01\x12\x16\n\tcollected\x18\x06 \x01(\x01H\x05\x88\x01\x01\x42\x0c\n\n_submittedB\r\n\x0b_dispatchedB\n\n\x08_startedB\x0b\n\t_finishedB\t\n\x07_storedB\x0c\n\n_collected\"\xf8\x01\n\x06Result\x12\x0f\n\x07task_id\x18\x01 \x01(\r\x12\x0f\n\x07success\x18\x02 \x01(\x08\x12\x0c\n\x04\x64\x61ta\x18\x03 \x01(\x0c\x12\x10\n\x08\x61ttempts\x18\x04 \x01(\r\x12$\n\ntimestamps\x18\x05 \x01(\x0b\x32\x0b.TimestampsH\x00\x88\x01\x01\x12%\n\x07profile\x18\x06 \x03(\x0b\x32\x14.Result.ProfileEntry\x12\x0f\n\x07\x61ttempt\x18\x07 \x01(\r\x12\x0f\n\x07\x65xpired\x18\x08 \x01(\x08\x1a.\n\x0cProfileEntry\x12\x0b\n\x03key\x18\x01 \x01(\t\x12\r\n\x05value\x18\x02 \x01(\x04:\x02\x38\x01\x42\r\n\x0b_timestamps\"\xe4\x01\n\x0bResultBatch\x12\x10\n\x08task_ids\x18\x01 \x03(\r\x12\x0f\n\x07success\x18\x02 \x03(\x08\x12\x10\n\x08\x61ttempts\x18\x03 \x03(\r\x12\x0f\n\x07\x65xpired\x18\x04 \x03(\x08\x12\x0f\n\x07offsets\x18\x05 \x03(\x04\x12\x0c\n\x04\x64\x61ta\x18\x06 \x01(\x0c\x12\x30\n\ntimestamps\x18\x07 \x03(\x0b\x32\x1c.ResultBatch.TimestampsEntry\x1a>\n\x0fTimestampsEntry\x12\x0b\n\x03key\x18\x01 \x01(\r\x12\x1a\n\x05value\x18\x02 \x01(\x0b\x32\x0b.Timestamps:\x02\x38\x01\"\x1c\n\x07Profile\x12\x11\n\tcollapsed\x18\x01 \x01(\t\"\x17\n\x06\x42lobId\x12\r\n\x05value\x18\x01 \x01(\t\"\x19\n\tBlobChunk\x12\x0c\n\x04\x64\x61ta\x18\x01 \x01(\x0c\x32\xfb\x05\n\x03Rte\x12&\n\x0bget_next_id\x12\x06.Empty\x1a\x0f.OptionalTaskId\x12\x1c\n\treturn_id\x12\x07.TaskId\x1a\x06.Empty\x12\x1e\n\x08\x61\x64\x64_task\x12\x05.Task\x1a\x0b.RetryAfter\x12\x1f\n\x0breserve_ids\x12\x06.Count\x1a\x08.TaskIds\x12 \n\tadd_graph\x12\x06.Tasks\x1a\x0b.RetryAfter\x12#\n\radd_reduction\x12\n.Reduction\x1a\x06.Empty\x12$\n\x0fregister_worker\x12\t.WorkerId\x1a\x06.Empty\x12&\n\x11unregister_worker\x12\t.WorkerId\x1a\x06.Empty\x12\'\n\x08get_task\x12\x0c.TaskRequest\x1a\r.OptionalTask\x12\x1d\n\nset_result\x12\x07.Result\x1a\x06.Empty\x12+\n\x0bget_results\x12\x0e.SortedTaskIds\x1a\x0c.ResultBatch\x12\x1e\n\x0b\x63\x61ncel_task\x12\x07.TaskId\x1a\x06.Empty\x12 \n\x0c\x63\x61ncel_tasks\x12\x08.TaskIds\x1a\x06.Empty\x12\"\n\x10is_task_canceled\x12\x07.TaskId\x1a\x05.Bool\x12+\n\x13watch_cancellations\x12\t.WorkerId\x1a\x07.TaskId0\x01\x12!\n\x08put_blob\x12\n.BlobChunk\x1a\x07.BlobId(\x01\x12!\n\x08get_blob\x12\x07.BlobId\x1a\n.BlobChunk0\x01\x12\x1e\n\x0b\x64\x65lete_blob\x12\x07.BlobId\x1a\x06.Empty\x12)\n\x17release_waiting_workers\x12\x06.Empty\x1a\x06.Empty\x12\x1e\n\rset_profiling\x12\x05.Bool\x1a\x06.Empty\x12\x1f\n\x0bget_profile\x12\x06.Empty\x1a\x08.Profileb\x06proto3')
 
 _globals = globals()
 _builder.BuildMessageAndEnumDescriptors(DESCRIPTOR, _globals)
 _builder.BuildTopDescriptorsAndMessages(DESCRIPTOR, 'rte.rte_pb2', _globals)
 if _descriptor._USE_C_DESCRIPTORS == False:
   DESCRIPTOR._options = None
+  _globals['_RESULT_PROFILEENTRY']._options = None
+  _globals['_RESULT_PROFILEENTRY']._serialized_options = b'8\001'
+  _globals['_RESULTBATCH_TIMESTAMPSENTRY']._options = None
+  _globals['_RESULTBATCH_TIMESTAMPSENTRY']._serialized_options = b'8\001'
   _globals['_EMPTY']._serialized_start=17
   _globals['_EMPTY']._serialized_end=24
   _globals['_BOOL']._serialized_start=26
   _globals['_BOOL']._serialized_end=47
-  _globals['_TASK']._serialized_start=49
-  _globals['_TASK']._serialized_end=81
-  _globals['_OPTIONALTASK']._serialized_start=83
-  _globals['_OPTIONALTASK']._serialized_end=149
-  _globals['_TASKID']._serialized_start=151
-  _globals['_TASKID']._serialized_end=174
-  _globals['_TASKIDS']._serialized_start=176
-  _globals['_TASKIDS']._serialized_end=198
-  _globals['_OPTIONALTASKID']._serialized_start=200
-  _globals['_OPTIONALTASKID']._serialized_end=246
-  _globals['_RESULT']._serialized_start=248
-  _globals['_RESULT']._serialized_end=304
-  _globals['_OPTIONALRESULT']._serialized_start=306
-  _globals['_OPTIONALRESULT']._serialized_end=418
-  _globals['_OPTIONALRESULTS']._serialized_start=420
-  _globals['_OPTIONALRESULTS']._serialized_end=471
-  _globals['_RTE']._serialized_start=474
-  _globals['_RTE']._serialized_end=796
+  _globals['_TASK']._serialized_start=50
+  _globals['_TASK']._serialized_end=368
+  _globals['_TASKS']._serialized_start=370
+  _globals['_TASKS']._serialized_end=399
+  _globals['_OPTIONALTASK']._serialized_start=402
+  _globals['_OPTIONALTASK']._serialized_end=765
+  _globals['_WORKERID']._serialized_start=767
+  _globals['_WORKERID']._serialized_end=792
+  _globals['_TASKREQUEST']._serialized_start=794
+  _globals['_TASKREQUEST']._serialized_end=860
+  _globals['_TASKID']._serialized_start=862
+  _globals['_TASKID']._serialized_end=885
+  _globals['_TASKIDS']._serialized_start=887
+  _globals['_TASKIDS']._serialized_end=909
+  _globals['_SORTEDTASKIDS']._serialized_start=911
+  _globals['_SORTEDTASKIDS']._serialized_end=942
+  _globals['_COUNT']._serialized_start=944
+  _globals['_COUNT']._serialized_end=966
+  _globals['_REDUCTION']._serialized_start=968
+  _globals['_REDUCTION']._serialized_end=1023
+  _globals['_OPTIONALTASKID']._serialized_start=1025
+  _globals['_OPTIONALTASKID']._serialized_end=1071
+  _globals['_RETRYAFTER']._serialized_start=1073
+  _globals['_RETRYAFTER']._serialized_end=1119
+  _globals['_TIMESTAMPS']._serialized_start=1122
+  _globals['_TIMESTAMPS']._serialized_end=1352
+  _globals['_RESULT']._serialized_start=1355
+  _globals['_RESULT']._serialized_end=1603
+  _globals['_RESULT_PROFILEENTRY']._serialized_start=1542
+  _globals['_RESULT_PROFILEENTRY']._serialized_end=1588
+  _globals['_RESULTBATCH']._serialized_start=1606
+  _globals['_RESULTBATCH']._serialized_end=1834
+  _globals['_RESULTBATCH_TIMESTAMPSENTRY']._serialized_start=1772
+  _globals['_RESULTBATCH_TIMESTAMPSENTRY']._serialized_end=1834
+  _globals['_PROFILE']._serialized_start=1836
+  _globals['_PROFILE']._serialized_end=1864
+  _globals['_BLOBID']._serialized_start=1866
+  _globals['_BLOBID']._serialized_end=1889
+  _globals['_BLOBCHUNK']._serialized_start=1891
+  _globals['_BLOBCHUNK']._serialized_end=1916
+  _globals['_RTE']._serialized_start=1919
+  _globals['_RTE']._serialized_end=2682
 # @@protoc_insertion_point(module_scope)
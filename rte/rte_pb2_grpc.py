@@ -27,11 +27,36 @@ class RteStub(object):
         self.add_task = channel.unary_unary(
                 '/Rte/add_task',
                 request_serializer=rte_dot_rte__pb2.Task.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.RetryAfter.FromString,
+                )
+        self.reserve_ids = channel.unary_unary(
+                '/Rte/reserve_ids',
+                request_serializer=rte_dot_rte__pb2.Count.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.TaskIds.FromString,
+                )
+        self.add_graph = channel.unary_unary(
+                '/Rte/add_graph',
+                request_serializer=rte_dot_rte__pb2.Tasks.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.RetryAfter.FromString,
+                )
+        self.add_reduction = channel.unary_unary(
+                '/Rte/add_reduction',
+                request_serializer=rte_dot_rte__pb2.Reduction.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                )
+        self.register_worker = channel.unary_unary(
+                '/Rte/register_worker',
+                request_serializer=rte_dot_rte__pb2.WorkerId.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                )
+        self.unregister_worker = channel.unary_unary(
+                '/Rte/unregister_worker',
+                request_serializer=rte_dot_rte__pb2.WorkerId.SerializeToString,
                 response_deserializer=rte_dot_rte__pb2.Empty.FromString,
                 )
         self.get_task = channel.unary_unary(
                 '/Rte/get_task',
-                request_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+                request_serializer=rte_dot_rte__pb2.TaskRequest.SerializeToString,
                 response_deserializer=rte_dot_rte__pb2.OptionalTask.FromString,
                 )
         self.set_result = channel.unary_unary(
@@ -41,24 +66,59 @@ class RteStub(object):
                 )
         self.get_results = channel.unary_unary(
                 '/Rte/get_results',
-                request_serializer=rte_dot_rte__pb2.TaskIds.SerializeToString,
-                response_deserializer=rte_dot_rte__pb2.OptionalResults.FromString,
+                request_serializer=rte_dot_rte__pb2.SortedTaskIds.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.ResultBatch.FromString,
                 )
         self.cancel_task = channel.unary_unary(
                 '/Rte/cancel_task',
                 request_serializer=rte_dot_rte__pb2.TaskId.SerializeToString,
                 response_deserializer=rte_dot_rte__pb2.Empty.FromString,
                 )
+        self.cancel_tasks = channel.unary_unary(
+                '/Rte/cancel_tasks',
+                request_serializer=rte_dot_rte__pb2.TaskIds.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                )
         self.is_task_canceled = channel.unary_unary(
                 '/Rte/is_task_canceled',
                 request_serializer=rte_dot_rte__pb2.TaskId.SerializeToString,
                 response_deserializer=rte_dot_rte__pb2.Bool.FromString,
                 )
+        self.watch_cancellations = channel.unary_stream(
+                '/Rte/watch_cancellations',
+                request_serializer=rte_dot_rte__pb2.WorkerId.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.TaskId.FromString,
+                )
+        self.put_blob = channel.stream_unary(
+                '/Rte/put_blob',
+                request_serializer=rte_dot_rte__pb2.BlobChunk.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.BlobId.FromString,
+                )
+        self.get_blob = channel.unary_stream(
+                '/Rte/get_blob',
+                request_serializer=rte_dot_rte__pb2.BlobId.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.BlobChunk.FromString,
+                )
+        self.delete_blob = channel.unary_unary(
+                '/Rte/delete_blob',
+                request_serializer=rte_dot_rte__pb2.BlobId.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                )
         self.release_waiting_workers = channel.unary_unary(
                 '/Rte/release_waiting_workers',
                 request_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
                 response_deserializer=rte_dot_rte__pb2.Empty.FromString,
                 )
+        self.set_profiling = channel.unary_unary(
+                '/Rte/set_profiling',
+                request_serializer=rte_dot_rte__pb2.Bool.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                )
+        self.get_profile = channel.unary_unary(
+                '/Rte/get_profile',
+                request_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+                response_deserializer=rte_dot_rte__pb2.Profile.FromString,
+                )
 
 
 class RteServicer(object):
@@ -82,6 +142,36 @@ class RteServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def reserve_ids(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def add_graph(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def add_reduction(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def register_worker(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def unregister_worker(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def get_task(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
@@ -106,18 +196,60 @@ class RteServicer(object):
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def cancel_tasks(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def is_task_canceled(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def watch_cancellations(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def put_blob(self, request_iterator, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def get_blob(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def delete_blob(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
     def release_waiting_workers(self, request, context):
         """Missing associated documentation comment in .proto file."""
         context.set_code(grpc.StatusCode.UNIMPLEMENTED)
         context.set_details('Method not implemented!')
         raise NotImplementedError('Method not implemented!')
 
+    def set_profiling(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
+    def get_profile(self, request, context):
+        """Missing associated documentation comment in .proto file."""
+        context.set_code(grpc.StatusCode.UNIMPLEMENTED)
+        context.set_details('Method not implemented!')
+        raise NotImplementedError('Method not implemented!')
+
 
 def add_RteServicer_to_server(servicer, server):
     rpc_method_handlers = {
@@ -134,11 +266,36 @@ def add_RteServicer_to_server(servicer, server):
             'add_task': grpc.unary_unary_rpc_method_handler(
                     servicer.add_task,
                     request_deserializer=rte_dot_rte__pb2.Task.FromString,
+                    response_serializer=rte_dot_rte__pb2.RetryAfter.SerializeToString,
+            ),
+            'reserve_ids': grpc.unary_unary_rpc_method_handler(
+                    servicer.reserve_ids,
+                    request_deserializer=rte_dot_rte__pb2.Count.FromString,
+                    response_serializer=rte_dot_rte__pb2.TaskIds.SerializeToString,
+            ),
+            'add_graph': grpc.unary_unary_rpc_method_handler(
+                    servicer.add_graph,
+                    request_deserializer=rte_dot_rte__pb2.Tasks.FromString,
+                    response_serializer=rte_dot_rte__pb2.RetryAfter.SerializeToString,
+            ),
+            'add_reduction': grpc.unary_unary_rpc_method_handler(
+                    servicer.add_reduction,
+                    request_deserializer=rte_dot_rte__pb2.Reduction.FromString,
+                    response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+            ),
+            'register_worker': grpc.unary_unary_rpc_method_handler(
+                    servicer.register_worker,
+                    request_deserializer=rte_dot_rte__pb2.WorkerId.FromString,
+                    response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+            ),
+            'unregister_worker': grpc.unary_unary_rpc_method_handler(
+                    servicer.unregister_worker,
+                    request_deserializer=rte_dot_rte__pb2.WorkerId.FromString,
                     response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
             ),
             'get_task': grpc.unary_unary_rpc_method_handler(
                     servicer.get_task,
-                    request_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                    request_deserializer=rte_dot_rte__pb2.TaskRequest.FromString,
                     response_serializer=rte_dot_rte__pb2.OptionalTask.SerializeToString,
             ),
             'set_result': grpc.unary_unary_rpc_method_handler(
@@ -148,24 +305,59 @@ def add_RteServicer_to_server(servicer, server):
             ),
             'get_results': grpc.unary_unary_rpc_method_handler(
                     servicer.get_results,
-                    request_deserializer=rte_dot_rte__pb2.TaskIds.FromString,
-                    response_serializer=rte_dot_rte__pb2.OptionalResults.SerializeToString,
+                    request_deserializer=rte_dot_rte__pb2.SortedTaskIds.FromString,
+                    response_serializer=rte_dot_rte__pb2.ResultBatch.SerializeToString,
             ),
             'cancel_task': grpc.unary_unary_rpc_method_handler(
                     servicer.cancel_task,
                     request_deserializer=rte_dot_rte__pb2.TaskId.FromString,
                     response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
             ),
+            'cancel_tasks': grpc.unary_unary_rpc_method_handler(
+                    servicer.cancel_tasks,
+                    request_deserializer=rte_dot_rte__pb2.TaskIds.FromString,
+                    response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+            ),
             'is_task_canceled': grpc.unary_unary_rpc_method_handler(
                     servicer.is_task_canceled,
                     request_deserializer=rte_dot_rte__pb2.TaskId.FromString,
                     response_serializer=rte_dot_rte__pb2.Bool.SerializeToString,
             ),
+            'watch_cancellations': grpc.unary_stream_rpc_method_handler(
+                    servicer.watch_cancellations,
+                    request_deserializer=rte_dot_rte__pb2.WorkerId.FromString,
+                    response_serializer=rte_dot_rte__pb2.TaskId.SerializeToString,
+            ),
+            'put_blob': grpc.stream_unary_rpc_method_handler(
+                    servicer.put_blob,
+                    request_deserializer=rte_dot_rte__pb2.BlobChunk.FromString,
+                    response_serializer=rte_dot_rte__pb2.BlobId.SerializeToString,
+            ),
+            'get_blob': grpc.unary_stream_rpc_method_handler(
+                    servicer.get_blob,
+                    request_deserializer=rte_dot_rte__pb2.BlobId.FromString,
+                    response_serializer=rte_dot_rte__pb2.BlobChunk.SerializeToString,
+            ),
+            'delete_blob': grpc.unary_unary_rpc_method_handler(
+                    servicer.delete_blob,
+                    request_deserializer=rte_dot_rte__pb2.BlobId.FromString,
+                    response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+            ),
             'release_waiting_workers': grpc.unary_unary_rpc_method_handler(
                     servicer.release_waiting_workers,
                     request_deserializer=rte_dot_rte__pb2.Empty.FromString,
                     response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
             ),
+            'set_profiling': grpc.unary_unary_rpc_method_handler(
+                    servicer.set_profiling,
+                    request_deserializer=rte_dot_rte__pb2.Bool.FromString,
+                    response_serializer=rte_dot_rte__pb2.Empty.SerializeToString,
+            ),
+            'get_profile': grpc.unary_unary_rpc_method_handler(
+                    servicer.get_profile,
+                    request_deserializer=rte_dot_rte__pb2.Empty.FromString,
+                    response_serializer=rte_dot_rte__pb2.Profile.SerializeToString,
+            ),
     }
     generic_handler = grpc.method_handlers_generic_handler(
             'Rte', rpc_method_handlers)
@@ -223,6 +415,91 @@ class Rte(object):
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/Rte/add_task',
             rte_dot_rte__pb2.Task.SerializeToString,
+            rte_dot_rte__pb2.RetryAfter.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def reserve_ids(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/reserve_ids',
+            rte_dot_rte__pb2.Count.SerializeToString,
+            rte_dot_rte__pb2.TaskIds.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def add_graph(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/add_graph',
+            rte_dot_rte__pb2.Tasks.SerializeToString,
+            rte_dot_rte__pb2.RetryAfter.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def add_reduction(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/add_reduction',
+            rte_dot_rte__pb2.Reduction.SerializeToString,
+            rte_dot_rte__pb2.Empty.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def register_worker(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/register_worker',
+            rte_dot_rte__pb2.WorkerId.SerializeToString,
+            rte_dot_rte__pb2.Empty.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def unregister_worker(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/unregister_worker',
+            rte_dot_rte__pb2.WorkerId.SerializeToString,
             rte_dot_rte__pb2.Empty.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -239,7 +516,7 @@ class Rte(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/Rte/get_task',
-            rte_dot_rte__pb2.Empty.SerializeToString,
+            rte_dot_rte__pb2.TaskRequest.SerializeToString,
             rte_dot_rte__pb2.OptionalTask.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
@@ -273,8 +550,8 @@ class Rte(object):
             timeout=None,
             metadata=None):
         return grpc.experimental.unary_unary(request, target, '/Rte/get_results',
-            rte_dot_rte__pb2.TaskIds.SerializeToString,
-            rte_dot_rte__pb2.OptionalResults.FromString,
+            rte_dot_rte__pb2.SortedTaskIds.SerializeToString,
+            rte_dot_rte__pb2.ResultBatch.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
@@ -295,6 +572,23 @@ class Rte(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def cancel_tasks(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/cancel_tasks',
+            rte_dot_rte__pb2.TaskIds.SerializeToString,
+            rte_dot_rte__pb2.Empty.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def is_task_canceled(request,
             target,
@@ -312,6 +606,74 @@ class Rte(object):
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
 
+    @staticmethod
+    def watch_cancellations(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/Rte/watch_cancellations',
+            rte_dot_rte__pb2.WorkerId.SerializeToString,
+            rte_dot_rte__pb2.TaskId.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def put_blob(request_iterator,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.stream_unary(request_iterator, target, '/Rte/put_blob',
+            rte_dot_rte__pb2.BlobChunk.SerializeToString,
+            rte_dot_rte__pb2.BlobId.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def get_blob(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_stream(request, target, '/Rte/get_blob',
+            rte_dot_rte__pb2.BlobId.SerializeToString,
+            rte_dot_rte__pb2.BlobChunk.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def delete_blob(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/delete_blob',
+            rte_dot_rte__pb2.BlobId.SerializeToString,
+            rte_dot_rte__pb2.Empty.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
     @staticmethod
     def release_waiting_workers(request,
             target,
@@ -328,3 +690,37 @@ class Rte(object):
             rte_dot_rte__pb2.Empty.FromString,
             options, channel_credentials,
             insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def set_profiling(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/set_profiling',
+            rte_dot_rte__pb2.Bool.SerializeToString,
+            rte_dot_rte__pb2.Empty.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
+
+    @staticmethod
+    def get_profile(request,
+            target,
+            options=(),
+            channel_credentials=None,
+            call_credentials=None,
+            insecure=False,
+            compression=None,
+            wait_for_ready=None,
+            timeout=None,
+            metadata=None):
+        return grpc.experimental.unary_unary(request, target, '/Rte/get_profile',
+            rte_dot_rte__pb2.Empty.SerializeToString,
+            rte_dot_rte__pb2.Profile.FromString,
+            options, channel_credentials,
+            insecure, call_credentials, compression, wait_for_ready, timeout, metadata)
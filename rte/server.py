@@ -1,31 +1,65 @@
 import logging
+import math
+import time
 from abc import ABC, abstractmethod
-from collections import deque
-from queue import Queue, Empty
-from threading import Lock
-from typing import Optional
+from collections import OrderedDict, deque
+from dataclasses import dataclass, field, replace
+from queue import Empty, SimpleQueue
+from threading import Event, Lock, Thread, Timer
+from typing import Iterator, Optional, Union
 from .heartbeat import MultiHeartbeatMonitor
-from .entities import Task, Result
+from .entities import Task, Result, Timestamps
 from .id_generator import IdGenerator
+from .blobs import blob_id
+from . import chunking
+from .ready_queue import ReadyQueue
+from .metrics import Registry
+from .tracing import Tracer
+from .profiling import format_collapsed, merge_samples
+from .reducers import REDUCERS, Reducer
 
 
 class WorkerInterface(ABC):
     @abstractmethod
-    def get_task(self) -> Optional[Task]:
-        "Returns a task for the worker to execute or None."
+    def register_worker(self, worker_id: str) -> None:
+        "Announces a worker, which counts as idle until it takes a task or its lease expires."
+
+    @abstractmethod
+    def unregister_worker(self, worker_id: str) -> None:
+        "Removes a worker, e.g. when it shuts down."
+
+    @abstractmethod
+    def get_task(
+        self, worker_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Optional[Task]:
+        """
+        Returns a task for the worker with the given ID to execute, or None if the worker was
+        released. Raises TimeoutError if no task arrived within 'timeout' seconds.
+        """
 
     @abstractmethod
     def set_result(self, result: Result) -> None:
         "Sets the result of a task."
 
+    @abstractmethod
+    def get_blob(self, blob_id: str) -> Optional[bytes]:
+        "Returns the blob with the given ID or None."
+
     @abstractmethod
     def is_task_canceled(self, task_id: int) -> bool:
         """
         Returns True iff the task is canceled.
-        If so, the task is removed from the list of canceled tasks.
+        The task stays canceled until its result is set.
         Refreshs the task's heartbeat.
         """
 
+    @abstractmethod
+    def watch_cancellations(self, worker_id: str) -> Iterator[int]:
+        """
+        Yields the IDs of the worker's running tasks as they are canceled,
+        until the worker is unregistered.
+        """
+
 
 class ClientInterface(ABC):
     @abstractmethod
@@ -37,8 +71,39 @@ class ClientInterface(ABC):
         "Returns a task ID to the server."
 
     @abstractmethod
-    def add_task(self, task: Task) -> None:
-        "Adds a task to the server."
+    def add_task(self, task: Task) -> Optional[float]:
+        """
+        Adds a task to the server. Returns None if it was queued, or the seconds after which
+        to offer it again if the server is full. The task ID stays reserved meanwhile.
+        """
+
+    @abstractmethod
+    def reserve_ids(self, count: int) -> list[int]:
+        """
+        Returns task IDs regardless of the worker demand, for the tasks of a graph that wait for
+        their dependencies.
+        """
+
+    @abstractmethod
+    def add_graph(self, tasks: list[Task]) -> Optional[float]:
+        """
+        Adds tasks that depend on each other, listed after their dependencies, like add_task.
+        A task is queued once its dependencies succeeded, with its data followed by their
+        results as input: appended for a single dependency, else packed with chunking.pack
+        as [data, *results]. If a dependency fails, so does the task.
+        Only the results of tasks no other task depends on are returned.
+        """
+
+    @abstractmethod
+    def add_reduction(self, reduction_id: int, reducer: str, count: int) -> None:
+        """
+        Registers a reduction of the results of 'count' tasks added later with
+        Task.reduction = reduction_id, e.g. an ID from 'reserve_ids'. The results are
+        combined with the named reducer as they arrive, instead of being returned, and the
+        combined value is the result of 'reduction_id'. It fails as soon as one of the tasks
+        fails or is canceled; the results of its other tasks are dropped. Raises ValueError for
+        an unknown reducer or no tasks, and takes 'reduction_id' back.
+        """
 
     @abstractmethod
     def get_results(self, task_ids: list[int]) -> list[Optional[Result]]:
@@ -48,98 +113,789 @@ class ClientInterface(ABC):
     def cancel_task(self, task_id: int) -> None:
         "Cancels a task."
 
+    @abstractmethod
+    def cancel_tasks(self, task_ids: list[int]) -> None:
+        """
+        Cancels many tasks. Queued tasks are dropped and fail without being dispatched,
+        the workers of running tasks are notified.
+        """
+
+    @abstractmethod
+    def put_blob(self, data: bytes) -> str:
+        "Stores a blob that tasks can reference and returns its ID."
+
+    @abstractmethod
+    def delete_blob(self, blob_id: str) -> None:
+        "Deletes a blob."
+
 
 class ServerInterface(WorkerInterface, ClientInterface):
     pass
 
 
+@dataclass
+class _Waiting:
+    "A task of a graph and the results of the dependencies that finished so far."
+
+    task: Task
+    inputs: dict[int, bytes] = field(default_factory=dict)  # Dependency ID -> result
+
+    def add(self, result: Result) -> Union[Task, Result, None]:
+        """
+        Adds the result of a dependency. Returns the task with its input once all dependencies
+        succeeded, or its failed result if the dependency failed.
+        """
+        if not result.success:
+            return Result(self.task.id, success=False, data=b"")
+        self.inputs[result.task_id] = result.data
+        if len(self.inputs) < len(set(self.task.dependencies)):
+            return None
+        results = [self.inputs[tid] for tid in self.task.dependencies]
+        if len(results) == 1:
+            data = self.task.data + results[0]
+        else:
+            data = chunking.pack([self.task.data, *results])
+        return replace(self.task, data=data)
+
+
+@dataclass
+class _Reduction:
+    "A reduction and the combined value of the results that arrived so far."
+
+    reduction_id: int
+    reducer: Reducer
+    remaining: int  # Results still to come
+    value: Optional[bytes] = None
+
+    def add(self, result: Result) -> Optional[Result]:
+        "Combines a result into the value. Returns the final result once all arrived or one failed."
+        if not result.success:
+            return Result(self.reduction_id, success=False, data=b"")
+        try:
+            if self.value is None:
+                self.value = result.data
+            else:
+                self.value = self.reducer(self.value, result.data)
+        except Exception as e:
+            logging.error("Reduction %s failed: %s", self.reduction_id, e)
+            return Result(self.reduction_id, success=False, data=b"")
+        self.remaining -= 1
+        if self.remaining > 0:
+            return None
+        return Result(self.reduction_id, success=True, data=self.value)
+
+
+@dataclass
+class _Shard:
+    "State of the tasks whose IDs map to the shard, protected by its lock."
+
+    lock: Lock = field(default_factory=Lock)
+    running: dict[int, Task] = field(default_factory=dict)  # Dispatched, kept for retries
+    workers: dict[int, str] = field(default_factory=dict)  # Running task -> worker ID
+    attempts: dict[int, int] = field(default_factory=dict)  # task_id -> number of dispatches
+    results: dict[int, Result] = field(default_factory=dict)
+    stored_at: dict[int, float] = field(default_factory=dict)
+    timestamps: dict[int, Timestamps] = field(default_factory=dict)  # Of unfinished timed tasks
+    canceled: set[int] = field(default_factory=set)
+    # Attempts that timed out, per task, to fence their late results. Oldest first.
+    abandoned: OrderedDict[int, set[int]] = field(default_factory=OrderedDict)
+    # Tasks waiting for their dependencies, and reductions waiting for results
+    waiting: dict[int, Union[_Waiting, _Reduction]] = field(default_factory=dict)
+    dependents: dict[int, list[int]] = field(default_factory=dict)  # task_id -> waiting IDs
+
+
 class Server(ServerInterface):
-    def __init__(self, task_timeout: float) -> None:
-        self._lock = Lock()
-        self._unassigned_ids: deque[int] = deque()
-        self._tasks: Queue[Optional[Task]] = Queue()
+    """
+    Task state is sharded by task ID, so calls for different tasks rarely contend.
+    Locks are only taken in the order: _lock, a shard's lock, then the locks of the heartbeat
+    monitor, the ready queue and the metrics. Heartbeat and retry callbacks hold no lock.
+
+    Every dispatch of a task is an attempt with its own number, which the worker returns with
+    the result. A late success of a timed out attempt completes the task if it is not complete
+    yet, and cancels the redundant retry. Later results of a completed task are ignored.
+
+    Tasks whose deadline passes before they are dispatched fail with an expired result,
+    stored by a thread started with the first task that has a deadline.
+
+    The result of a task that others depend on, or that is reduced, is handed off to them
+    instead of being stored. Hand-offs are queued while a shard's lock is held and passed on
+    by the same thread once it released the lock. Reducers run with the reduction's shard
+    lock held, so they should be fast.
+    """
+
+    FENCE_LIMIT = 100_000  # Number of tasks whose timed out attempts are remembered
+    EXPIRY_POLL = 1.0  # Seconds between checks of the expiry thread whether the server stopped
+
+    def __init__(
+        self,
+        task_timeout: float,
+        queue_ahead: int = 0,
+        affinity_wait: float = 0.1,
+        metrics: Optional[Registry] = None,
+        tracer: Optional[Tracer] = None,
+        shards: int = 16,
+        worker_lease: float = 5.0,
+        max_queued_tasks: Optional[int] = None,
+        max_queued_bytes: Optional[int] = None,
+        max_session_tasks: Optional[int] = None,
+        max_session_bytes: Optional[int] = None,
+        admission_wait: float = 0.0,
+        retry_after: float = 0.1,
+        reducers: Optional[dict[str, Reducer]] = None,
+        arena: bool = False,
+    ) -> None:
+        """
+        task_timeout: Seconds without a heartbeat after which a running task is failed.
+        queue_ahead: Number of task IDs handed out beyond the current worker demand,
+                     so clients can queue tasks before workers ask for them.
+        affinity_wait: Seconds a task with an affinity key waits for the worker that last
+                       handled the key, before any worker may take it.
+        metrics: Registry to record the server's metrics in. Defaults to a new registry.
+        tracer: Records the server's queue events, if given.
+        shards: Number of independently locked partitions of the task state.
+        worker_lease: Seconds an idle worker counts as available after it registered or its
+                      last request for a task timed out. Task IDs are only handed out for
+                      available workers, so a dead worker stops attracting tasks.
+        max_queued_tasks, max_queued_bytes: Limits of the tasks waiting for a worker and of
+                                            their data. Unlimited if None.
+        max_session_tasks, max_session_bytes: The same limits per client session.
+        admission_wait: Seconds add_task blocks for room in the queue before it rejects a task.
+        retry_after: Seconds a client is told to wait before it offers a rejected task again.
+        reducers: Reducers by name for add_reduction, in addition to those in reducers.py.
+        arena: Keep queued tasks without a deadline or affinity key in columns instead of
+               objects, see TaskArena, which takes a fraction of the memory for small tasks.
+        """
+        self.metrics = Registry() if metrics is None else metrics
+        self._tracer = tracer
+        self._lock = Lock()  # Protects the task IDs, workers, retries, blobs and profile
+        self._queue_ahead = queue_ahead
+        self._returned_ids: deque[int] = deque()
+        self._outstanding = 0  # IDs handed out whose tasks have not been dispatched
+        self._waiting = 0  # Workers blocked in get_task
+        self._anonymous = 0  # Workers without an ID blocked in get_task
+        self._worker_lease = worker_lease
+        self._leases: dict[str, float] = {}  # Idle worker ID -> expiry, infinite while blocked
+        self._registered: set[str] = set()
+        self._released: set[str] = set()  # Receive None on their next request
+        self._watchers: dict[str, SimpleQueue] = {}  # Worker ID -> canceled task IDs
+        self._admission_wait = admission_wait
+        self._reducers = {**REDUCERS, **(reducers or {})}
+        self._retry_after = retry_after
+        self._tasks = ReadyQueue(
+            affinity_wait,
+            self.metrics.histogram(
+                "rte_queue_wait_seconds", "Time tasks wait in the queue before dispatch."
+            ),
+            max_queued_tasks,
+            max_queued_bytes,
+            max_session_tasks,
+            max_session_bytes,
+            arena,
+        )
         self._next_id = IdGenerator()
-        self._results: dict[int, Result] = {}
-        self._canceled: set[int] = set()
-        self._heartbeats = MultiHeartbeatMonitor(task_timeout, self._on_task_timeout)
+        self._shards = [_Shard() for _ in range(shards)]
+        self._retry_timers: set[Timer] = set()
+        self._handoffs: SimpleQueue = SimpleQueue()  # (result, IDs of the dependent tasks)
+        self._expiry_thread: Optional[Thread] = None
+        self._stopped = Event()
+        self._blobs: dict[str, bytes] = {}
+        self._profiling = False
+        self._profile: dict[str, int] = {}  # Merged samples of all workers
+        self._heartbeats = MultiHeartbeatMonitor(task_timeout, self._on_task_timeout, shards)
+        self._init_metrics()
 
-    def _on_task_timeout(self, task_id: int) -> None:
+    def _init_metrics(self) -> None:
+        m = self.metrics
+        m.gauge("rte_queue_depth", "Tasks waiting for a worker.", function=self._tasks.__len__)
+        m.gauge("rte_queued_bytes", "Data of queued tasks.", function=self._queued_bytes)
+        m.gauge("rte_tasks_in_flight", "Dispatched tasks.", function=self._in_flight)
+        m.gauge("rte_pending_results", "Uncollected results.", function=self._pending_results)
+        m.gauge(
+            "rte_waiting_workers", "Workers blocked in get_task.", function=self._waiting_workers
+        )
+        m.gauge("rte_idle_workers", "Workers available for a task.", function=self._idle_workers)
+        self._submitted = m.counter("rte_tasks_submitted_total", "Tasks added by clients.")
+        self._rejected = m.counter("rte_tasks_rejected_total", "Tasks refused by a full queue.")
+        self._succeeded = m.counter(
+            "rte_tasks_completed_total", "Final results.", {"outcome": "success"}
+        )
+        self._failed = m.counter(
+            "rte_tasks_completed_total", "Final results.", {"outcome": "failure"}
+        )
+        self._timeouts = m.counter("rte_task_timeouts_total", "Tasks without a heartbeat.")
+        self._cancellations = m.counter("rte_task_cancellations_total", "Canceled tasks.")
+        self._retries = m.counter("rte_task_retries_total", "Requeued tasks.")
+        self._expired = m.counter("rte_tasks_expired_total", "Tasks not dispatched in time.")
+        self._collect_wait = m.histogram(
+            "rte_result_wait_seconds", "Time results wait on the server until collected."
+        )
+
+    def _shard(self, task_id: int) -> _Shard:
+        return self._shards[task_id % len(self._shards)]
+
+    def _queued_bytes(self) -> int:
+        return self._tasks.bytes
+
+    def _in_flight(self) -> int:
+        return sum(len(shard.running) for shard in self._shards)
+
+    def _pending_results(self) -> int:
+        return sum(len(shard.results) for shard in self._shards)
+
+    def _waiting_workers(self) -> int:
+        return self._waiting
+
+    def _idle_workers(self) -> int:
         with self._lock:
+            return self._demand()
+
+    def _demand(self) -> int:
+        "Returns the number of workers available for a task, with _lock held."
+        now = time.monotonic()
+        expired = [wid for wid, expiry in self._leases.items() if expiry <= now]
+        for wid in expired:
+            del self._leases[wid]
+        return self._anonymous + len(self._leases)
+
+    def _trace(self, name: str, task_id: int) -> None:
+        if self._tracer is not None:
+            self._tracer.instant(name, "server", task=task_id)
+            self._tracer.counter("queue depth", "server", len(self._tasks))
+
+    def stats(self) -> dict:
+        "Returns the current value of every metric of the server."
+        return self.metrics.stats()
+
+    def _on_task_timeout(self, task_id: int) -> None:
+        shard = self._shard(task_id)
+        with shard.lock:
+            if task_id not in shard.running:
+                return  # The result arrived while the timeout was reported
             logging.info("Task %s timed out", task_id)
-            self._results[task_id] = Result(task_id, success=False, data=b"")
-            if task_id in self._canceled:
-                self._canceled.remove(task_id)
+            self._timeouts.inc()
+            self._trace("timed out", task_id)
+            self._abandon(shard, task_id, shard.attempts.get(task_id, 1))
+            retry = self._finish(shard, Result(task_id, success=False, data=b""))
+        if retry is not None:
+            self._retry(*retry)
+        self._hand_off()
 
-    def get_next_id(self) -> Optional[int]:
-        try:
-            task_id = self._unassigned_ids.popleft()
-            logging.info("Server sends task id: %s", task_id)
-            return task_id
-        except IndexError:
-            logging.debug("Server has no task ids")
+    def _finish(self, shard: _Shard, result: Result) -> Optional[tuple[Task, float]]:
+        """
+        Stores the result of a task, or queues its hand-off to the tasks depending on it,
+        with the shard's lock held.
+        Returns the task and the delay before its retry instead if it failed and has
+        attempts left.
+        """
+        tid = result.task_id
+        task = shard.running.pop(tid, None)
+        shard.workers.pop(tid, None)
+        attempts = shard.attempts.get(tid, 1)
+        if not result.success and task is not None and tid not in shard.canceled:
+            if attempts < task.max_attempts:
+                return task, task.backoff * 2 ** (attempts - 1)
+        shard.attempts.pop(tid, None)
+        shard.canceled.discard(tid)
+        result.attempts = attempts
+        now = time.monotonic()
+        timestamps = shard.timestamps.pop(tid, None)
+        if timestamps is not None:
+            if result.timestamps is not None:
+                timestamps.started = result.timestamps.started
+                timestamps.finished = result.timestamps.finished
+            timestamps.stored = now
+        result.timestamps = timestamps
+        (self._succeeded if result.success else self._failed).inc()
+        dependents = shard.dependents.pop(tid, None)
+        if dependents is not None:
+            self._handoffs.put((result, dependents))
+            self._trace("handed off", tid)
             return None
+        shard.results[tid] = result
+        shard.stored_at[tid] = now
+        self._trace("stored", tid)
+        return None
+
+    def _hand_off(self) -> None:
+        "Passes the queued results on to the tasks depending on them, with no lock held."
+        while not self._handoffs.empty():
+            try:
+                result, dependents = self._handoffs.get_nowait()
+            except Empty:
+                return  # Taken by another thread
+            for task_id in dependents:
+                self._deliver(result, task_id)
+
+    def _deliver(self, result: Result, task_id: int) -> None:
+        """
+        Passes a result to a waiting task or reduction, and queues the task once it is ready
+        or stores the final result.
+        """
+        shard = self._shard(task_id)
+        with shard.lock:
+            waiting = shard.waiting.get(task_id)
+            if waiting is None:
+                return  # Canceled, or failed by another dependency
+            outcome = waiting.add(result)
+            if outcome is not None:
+                del shard.waiting[task_id]
+            if isinstance(outcome, Result):
+                if not outcome.success:
+                    logging.info("Task %s fails with task %s", task_id, result.task_id)
+                self._finish(shard, outcome)
+        if isinstance(outcome, Result):
+            if isinstance(waiting, _Waiting):
+                with self._lock:
+                    self._outstanding = max(self._outstanding - 1, 0)  # Never dispatched
+            self._hand_off()
+        elif isinstance(outcome, Task):
+            if self._has_expired(outcome):
+                self._expire([outcome])
+                return
+            self._tasks.put(outcome)
+            self._trace("queued", task_id)
+
+    def _abandon(self, shard: _Shard, task_id: int, attempt: int) -> None:
+        "Remembers a timed out attempt, with the shard's lock held."
+        shard.abandoned.setdefault(task_id, set()).add(attempt)
+        shard.abandoned.move_to_end(task_id)
+        if len(shard.abandoned) > max(self.FENCE_LIMIT // len(self._shards), 1):
+            tid, _ = shard.abandoned.popitem(last=False)
+            if tid not in shard.attempts:
+                shard.canceled.discard(tid)  # No result of it is expected any more
+
+    def _requeue(self, task: Task) -> None:
+        "Queues a task for its retry, unless it completed or was canceled meanwhile."
+        shard = self._shard(task.id)
+        with shard.lock:
+            if task.id not in shard.attempts:
+                return  # A late result of an earlier attempt completed it
+            canceled = task.id in shard.canceled
+            if canceled:
+                self._finish(shard, Result(task.id, success=False, data=b""))
+        if canceled:
+            self._hand_off()
+            return
+        if self._has_expired(task):
+            self._expire([task])
+            return
+        self._tasks.put(task)
+        self._trace("requeued", task.id)
+
+    def _has_expired(self, task: Task) -> bool:
+        "Returns True if the task's deadline passed, else starts watching it for its expiry."
+        if task.deadline is None:
+            return False
+        with self._lock:
+            if self._expiry_thread is None and not self._stopped.is_set():
+                self._expiry_thread = Thread(
+                    target=self._watch_deadlines, name="rte-expiry", daemon=True
+                )
+                self._expiry_thread.start()
+        return task.deadline <= time.monotonic()
+
+    def _watch_deadlines(self) -> None:
+        while not self._stopped.is_set():
+            expired = self._tasks.pop_expired(self.EXPIRY_POLL)
+            if expired:
+                self._expire(expired)
+
+    def _expire(self, tasks: list[Task]) -> None:
+        "Stores an expired result for each of the tasks, which are not queued."
+        undispatched = 0  # Expired tasks whose IDs still count as outstanding
+        for task in tasks:
+            logging.info("Task %s expired", task.id)
+            shard = self._shard(task.id)
+            with shard.lock:
+                undispatched += task.id not in shard.attempts
+                self._trace("expired", task.id)
+                self._finish(shard, Result(task.id, success=False, data=b"", expired=True))
+        self._expired.inc(len(tasks))
+        if undispatched:
+            with self._lock:
+                self._outstanding = max(self._outstanding - undispatched, 0)
+        self._hand_off()
+
+    def _retry(self, task: Task, delay: float) -> None:
+        logging.info("Server retries task %s in %s seconds", task.id, delay)
+        self._retries.inc()
+        if delay <= 0:
+            self._requeue(task)
+            return
+
+        def requeue() -> None:
+            with self._lock:
+                self._retry_timers.discard(timer)
+            self._requeue(task)
+
+        timer = Timer(delay, requeue)
+        with self._lock:
+            self._retry_timers.add(timer)
+        timer.start()
+
+    def get_next_id(self) -> Optional[int]:
+        with self._lock:
+            if self._outstanding >= self._demand() + self._queue_ahead:
+                logging.debug("Server has no task ids")
+                return None
+            task_id = self._returned_ids.popleft() if self._returned_ids else self._next_id()
+            self._outstanding += 1
+        logging.info("Server sends task id: %s", task_id)
+        return task_id
 
     def return_id(self, task_id: int) -> None:
         logging.debug("Server received returned task id: %s", task_id)
-        self._unassigned_ids.append(task_id)
+        with self._lock:
+            self._outstanding -= 1
+            self._returned_ids.append(task_id)
+
+    def reserve_ids(self, count: int) -> list[int]:
+        with self._lock:
+            task_ids = [
+                self._returned_ids.popleft() if self._returned_ids else self._next_id()
+                for _ in range(count)
+            ]
+            self._outstanding += count
+        logging.info("Server reserves task ids: %s", task_ids)
+        return task_ids
+
+    def add_graph(self, tasks: list[Task]) -> Optional[float]:
+        logging.info("Server received graph of tasks: %s", [task.id for task in tasks])
+        seen: set[int] = set()
+        for task in tasks:
+            if not seen.issuperset(task.dependencies):
+                with self._lock:  # The graph's IDs are never used
+                    self._outstanding = max(self._outstanding - len(tasks), 0)
+                    self._returned_ids.extend(task.id for task in tasks)
+                raise ValueError(f"Task {task.id} depends on a task not listed before it")
+            seen.add(task.id)
+        roots = [task for task in tasks if not task.dependencies]
+        now = time.monotonic()
+        for task in tasks:
+            shard = self._shard(task.id)
+            with shard.lock:
+                if task.dependencies:
+                    shard.waiting[task.id] = _Waiting(task)
+                if task.reduction is not None:
+                    shard.dependents.setdefault(task.id, []).append(task.reduction)
+                if task.timed:
+                    shard.timestamps[task.id] = Timestamps(submitted=now)
+            for dependency in set(task.dependencies):
+                parent_shard = self._shard(dependency)
+                with parent_shard.lock:
+                    parent_shard.dependents.setdefault(dependency, []).append(task.id)
+        for root in roots:
+            self._has_expired(root)  # Expired roots are expired by the watching thread
+        if not self._tasks.offer(roots, self._admission_wait):
+            logging.info("Server is full, rejects graph of %s tasks", len(tasks))
+            self._rejected.inc(len(tasks))
+            for task in tasks:
+                shard = self._shard(task.id)
+                with shard.lock:
+                    shard.waiting.pop(task.id, None)
+                    shard.dependents.pop(task.id, None)
+                    shard.timestamps.pop(task.id, None)
+            return self._retry_after
+        self._submitted.inc(len(tasks))
+        for root in roots:
+            self._trace("queued", root.id)
+        return None
 
-    def add_task(self, task: Task) -> None:
+    def add_task(self, task: Task) -> Optional[float]:
         logging.info("Server received task: %s", task.id)
-        self._tasks.put(task)
+        shard = self._shard(task.id)
+        with shard.lock:
+            if task.reduction is not None:
+                shard.dependents[task.id] = [task.reduction]
+            canceled = task.id in shard.canceled
+            if canceled:  # Canceled while the client held it back
+                self._finish(shard, Result(task.id, success=False, data=b""))
+            elif task.timed:
+                shard.timestamps[task.id] = Timestamps(submitted=time.monotonic())
+        if canceled:
+            with self._lock:
+                self._outstanding = max(self._outstanding - 1, 0)
+            self._hand_off()
+            return None
+        if self._has_expired(task):
+            self._expire([task])
+            return None
+        if not self._tasks.offer([task], self._admission_wait):
+            logging.info("Server is full, rejects task: %s", task.id)
+            self._rejected.inc()
+            with shard.lock:
+                shard.timestamps.pop(task.id, None)
+                shard.dependents.pop(task.id, None)
+            return self._retry_after
+        self._submitted.inc()
+        self._trace("queued", task.id)
+        return None
 
-    def get_task(self) -> Optional[Task]:
-        logging.debug("Server received task request")
-        self._unassigned_ids.append(self._next_id())
-        task = self._tasks.get()
+    def add_reduction(self, reduction_id: int, reducer: str, count: int) -> None:
+        logging.info("Server registers reduction %s of %s tasks: %s", reduction_id, count, reducer)
+        combine = self._reducers.get(reducer)
+        if combine is None or count < 1:
+            self.return_id(reduction_id)  # Never registered, so the ID is free again
+            if combine is None:
+                raise ValueError(f"Unknown reducer: {reducer}")
+            raise ValueError("A reduction needs at least one task")
+        shard = self._shard(reduction_id)
+        with shard.lock:
+            shard.waiting[reduction_id] = _Reduction(reduction_id, combine, count)
+        with self._lock:
+            # A reduction is never dispatched, so it does not wait for a worker
+            self._outstanding = max(self._outstanding - 1, 0)
+
+    def register_worker(self, worker_id: str) -> None:
+        logging.info("Server registers worker: %s", worker_id)
+        with self._lock:
+            self._registered.add(worker_id)
+            self._released.discard(worker_id)
+            self._leases[worker_id] = time.monotonic() + self._worker_lease
+
+    def unregister_worker(self, worker_id: str) -> None:
+        logging.info("Server unregisters worker: %s", worker_id)
+        with self._lock:
+            self._registered.discard(worker_id)
+            self._released.discard(worker_id)
+            self._leases.pop(worker_id, None)
+            watcher = self._watchers.pop(worker_id, None)
+        if watcher is not None:
+            watcher.put(None)  # Ends the worker's watch_cancellations
+
+    def _park(self, worker_id: Optional[str]) -> None:
+        "Counts a worker as blocked in get_task, with _lock held."
+        self._waiting += 1
+        if worker_id is None:
+            self._anonymous += 1
+        else:
+            self._registered.add(worker_id)
+            self._leases[worker_id] = math.inf
+
+    def _unpark(self, worker_id: Optional[str], lease: float) -> None:
+        "Counts a worker as no longer blocked, idle for 'lease' more seconds, with _lock held."
+        self._waiting -= 1
+        if worker_id is None:
+            self._anonymous -= 1
+        elif lease > 0 and worker_id in self._leases:
+            self._leases[worker_id] = time.monotonic() + lease
+        else:
+            self._leases.pop(worker_id, None)
+
+    def get_task(
+        self, worker_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Optional[Task]:
+        logging.debug("Server received task request from worker: %s", worker_id)
+        with self._lock:
+            if worker_id in self._released:
+                self._released.discard(worker_id)
+                return None
+            self._park(worker_id)
+            profiling = self._profiling
+            generation = self._tasks.generation
+        try:
+            task = self._tasks.get(worker_id, generation, timeout)
+        except TimeoutError:
+            with self._lock:
+                self._unpark(worker_id, self._worker_lease)  # Until it asks again
+            raise
         if task is None:
+            with self._lock:
+                self._unpark(worker_id, 0)
+                if worker_id is not None:
+                    self._released.discard(worker_id)
             logging.debug("Server has no tasks")
             return None
-        with self._lock:
+        shard = self._shard(task.id)
+        with shard.lock:
+            first_dispatch = task.id not in shard.attempts
+            attempt = shard.attempts.get(task.id, 0) + 1
+            shard.attempts[task.id] = attempt
+            shard.running[task.id] = task
+            task = replace(task, attempt=attempt, profile=profiling)  # The worker's copy
+            if worker_id is not None:
+                shard.workers[task.id] = worker_id
+            timestamps = shard.timestamps.get(task.id)
+            if timestamps is not None:
+                timestamps.dispatched = time.monotonic()
             self._heartbeats.add(task.id)
-            logging.info("Server sends task for id: %s", task.id)
-            return task
+        with self._lock:
+            self._unpark(worker_id, 0)
+            if first_dispatch:
+                self._outstanding = max(self._outstanding - 1, 0)
+        self._trace("dispatched", task.id)
+        logging.info("Server sends task for id: %s", task.id)
+        return task
 
     def set_result(self, result: Result) -> None:
         logging.info("Server received result for task: %s", result.task_id)
         tid = result.task_id
-        with self._lock:
+        if result.profile:
+            with self._lock:
+                merge_samples(self._profile, result.profile)
+            result.profile = {}
+        shard = self._shard(tid)
+        redundant_worker = None  # Runs a retry that a late result made redundant
+        with shard.lock:
+            late = result.attempt in shard.abandoned.get(tid, ())
+            if late or tid in shard.results:
+                if tid not in shard.attempts or not result.success:
+                    # The task is complete, or its retry also covers this failure
+                    logging.info("Server ignores late result of task: %s", tid)
+                    if tid not in shard.attempts:
+                        shard.canceled.discard(tid)
+                    return
+                logging.info("Server accepts late result of task: %s", tid)
+                self._trace("late result", tid)
+                self._tasks.remove({tid})  # A retry waiting for a worker
+            redundant = late and tid in shard.running
+            if redundant:
+                self._abandon(shard, tid, shard.attempts[tid])
+                redundant_worker = shard.workers.get(tid)
             self._heartbeats.remove(tid)
-            self._results[tid] = result
-            if tid in self._canceled:
-                self._canceled.remove(tid)
+            retry = self._finish(shard, result)
+            if redundant:
+                shard.canceled.add(tid)  # Until the redundant attempt reports
+        if redundant_worker is not None:
+            with self._lock:
+                watcher = self._watchers.get(redundant_worker)
+            if watcher is not None:
+                watcher.put(tid)
+        if retry is not None:
+            self._retry(*retry)
+        self._hand_off()
 
     def get_results(self, task_ids: list[int]) -> list[Optional[Result]]:
         logging.debug("Server received results request for tasks: %s", task_ids)
-        with self._lock:
-            return [self._results.pop(tid, None) for tid in task_ids]
+        now = time.monotonic()
+        results = []
+        for tid in task_ids:
+            shard = self._shard(tid)
+            with shard.lock:
+                result = shard.results.pop(tid, None)
+                stored_at = shard.stored_at.pop(tid, now)
+            if result is not None:
+                self._collect_wait.observe(now - stored_at)
+            results.append(result)
+        return results
 
     def cancel_task(self, task_id: int) -> None:
         logging.info("Server cancels task: %s", task_id)
+        self.cancel_tasks([task_id])
+
+    def cancel_tasks(self, task_ids: list[int]) -> None:
+        logging.info("Server cancels %s tasks", len(task_ids))
+        self._cancellations.inc(len(task_ids))
+        dropped = set(self._tasks.remove(set(task_ids)))
+        undispatched = 0  # Dropped tasks whose IDs still count as outstanding
+        running_on: dict[str, list[int]] = {}  # Worker ID -> its canceled tasks
+        for tid in task_ids:
+            shard = self._shard(tid)
+            with shard.lock:
+                self._heartbeats.remove(tid)
+                waiting = shard.waiting.pop(tid, None)
+                if tid in dropped or waiting is not None:
+                    if tid not in shard.attempts and not isinstance(waiting, _Reduction):
+                        undispatched += 1
+                    self._trace("dropped", tid)
+                    self._finish(shard, Result(tid, success=False, data=b""))
+                    continue
+                shard.canceled.add(tid)
+                worker_id = shard.workers.get(tid)
+                if worker_id is not None:
+                    running_on.setdefault(worker_id, []).append(tid)
+        with self._lock:
+            self._outstanding = max(self._outstanding - undispatched, 0)
+            watchers = [(self._watchers.get(wid), tids) for wid, tids in running_on.items()]
+        for watcher, tids in watchers:
+            if watcher is not None:
+                for tid in tids:
+                    watcher.put(tid)
+        self._hand_off()
+
+    def watch_cancellations(self, worker_id: str) -> Iterator[int]:
+        watcher: SimpleQueue = SimpleQueue()
         with self._lock:
-            self._heartbeats.remove(task_id)
-            self._canceled.add(task_id)
+            if worker_id not in self._registered and worker_id not in self._released:
+                return  # Unregistered already
+            previous = self._watchers.get(worker_id)
+            self._watchers[worker_id] = watcher
+        if previous is not None:
+            previous.put(None)  # Only the latest watch of a worker is served
+        try:
+            while True:
+                task_id = watcher.get()
+                if task_id is None:
+                    return
+                yield task_id
+        finally:
+            with self._lock:
+                if self._watchers.get(worker_id) is watcher:
+                    del self._watchers[worker_id]
 
     def is_task_canceled(self, task_id: int) -> bool:
         logging.debug("Server checks if task is canceled: %s", task_id)
+        self._heartbeats.beat(task_id)
+        shard = self._shard(task_id)
+        with shard.lock:
+            canceled = task_id in shard.canceled
+        if canceled:
+            logging.info("Server confirms task is canceled: %s", task_id)
+        return canceled
+
+    def put_blob(self, data: bytes) -> str:
+        bid = blob_id(data)
+        logging.info("Server stores blob: %s", bid)
         with self._lock:
-            self._heartbeats.beat(task_id)
-            if task_id in self._canceled:
-                logging.info("Server confirms task is canceled: %s", task_id)
-                self._canceled.remove(task_id)
-                return True
-            return False
+            self._blobs[bid] = data
+        return bid
+
+    def get_blob(self, blob_id: str) -> Optional[bytes]:
+        logging.debug("Server received blob request: %s", blob_id)
+        with self._lock:
+            return self._blobs.get(blob_id)
+
+    def delete_blob(self, blob_id: str) -> None:
+        logging.info("Server deletes blob: %s", blob_id)
+        with self._lock:
+            self._blobs.pop(blob_id, None)
 
     def release_waiting_workers(self) -> None:
-        "Releases all waiting workers."
-        while True:
-            try:
-                self._unassigned_ids.popleft()
-            except IndexError:
-                break
-            logging.info("Server releases a waiting worker")
-            self._tasks.put(None)
+        """
+        Releases all waiting workers. Workers with an ID that are not waiting right now,
+        e.g. busy or between two requests, receive None on their next request.
+        """
+        logging.info("Server releases the waiting workers")
+        with self._lock:
+            self._released |= self._registered
+            self._registered.clear()
+            self._leases.clear()
+            self._tasks.release()
+
+    def set_profiling(self, enabled: bool) -> None:
+        "Makes workers sample their stacks while executing the tasks dispatched from now on."
+        logging.info("Server sets profiling: %s", enabled)
+        with self._lock:
+            self._profiling = enabled
+
+    def get_profile(self) -> str:
+        "Returns the samples of all workers merged, in the collapsed stack format."
+        with self._lock:
+            return format_collapsed(self._profile, root="worker")
+
+    def affinity_hit_rate(self) -> float:
+        "Returns the fraction of tasks with an affinity key dispatched to their preferred worker."
+        return self._tasks.affinity_hit_rate()
 
     def stop(self) -> None:
         "Stops the server."
         logging.debug("Server stops")
+        self._stopped.set()
         self._heartbeats.stop()
+        with self._lock:
+            for timer in self._retry_timers:
+                timer.cancel()
+            self._retry_timers.clear()
+            watchers, self._watchers = self._watchers, {}
+        for watcher in watchers.values():
+            watcher.put(None)
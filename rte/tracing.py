@@ -0,0 +1,73 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Iterator
+
+# (phase, name, track, start, duration, args) with times in seconds of time.perf_counter
+_Event = tuple[str, str, str, float, float, dict[str, Any]]
+
+
+class Tracer:
+    """
+    Thread-safe recorder of spans and events, exported in the Chrome trace format.
+    Events are kept in a ring buffer, so only the most recent ones are retained.
+    Every track, e.g. a worker, is shown as its own thread in Perfetto or chrome://tracing.
+    """
+
+    def __init__(self, capacity: int = 100_000) -> None:
+        """
+        capacity: Number of events kept. Older events are dropped.
+        """
+        self._events: deque[_Event] = deque(maxlen=capacity)
+
+    @contextmanager
+    def span(self, name: str, track: str, **args: Any) -> Iterator[None]:
+        "Records the time spent in the context as a span on the track."
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._events.append(("X", name, track, start, time.perf_counter() - start, args))
+
+    def instant(self, name: str, track: str, **args: Any) -> None:
+        "Records a point in time on the track."
+        self._events.append(("i", name, track, time.perf_counter(), 0.0, args))
+
+    def counter(self, name: str, track: str, value: float) -> None:
+        "Records the value of a counter, shown as a graph above the tracks."
+        self._events.append(("C", name, track, time.perf_counter(), 0.0, {name: value}))
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        "Returns the total seconds per track and span name, e.g. summary()[track]['execute']."
+        totals: dict[str, dict[str, float]] = {}
+        for phase, name, track, _, duration, _ in list(self._events):
+            if phase == "X":
+                spans = totals.setdefault(track, {})
+                spans[name] = spans.get(name, 0.0) + duration
+        return totals
+
+    def chrome_trace(self) -> dict:
+        "Returns the recorded events in the Chrome trace format."
+        track_ids: dict[str, int] = {}
+        trace_events = []
+        for phase, name, track, start, duration, args in list(self._events):
+            tid = track_ids.setdefault(track, len(track_ids) + 1)
+            event = {"name": name, "ph": phase, "ts": start * 1e6, "pid": 1, "tid": tid}
+            if phase == "X":
+                event["dur"] = duration * 1e6
+            elif phase == "i":
+                event["s"] = "t"  # Scoped to the track
+            if args:
+                event["args"] = args
+            trace_events.append(event)
+        for track, tid in track_ids.items():
+            trace_events.append(
+                {"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}}
+            )
+        return {"traceEvents": trace_events, "displayTimeUnit": "ms"}
+
+    def dump(self, path: str) -> None:
+        "Writes the recorded events to a Chrome trace JSON file."
+        with open(path, "w", encoding="utf-8") as file:
+            json.dump(self.chrome_trace(), file)
@@ -1,51 +1,198 @@
 import logging
+import threading
+import time
+import uuid
 from abc import ABC, abstractmethod
-from typing import Optional
+from contextlib import nullcontext
+from typing import Any, ContextManager, Optional
 from .server import WorkerInterface
 from .heartbeat import Heart
-from .entities import Result
+from .entities import Task, Result, Timestamps
+from .blobs import BlobCache
+from .metrics import Registry
+from .tracing import Tracer
+from .codecs import Codec
+from .profiling import SamplingProfiler
+from . import chunking
 
 
 class Worker(ABC):
-    def __init__(self, server: WorkerInterface, refresh_time: float) -> None:
+    def __init__(
+        self,
+        server: WorkerInterface,
+        refresh_time: float,
+        blob_cache_size: int = 1 << 30,
+        metrics: Optional[Registry] = None,
+        tracer: Optional[Tracer] = None,
+        poll_timeout: Optional[float] = None,
+        codec: Optional[Codec] = None,
+    ) -> None:
+        """
+        blob_cache_size: Bytes of blobs kept locally. The least recently used blobs are evicted.
+        metrics: Registry to record the worker's metrics in. Defaults to a new registry.
+        tracer: Records the time the worker spends fetching, executing and reporting tasks,
+                on a track named after the worker, if given.
+        poll_timeout: Seconds a request for a task waits on the server before it is repeated,
+                      so an idle remote worker does not hold a connection open indefinitely.
+                      Requests wait until a task arrives if None.
+        codec: Decodes the data of every task for 'execute_task' and encodes what it returns.
+               'execute_task' receives and returns bytes if None.
+        """
         self._server = server
         self._refresh_time = refresh_time
+        self._poll_timeout = poll_timeout
+        self._codec = codec
         self._refresher: Heart
+        self._task_lock = threading.Lock()  # Protects the current task ID and its cancellation
+        self._task_id: Optional[int] = None
+        self._task_canceled = False
+        self._deadline: Optional[float] = None  # Of the current task
+        self._blobs = BlobCache(blob_cache_size, server.get_blob)
+        self.worker_id = uuid.uuid4().hex
+        self.metrics = Registry() if metrics is None else metrics
+        self._execute_time = self.metrics.histogram(
+            "rte_worker_execute_seconds", "Time the worker executes a task."
+        )
+        self._tracer = tracer
+        self._track = f"worker {self.worker_id[:8]}"
+        self._run_thread: Optional[int] = None
+        self._profiler = SamplingProfiler(lambda thread: thread.ident == self._run_thread)
 
     @abstractmethod
-    def execute_task(self, task: bytes) -> bytes:
-        pass
+    def execute_task(self, task: Any) -> Any:
+        "Returns the result of a task, both bytes or objects of the worker's codec."
+
+    def _call(self, data: bytes) -> bytes:
+        if self._codec is None:
+            return self.execute_task(data)
+        return self._codec.encode(self.execute_task(self._codec.decode(data)))
 
     @abstractmethod
     def on_cancel(self) -> None:
         pass
 
+    def time_left(self) -> Optional[float]:
+        """
+        Returns the seconds until the deadline of the current task, for 'execute_task' to give
+        up early, or None if it has no deadline.
+        """
+        return None if self._deadline is None else self._deadline - time.monotonic()
+
+    def get_blob(self, blob_id: str) -> memoryview:
+        """
+        Returns a blob stored on the server, for use in 'execute_task'.
+        Each blob is only fetched once while it stays in the cache.
+        """
+        return self._blobs.get(blob_id)
+
+    def _span(self, name: str, **args) -> ContextManager:
+        if self._tracer is None:
+            return nullcontext()
+        return self._tracer.span(name, self._track, **args)
+
     def _check_task(self, task_id: int) -> None:
         logging.debug("Worker is checking task: %s", task_id)
         if self._server.is_task_canceled(task_id):
-            logging.info("Task %s was canceled", task_id)
-            self._refresher.stop()
-            self.on_cancel()
+            self._cancel(task_id)
+
+    def _cancel(self, task_id: int) -> None:
+        "Cancels the task if it is still running, once, whether polled or pushed."
+        with self._task_lock:
+            if task_id != self._task_id or self._task_canceled:
+                return
+            self._task_canceled = True
+        logging.info("Task %s was canceled", task_id)
+        self._refresher.stop()
+        self.on_cancel()
+
+    def _watch_cancellations(self) -> None:
+        try:
+            for task_id in self._server.watch_cancellations(self.worker_id):
+                self._cancel(task_id)
+        except Exception as e:  # Cancellations are still found by polling
+            logging.warning("Worker stopped watching cancellations: %s", e)
+
+    def _execute_chunk(self, data: bytes) -> bytes:
+        "Executes every task of a chunk, failing only the tasks that raise."
+        start = time.perf_counter()
+        results: list[Optional[bytes]] = []
+        for task in chunking.unpack(data):
+            try:
+                results.append(self._call(task))
+            except Exception as e:
+                logging.error(e)
+                results.append(None)
+        return chunking.pack_results(results, time.perf_counter() - start)
+
+    def _execute(self, task: Task) -> Result:
+        if task.deadline is not None and task.deadline <= time.monotonic():
+            logging.info("Worker skips expired task: %s", task.id)
+            return Result(task.id, success=False, data=b"", attempt=task.attempt, expired=True)
+        try:
+            if task.blobs:
+                with self._span("get_blobs", task=task.id):
+                    for blob_id in task.blobs:
+                        self._blobs.get(blob_id)  # Prefetch
+            logging.debug("Worker is executing task: %s", task.id)
+            started = time.monotonic()
+            with self._span("execute", task=task.id):
+                if task.chunked:
+                    ret = self._execute_chunk(task.data)
+                else:
+                    ret = self._call(task.data)
+            logging.info("Worker finished task: %s", task.id)
+            result = Result(task.id, success=True, data=ret)
+            if task.timed:
+                result.timestamps = Timestamps(started=started, finished=time.monotonic())
+        except Exception as e:
+            logging.info("Worker failed task: %s", task.id)
+            logging.error(e)
+            result = Result(task.id, success=False, data=b"")
+        result.attempt = task.attempt
+        return result
 
     def run(self, num_tasks: Optional[int] = None) -> None:
+        self._run_thread = threading.get_ident()
+        self._server.register_worker(self.worker_id)
+        # Ends when the worker is unregistered
+        threading.Thread(target=self._watch_cancellations, daemon=True).start()
+        try:
+            self._run(num_tasks)
+        finally:
+            self._profiler.stop()
+            self._profiler.drain()  # Samples after the last result belong to no task
+            self._server.unregister_worker(self.worker_id)
+
+    def _run(self, num_tasks: Optional[int]) -> None:
         while num_tasks is None or num_tasks > 0:
-            task = self._server.get_task()
+            try:
+                with self._span("get_task"):
+                    task = self._server.get_task(self.worker_id, self._poll_timeout)
+            except TimeoutError:
+                continue  # Keeps the worker's lease alive
             logging.info("Worker received task: %s", task)
             if task is None:
                 break
 
             self._refresher = Heart(self._refresh_time, self._check_task, task.id)
-            try:
-                logging.debug("Worker is executing task: %s", task.id)
-                ret = self.execute_task(task.data)
-                logging.info("Worker finished task: %s", task.id)
-                result = Result(task.id, success=True, data=ret)
-            except Exception as e:
-                logging.info("Worker failed task: %s", task.id)
-                logging.error(e)
-                result = Result(task.id, success=False, data=b"")
+            with self._task_lock:
+                self._task_id = task.id
+                self._task_canceled = False
+            self._deadline = task.deadline
+            if task.profile:
+                self._profiler.start()
+            else:
+                self._profiler.stop()
+            start = time.perf_counter()
+            result = self._execute(task)
+            self._execute_time.observe(time.perf_counter() - start)
+            result.profile = self._profiler.drain()  # Shipped to the server to be merged
+            with self._task_lock:
+                self._task_id = None
+            self._deadline = None
             self._refresher.stop()
             self._refresher.join()
-            self._server.set_result(result)
+            with self._span("set_result", task=task.id):
+                self._server.set_result(result)
             if num_tasks is not None:
                 num_tasks -= 1
@@ -1,5 +1,5 @@
 from time import sleep
-from typing import Optional
+from typing import Iterator, Optional
 from rte import WorkerInterface, ClientInterface, ServerInterface, Worker, Task, Result, Client
 
 
@@ -20,10 +20,27 @@ class ServerStub(ServerInterface):
     def return_id(self, task_id: int) -> None:
         raise NotImplementedError
 
-    def add_task(self, task: Task) -> None:
+    def add_task(self, task: Task) -> Optional[float]:
         raise NotImplementedError
 
-    def get_task(self) -> Optional[Task]:
+    def reserve_ids(self, count: int) -> list[int]:
+        raise NotImplementedError
+
+    def add_graph(self, tasks: list[Task]) -> Optional[float]:
+        raise NotImplementedError
+
+    def add_reduction(self, reduction_id: int, reducer: str, count: int) -> None:
+        raise NotImplementedError
+
+    def register_worker(self, worker_id: str) -> None:
+        raise NotImplementedError
+
+    def unregister_worker(self, worker_id: str) -> None:
+        raise NotImplementedError
+
+    def get_task(
+        self, worker_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Optional[Task]:
         raise NotImplementedError
 
     def set_result(self, result: Result) -> None:
@@ -35,12 +52,33 @@ class ServerStub(ServerInterface):
     def cancel_task(self, task_id: int) -> None:
         raise NotImplementedError
 
+    def cancel_tasks(self, task_ids: list[int]) -> None:
+        raise NotImplementedError
+
     def is_task_canceled(self, task_id: int) -> bool:
         raise NotImplementedError
 
+    def watch_cancellations(self, worker_id: str) -> Iterator[int]:
+        raise NotImplementedError
+
+    def put_blob(self, data: bytes) -> str:
+        raise NotImplementedError
+
+    def get_blob(self, blob_id: str) -> Optional[bytes]:
+        raise NotImplementedError
+
+    def delete_blob(self, blob_id: str) -> None:
+        raise NotImplementedError
+
     def release_waiting_workers(self) -> None:
         raise NotImplementedError
 
+    def set_profiling(self, enabled: bool) -> None:
+        raise NotImplementedError
+
+    def get_profile(self) -> str:
+        raise NotImplementedError
+
 
 class TrivialClient(Client):
     def __init__(self, server: ClientInterface, refresh_time: float) -> None:
@@ -82,6 +120,25 @@ class LongRunningWorker(Worker):
         pass
 
 
+class BlobWorker(Worker):
+    "Returns the blob that the task names."
+
+    def execute_task(self, task: bytes) -> bytes:
+        return bytes(self.get_blob(task.decode()))
+
+    def on_cancel(self) -> None:
+        pass
+
+
+class StragglingWorker(Worker):
+    def execute_task(self, task: bytes) -> bytes:
+        sleep(1)
+        return task
+
+    def on_cancel(self) -> None:
+        pass
+
+
 class RaisingWorker(Worker):
     def execute_task(self, task: bytes) -> bytes:
         raise RuntimeError("Dying")
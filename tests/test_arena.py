@@ -0,0 +1,72 @@
+import unittest
+from rte import Task
+from rte.arena import TaskArena
+
+
+class TestTaskArena(unittest.TestCase):
+    def setUp(self) -> None:
+        self.arena = TaskArena()
+
+    def test_round_trip(self) -> None:
+        tasks = [Task(0, b"a", session="s"), Task(1, b""), Task(2, b"bc", blobs=["x"])]
+        for queued_at, task in enumerate(tasks):
+            self.arena.append(task, float(queued_at))
+
+        self.assertEqual(len(self.arena), 3)
+        popped = [self.arena.popleft() for _ in tasks]
+        self.assertEqual(popped, [(task, float(i)) for i, task in enumerate(tasks)])
+        self.assertEqual(len(self.arena), 0)
+
+    def test_compaction(self) -> None:
+        arena = TaskArena()
+        arena.COMPACT_AFTER = 2
+        for task_id in range(5):
+            arena.append(Task(task_id, bytes([task_id]), max_attempts=task_id + 1), 0.0)
+        for task_id in range(3):
+            arena.popleft()
+        arena.append(Task(5, b"\x05"), 0.0)
+
+        tasks = [arena.popleft()[0] for _ in range(3)]
+        self.assertEqual([task.data for task in tasks], [b"\x03", b"\x04", b"\x05"])
+        self.assertEqual([task.max_attempts for task in tasks], [4, 5, 1])
+
+    def test_remove(self) -> None:
+        for task_id in range(4):
+            self.arena.append(Task(task_id, b"x"), float(task_id))
+
+        self.assertEqual([task.id for task in self.arena.remove({1, 3, 7})], [1, 3])
+        self.assertEqual(self.arena.remove({7}), [])
+        popped = [self.arena.popleft() for _ in range(2)]
+        self.assertEqual(popped, [(Task(0, b"x"), 0.0), (Task(2, b"x"), 2.0)])
+
+    def test_remove_does_not_touch_other_tasks(self) -> None:
+        tasks = [Task(task_id, bytes([task_id]) * task_id, session="s") for task_id in range(6)]
+        for task in tasks:
+            self.arena.append(task, float(task.id))
+        nbytes = self.arena.nbytes
+
+        self.assertEqual(self.arena.remove({2}), [tasks[2]])
+        self.assertEqual(self.arena.remove({2}), [])
+        self.assertEqual(self.arena.nbytes, nbytes)  # Only marked, nothing moved
+        self.assertEqual(len(self.arena), 5)
+        self.assertEqual(self.arena.remove({0}), [tasks[0]])
+        self.assertEqual(self.arena.first_queued_at(), 1.0)
+        popped = [self.arena.popleft()[0] for _ in range(4)]
+        self.assertEqual(popped, [tasks[1], tasks[3], tasks[4], tasks[5]])
+
+    def test_remove_many(self) -> None:
+        arena = TaskArena()
+        arena.COMPACT_AFTER = 2
+        for task_id in range(100):
+            arena.append(Task(task_id, bytes([task_id])), 0.0)
+        arena.popleft()
+
+        removed = arena.remove(set(range(0, 100, 2)))
+        self.assertEqual([task.id for task in removed], list(range(2, 100, 2)))
+        popped = [arena.popleft()[0] for _ in range(len(arena))]
+        self.assertEqual(popped, [Task(i, bytes([i])) for i in range(1, 100, 2)])
+
+    def test_frees_memory_once_empty(self) -> None:
+        self.arena.append(Task(0, bytes(1000)), 0.0)
+        self.arena.popleft()
+        self.assertLess(self.arena.nbytes, 100)
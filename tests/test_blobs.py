@@ -0,0 +1,39 @@
+import unittest
+from typing import Optional
+from rte.blobs import BlobCache
+
+
+class TestBlobCache(unittest.TestCase):
+    def setUp(self) -> None:
+        self.blobs = {"a": b"aaaa", "b": b"bbbb", "c": b"cccc"}
+        self.fetched: list[str] = []
+        self.cache = BlobCache(capacity=8, fetch=self.fetch)
+
+    def fetch(self, blob_id: str) -> Optional[bytes]:
+        self.fetched.append(blob_id)
+        return self.blobs.get(blob_id)
+
+    def test_fetches_once(self) -> None:
+        self.assertEqual(bytes(self.cache.get("a")), b"aaaa")
+        self.assertEqual(bytes(self.cache.get("a")), b"aaaa")
+        self.assertEqual(self.fetched, ["a"])
+
+    def test_evicts_least_recently_used(self) -> None:
+        self.cache.get("a")
+        self.cache.get("b")
+        self.cache.get("a")
+        self.cache.get("c")
+        self.assertIn("a", self.cache)
+        self.assertNotIn("b", self.cache)
+
+    def test_keeps_oversized_blob(self) -> None:
+        cache = BlobCache(capacity=2, fetch=self.fetch)
+        cache.get("a")
+        self.assertIn("a", cache)
+
+    def test_missing_blob(self) -> None:
+        with self.assertRaises(KeyError):
+            self.cache.get("missing")
+
+    def test_blob_is_read_only(self) -> None:
+        self.assertTrue(self.cache.get("a").readonly)
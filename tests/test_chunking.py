@@ -0,0 +1,16 @@
+import unittest
+from rte.chunking import pack, unpack, pack_results, unpack_results
+
+
+class TestChunking(unittest.TestCase):
+    def test_pack_unpack(self) -> None:
+        items = [b"a", b"", None, b"bcd"]
+        self.assertEqual(unpack(pack(items)), items)
+
+    def test_pack_unpack_empty(self) -> None:
+        self.assertEqual(unpack(pack([])), [])
+
+    def test_pack_unpack_results(self) -> None:
+        results, elapsed = unpack_results(pack_results([b"x", None], 1.5))
+        self.assertEqual(results, [b"x", None])
+        self.assertEqual(elapsed, 1.5)
@@ -1,5 +1,6 @@
 import unittest
-from typing import Optional
+from unittest.mock import patch
+from typing import Optional, Union
 from rte import ClientInterface, BatchClient, Task, Result
 from .stubs import TrivialClient
 
@@ -11,6 +12,8 @@ class ServerStub(ClientInterface):
         self.tasks: list[Task] = []
         self.returned_ids: list[int] = []
         self.canceled_ids: list[int] = []
+        self.retry_afters: list[Optional[float]] = []  # Returned by add_task, then None
+        self.reductions: list[tuple[int, str, int]] = []
 
     def get_next_id(self) -> Optional[int]:
         if self.next_ids:
@@ -20,8 +23,19 @@ class ServerStub(ClientInterface):
     def return_id(self, task_id: int) -> None:
         self.returned_ids.append(task_id)
 
-    def add_task(self, task: Task) -> None:
+    def add_task(self, task: Task) -> Optional[float]:
         self.tasks.append(task)
+        return self.retry_afters.pop(0) if self.retry_afters else None
+
+    def reserve_ids(self, count: int) -> list[int]:
+        return [self.next_ids.pop(0) for _ in range(count)]
+
+    def add_graph(self, tasks: list[Task]) -> Optional[float]:
+        self.tasks.extend(tasks)
+        return self.retry_afters.pop(0) if self.retry_afters else None
+
+    def add_reduction(self, reduction_id: int, reducer: str, count: int) -> None:
+        self.reductions.append((reduction_id, reducer, count))
 
     def get_results(self, task_ids: list[int]) -> list[Optional[Result]]:
         return [self.results.pop(0) if self.results else None for _ in task_ids]
@@ -29,6 +43,15 @@ class ServerStub(ClientInterface):
     def cancel_task(self, task_id: int) -> None:
         self.canceled_ids.append(task_id)
 
+    def cancel_tasks(self, task_ids: list[int]) -> None:
+        self.canceled_ids.extend(task_ids)
+
+    def put_blob(self, data: bytes) -> str:
+        raise NotImplementedError
+
+    def delete_blob(self, blob_id: str) -> None:
+        raise NotImplementedError
+
 
 class TestClient(unittest.TestCase):
     def test_successfull_workflow(self) -> None:
@@ -73,6 +96,39 @@ class TestClient(unittest.TestCase):
         self.assertEqual(server.returned_ids, [12])
 
 
+class GraphClient(TrivialClient):
+    "Sends every task through a second stage."
+
+    def on_request(self, task_id: int) -> Union[Task, list[Task], None]:
+        task = super().on_request(task_id)
+        if not isinstance(task, Task):
+            return task
+        (second,) = self.reserve_ids(1)
+        return [task, Task(second, b"", dependencies=[task_id])]
+
+
+class TestGraphClient(unittest.TestCase):
+    def test_awaits_only_leaves(self) -> None:
+        server = ServerStub([1, 2], [Result(2, True, b"result")])
+        client = GraphClient(server, 0.01)
+        client.tasks = [b"task"]
+
+        client.run()
+
+        self.assertEqual([task.id for task in server.tasks], [1, 2])
+        self.assertEqual([result.task_id for result in client.results], [2])
+
+    def test_invalid_graph_is_not_awaited(self) -> None:
+        server = ServerStub([1, 2], [])
+        client = GraphClient(server, 0.01)
+        client.tasks = [b"task"]
+
+        with patch.object(server, "add_graph", side_effect=ValueError):
+            with self.assertRaises(ValueError):
+                client.run()
+        self.assertEqual(set(), client._pending_task_ids)  # pylint: disable=protected-access
+
+
 class TestBatchClient(unittest.TestCase):
     def test_successfull_task(self) -> None:
         server = ServerStub([13], [Result(13, True, b"result")])
@@ -107,3 +163,55 @@ class TestBatchClient(unittest.TestCase):
         if results[0] is None:
             self.fail("Result is None")
         self.assertEqual(results[0], b"result")
+
+    def test_solve_iter_unordered(self) -> None:
+        server = ServerStub([1, 2], [None, None, Result(2, True, b"b"), Result(1, True, b"a")])
+        client = BatchClient(server, 0.05)
+
+        results = list(client.solve_iter([b"task_a", b"task_b"]))
+
+        self.assertEqual(results, [(1, b"b"), (0, b"a")])
+
+    def test_solve_iter_ordered(self) -> None:
+        server = ServerStub([1, 2], [None, None, Result(2, True, b"b"), Result(1, True, b"a")])
+        client = BatchClient(server, 0.05)
+
+        results = list(client.solve_iter([b"task_a", b"task_b"], ordered=True))
+
+        self.assertEqual(results, [(0, b"a"), (1, b"b")])
+
+    def test_solve_iter_bounds_in_flight(self) -> None:
+        server = ServerStub([1, 2], [None, Result(1, True, b"a"), Result(2, True, b"b")])
+        client = BatchClient(server, 0.05)
+        consumed = []
+
+        def tasks():
+            for data in [b"task_a", b"task_b"]:
+                consumed.append(data)
+                yield data
+
+        for _ in client.solve_iter(tasks(), max_in_flight=1):
+            self.assertEqual(len(consumed), 1)
+            break
+
+    def test_offers_rejected_task_again(self) -> None:
+        server = ServerStub([1, 2], [None] * 6 + [Result(1, True, b"a"), Result(2, True, b"b")])
+        server.retry_afters = [None, 0.01]
+        client = BatchClient(server, 0.01)
+
+        results = client.solve([b"task_a", b"task_b"])
+
+        self.assertEqual(results, [b"a", b"b"])
+        self.assertEqual([task.id for task in server.tasks], [1, 2, 2])
+        self.assertEqual(len({task.session for task in server.tasks}), 1)
+
+    def test_rejection_shrinks_window(self) -> None:
+        results = [None] * 9 + [Result(i, True, b"") for i in (1, 2, 3)]
+        server = ServerStub([1, 2, 3], results)
+        server.retry_afters = [None, None, 0.01]
+        client = BatchClient(server, 0.01)
+
+        client.solve([b"a", b"b", b"c"])
+
+        # Halved from the three tasks in flight, then widened by the accepted retry
+        self.assertEqual(client._window, 2)  # pylint: disable=protected-access
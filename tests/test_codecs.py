@@ -0,0 +1,58 @@
+import unittest
+from rte.codecs import RawCodec, PickleCodec, MsgpackCodec, NumpyCodec, msgpack, numpy
+
+
+class TestCodecs(unittest.TestCase):
+    def test_raw(self) -> None:
+        codec = RawCodec()
+        self.assertEqual(codec.decode(codec.encode(b"abc")), b"abc")
+
+    def test_pickle(self) -> None:
+        codec = PickleCodec()
+        obj = {"a": [1, 2.5], "b": bytearray(b"xy")}
+        self.assertEqual(codec.decode(codec.encode(obj)), obj)
+
+    @unittest.skipUnless(numpy is not None, "needs numpy")
+    def test_pickle_array_out_of_band(self) -> None:
+        codec = PickleCodec()
+        data = codec.encode({"array": numpy.arange(1000.0)})
+        array = codec.decode(data)["array"]
+        numpy.testing.assert_array_equal(array, numpy.arange(1000.0))
+        self.assertTrue(numpy.shares_memory(array, numpy.frombuffer(data, numpy.uint8)))
+
+    @unittest.skipUnless(msgpack is not None, "needs msgpack")
+    def test_msgpack(self) -> None:
+        codec = MsgpackCodec()
+        obj = {"a": [1, 2.5], "b": b"xy"}
+        self.assertEqual(codec.decode(codec.encode(obj)), obj)
+
+    @unittest.skipUnless(numpy is not None, "needs numpy")
+    def test_numpy(self) -> None:
+        codec = NumpyCodec()
+        arrays = [
+            numpy.arange(12.0).reshape(3, 4),
+            numpy.arange(6, dtype=numpy.int16).reshape(2, 3).T,  # Not contiguous
+            numpy.zeros((0, 3), numpy.int32),
+            numpy.float32(3.5),
+            numpy.array(["ab", "c"]),
+            numpy.array([(1, [2.0, 3.0])], [("a", "<i4"), ("b", ">f8", (2,))]),  # Structured
+            numpy.zeros(2, numpy.dtype({"names": ["a"], "formats": ["u1"], "itemsize": 4})),
+        ]
+        for array in arrays:
+            decoded = codec.decode(codec.encode(array))
+            self.assertEqual((decoded.dtype, decoded.shape), (array.dtype, array.shape))
+            numpy.testing.assert_array_equal(decoded, array)
+
+    @unittest.skipUnless(numpy is not None, "needs numpy")
+    def test_numpy_decodes_without_copy(self) -> None:
+        codec = NumpyCodec()
+        data = codec.encode(numpy.arange(100.0))
+        array = codec.decode(data)
+        self.assertTrue(numpy.shares_memory(array, numpy.frombuffer(data, numpy.uint8)))
+        self.assertFalse(array.flags.writeable)
+        self.assertTrue(array.flags.aligned)
+
+    @unittest.skipUnless(numpy is not None, "needs numpy")
+    def test_numpy_rejects_objects(self) -> None:
+        with self.assertRaises(ValueError):
+            NumpyCodec().encode(numpy.array([object()]))
@@ -0,0 +1,105 @@
+import time
+import unittest
+from concurrent.futures import CancelledError
+from threading import Thread
+from unittest import mock
+from rte import Server, RteExecutor, TaskFailedError
+from .stubs import TrivialWorker, RaisingWorker
+
+
+class ExecutorTestCase(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = Server(task_timeout=0.1)
+        self.executor = RteExecutor(self.server, refresh_time=0.01)
+        self.worker_threads: list[Thread] = []
+
+    def tearDown(self) -> None:
+        self.executor.shutdown(cancel_futures=True)
+        self.server.release_waiting_workers()
+        self.server.stop()
+        for thread in self.worker_threads:
+            thread.join()
+
+    def start_worker(self, worker) -> None:
+        thread = Thread(target=worker.run)
+        thread.start()
+        self.worker_threads.append(thread)
+
+
+class TestExecutor(ExecutorTestCase):
+    def test_submit(self) -> None:
+        self.start_worker(TrivialWorker(self.server, 0.05))
+
+        future = self.executor.submit(b"task")
+
+        self.assertEqual(future.result(timeout=5), b"task")
+
+    def test_map(self) -> None:
+        self.start_worker(TrivialWorker(self.server, 0.05))
+        tasks = [bytes([i]) for i in range(20)]
+
+        results = list(self.executor.map(tasks, timeout=5, chunksize=4))
+
+        self.assertEqual(results, tasks)
+
+    def test_map_chunk_with_failed_task(self) -> None:
+        self.start_worker(RaisingWorker(self.server, 0.05))
+
+        results = self.executor.map([b"a", b"b"], timeout=5, chunksize=2)
+
+        with self.assertRaises(TaskFailedError):
+            next(results)
+
+    def test_failed_task(self) -> None:
+        self.start_worker(RaisingWorker(self.server, 0.05))
+
+        future = self.executor.submit(b"task")
+
+        with self.assertRaises(TaskFailedError):
+            future.result(timeout=5)
+
+    def test_cancel_queued_task(self) -> None:
+        future = self.executor.submit(b"task")  # No worker, so the task stays queued
+
+        self.assertTrue(future.cancel())
+        with self.assertRaises(CancelledError):
+            future.result()
+
+    def test_submit_after_shutdown(self) -> None:
+        self.executor.shutdown()
+
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(b"task")
+
+    def test_cancel_dispatched_task(self) -> None:
+        self.executor.shutdown()
+        self.server.stop()
+        self.server = Server(task_timeout=0.1, queue_ahead=1)  # Accepts a task without workers
+        self.executor = RteExecutor(self.server, refresh_time=0.01)
+
+        with mock.patch.object(self.server, "cancel_task", wraps=self.server.cancel_task) as cancel:
+            future = self.executor.submit(b"task")
+            for _ in range(100):  # No worker, so the task stays on the server
+                if self.server.stats()["rte_queue_depth"] == 1:
+                    break
+                time.sleep(0.01)
+
+            self.assertTrue(future.cancel())
+            for _ in range(100):
+                if cancel.called:
+                    break
+                time.sleep(0.01)
+
+        cancel.assert_called_once()
+
+    def test_server_error_fails_futures(self) -> None:
+        self.start_worker(TrivialWorker(self.server, 0.05))
+        error = ConnectionError("Server unavailable")
+
+        with mock.patch.object(self.server, "get_results", side_effect=error):
+            future = self.executor.submit(b"task")
+
+            with self.assertRaises(ConnectionError):
+                future.result(timeout=5)
+        with self.assertRaises(RuntimeError):
+            self.executor.submit(b"task")
@@ -1,8 +1,9 @@
+import time
 import unittest
 from unittest.mock import MagicMock, patch
 from threading import Thread
-from rte import Server, GrpcServer, RemoteServer, Task, Result
-from .stubs import ServerStub, TrivialClient, TrivialWorker
+from rte import Server, GrpcServer, RemoteServer, Task, Result, Timestamps
+from .stubs import ServerStub, TrivialClient, TrivialWorker, CancellableWorker
 
 
 PORT: int = 50051
@@ -32,22 +33,91 @@ class TestGrpc(unittest.TestCase):
 
     def test_add_task(self):
         task = Task(14, b"task")  # arbitrary
-        with patch.object(self.test_server, "add_task") as mock_add_task:
-            self.server.add_task(task)
+        with patch.object(self.test_server, "add_task", return_value=None) as mock_add_task:
+            self.assertIsNone(self.server.add_task(task))
             mock_add_task.assert_called_once_with(task)
 
+    def test_add_task_rejected(self):
+        task = Task(14, b"task", session="session")
+        with patch.object(self.test_server, "add_task", return_value=0.5) as mock_add_task:
+            self.assertEqual(self.server.add_task(task), 0.5)
+            mock_add_task.assert_called_once_with(task)
+
+    def test_add_graph(self):
+        tasks = [Task(14, b"a"), Task(15, b"b", dependencies=[14])]
+        self.test_server.reserve_ids = MagicMock(return_value=[15])
+        self.assertEqual(self.server.reserve_ids(1), [15])
+        with patch.object(self.test_server, "add_graph", return_value=None) as mock_add_graph:
+            self.assertIsNone(self.server.add_graph(tasks))
+            mock_add_graph.assert_called_once_with(tasks)
+        self.test_server.add_graph = MagicMock(side_effect=ValueError("invalid"))
+        with self.assertRaises(ValueError):
+            self.server.add_graph(tasks)
+
+    def test_add_reduction(self):
+        with patch.object(self.test_server, "add_reduction") as mock_add_reduction:
+            self.server.add_reduction(14, "sum_int64", 3)
+            mock_add_reduction.assert_called_once_with(14, "sum_int64", 3)
+        self.test_server.add_reduction = MagicMock(side_effect=ValueError("unknown"))
+        with self.assertRaises(ValueError):
+            self.server.add_reduction(14, "unknown", 3)
+
     def test_get_task(self):
         task = Task(15, b"task")  # arbitrary
         self.test_server.get_task = MagicMock(return_value=task)
         result = self.server.get_task()
         self.assertEqual(result, task)
 
+    def test_attempt(self):
+        self.test_server.get_task = MagicMock(return_value=Task(15, b"task", attempt=3))
+        self.assertEqual(self.server.get_task().attempt, 3)
+        with patch.object(self.test_server, "set_result") as mock_set_result:
+            self.server.set_result(Result(16, True, b"result", attempt=3))
+            self.assertEqual(mock_set_result.call_args.args[0].attempt, 3)
+
+    def test_deadline(self):
+        deadline = time.monotonic() + 10
+        self.test_server.get_task = MagicMock(return_value=Task(15, b"task", deadline=deadline))
+        self.assertAlmostEqual(self.server.get_task().deadline, deadline, delta=1)
+        expired = Result(16, False, b"", expired=True)
+        self.test_server.get_results = MagicMock(return_value=[expired])
+        self.assertTrue(self.server.get_results([16])[0].expired)
+
+    def test_get_task_with_affinity(self):
+        task = Task(15, b"task", affinity="key")  # arbitrary
+        self.test_server.get_task = MagicMock(return_value=task)
+        result = self.server.get_task("worker")
+        self.assertEqual(result, task)
+        self.test_server.get_task.assert_called_once_with("worker", None)
+
+    def test_get_task_timeout(self):
+        self.test_server.get_task = MagicMock(side_effect=TimeoutError)
+        with self.assertRaises(TimeoutError):
+            self.server.get_task("worker", 0.1)
+        self.test_server.get_task.assert_called_once_with("worker", 0.1)
+
+    def test_register_worker(self):
+        with patch.object(self.test_server, "register_worker") as mock_register_worker:
+            self.server.register_worker("worker")
+            mock_register_worker.assert_called_once_with("worker")
+
     def test_set_result(self):
         result = Result(16, True, b"result")  # arbitrary
         with patch.object(self.test_server, "set_result") as mock_set_result:
             self.server.set_result(result)
             mock_set_result.assert_called_once_with(result)
 
+    def test_set_result_with_timestamps(self):
+        started = time.monotonic()
+        result = Result(16, True, b"result", timestamps=Timestamps(started=started))
+        with patch.object(self.test_server, "set_result") as mock_set_result:
+            self.server.set_result(result)
+            received = mock_set_result.call_args.args[0].timestamps
+        self.assertIsNone(received.finished)
+        # Both ends share the clock, so only the transfer time is added
+        self.assertAlmostEqual(received.started, started, delta=0.1)
+        self.assertGreaterEqual(received.started, started)
+
     def test_get_results(self):
         task_ids = [17, 18]  # arbitrary
         results = [Result(tid, True, b"result") for tid in task_ids]
@@ -55,18 +125,82 @@ class TestGrpc(unittest.TestCase):
         result = self.server.get_results(task_ids)
         self.assertEqual(result, results)
 
+    def test_get_results_in_request_order(self):
+        ts = Timestamps(stored=time.monotonic())
+        ready = [Result(17, True, b"a", timestamps=ts), None, Result(20, False, b"", expired=True)]
+        self.test_server.get_results = MagicMock(return_value=ready)
+        results = self.server.get_results([20, 17, 18])
+        self.test_server.get_results.assert_called_once_with([17, 18, 20])  # Sorted on the wire
+        pairs = [r and (r.task_id, r.data) for r in results]
+        self.assertEqual(pairs, [(20, b""), (17, b"a"), None])
+        self.assertTrue(results[0].expired)
+        self.assertAlmostEqual(results[1].timestamps.stored, ts.stored, delta=0.1)
+        self.assertIsNone(results[0].timestamps)
+
+    def test_get_results_zero_copy(self):
+        server = RemoteServer(f"localhost:{PORT}", zero_copy=True)
+        self.test_server.get_results = MagicMock(return_value=[Result(1, True, b"ab")])
+        (result,) = server.get_results([1])
+        self.assertIsInstance(result.data, memoryview)
+        self.assertEqual(bytes(result.data), b"ab")
+
     def test_cancel_task(self):
         task_id = 19  # arbitrary
         with patch.object(self.test_server, "cancel_task") as mock_cancel_task:
             self.server.cancel_task(task_id)
             mock_cancel_task.assert_called_once_with(task_id)
 
+    def test_cancel_tasks(self):
+        with patch.object(self.test_server, "cancel_tasks") as mock_cancel_tasks:
+            self.server.cancel_tasks([1, 2])
+            mock_cancel_tasks.assert_called_once_with([1, 2])
+
     def test_is_task_canceled(self):
         for value in [True, False]:
             self.test_server.is_task_canceled = MagicMock(return_value=value)
             result = self.server.is_task_canceled(20)
             self.assertEqual(result, value)
 
+    def test_rpc_latency(self):
+        self.test_server.is_task_canceled = MagicMock(return_value=False)
+        self.server.is_task_canceled(20)
+        stats = self.grpc_server.stats()
+        self.assertEqual(stats['rte_rpc_seconds{method="is_task_canceled"}']["count"], 1)
+
+    def test_profiling(self):
+        self.test_server.get_profile = MagicMock(return_value="worker;execute_task 3\n")
+        with patch.object(self.test_server, "set_profiling") as mock_set_profiling:
+            self.server.set_profiling(True)
+            time.sleep(0.05)
+            self.server.set_profiling(False)
+            mock_set_profiling.assert_called_with(False)
+        profile = self.server.get_profile()
+        self.assertIn("grpc;", profile)
+        self.assertTrue(profile.endswith("worker;execute_task 3\n"))
+
+    def test_put_blob(self):
+        data = bytes(5_000_000)  # Larger than gRPC's default message size limit
+        self.test_server.put_blob = MagicMock(return_value="blob_id")
+        result = self.server.put_blob(data)
+        self.assertEqual(result, "blob_id")
+        self.test_server.put_blob.assert_called_once_with(data)
+
+    def test_get_blob(self):
+        data = bytes(5_000_000)  # Larger than gRPC's default message size limit
+        self.test_server.get_blob = MagicMock(return_value=data)
+        result = self.server.get_blob("blob_id")
+        self.assertEqual(result, data)
+
+    def test_get_missing_blob(self):
+        self.test_server.get_blob = MagicMock(return_value=None)
+        result = self.server.get_blob("blob_id")
+        self.assertIsNone(result)
+
+    def test_delete_blob(self):
+        with patch.object(self.test_server, "delete_blob") as mock_delete_blob:
+            self.server.delete_blob("blob_id")
+            mock_delete_blob.assert_called_once_with("blob_id")
+
 
 class TestGrpcSystem(unittest.TestCase):
     def setUp(self) -> None:
@@ -98,6 +232,47 @@ class TestGrpcSystem(unittest.TestCase):
             self.assertEqual(result.success, True)
             self.assertEqual(result.data, b"task")
 
+    def test_polling_worker(self) -> None:
+        client = TrivialClient(self.remote_server, 0.01)
+        client.tasks = [b"task" for _ in range(10)]
+        worker = TrivialWorker(self.server, 0.01, poll_timeout=0.05)
+
+        worker_thread = Thread(target=worker.run)
+        worker_thread.start()
+        time.sleep(0.2)  # Idle for a few polls before the first task
+
+        client.run()
+        self.server.release_waiting_workers()
+        worker_thread.join()
+        self.remote_server.stop()
+
+        self.assertEqual(len(client.results), 10)
+        self.assertEqual(self.remote_server.stats()["rte_waiting_workers"], 0)
+
+    def test_cancellation_is_pushed(self) -> None:
+        self.remote_server.stop()  # Times out tasks too fast for a worker that does not poll
+        server = Server(task_timeout=60)
+        rpc_server = GrpcServer(server, port=PORT + 1)
+        rpc_server.start()
+        self.addCleanup(rpc_server.stop, 0)
+        self.addCleanup(server.stop)
+        remote = RemoteServer(f"localhost:{PORT + 1}")
+        worker = CancellableWorker(remote, 60)  # Would not poll before the task ends
+        worker_thread = Thread(target=worker.run, args=(1,))
+        worker_thread.start()
+
+        remote.add_task(Task(0, b"task"))
+        while server.stats()["rte_tasks_in_flight"] == 0:
+            time.sleep(0.01)
+        time.sleep(0.05)  # Let the worker's watch start
+        remote.cancel_tasks([0])
+        worker_thread.join()
+
+        result = remote.get_results([0])[0]
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+
     def test_many_workers_many_clients(self) -> None:
         clients = [TrivialClient(self.remote_server, 0.01) for _ in range(10)]
         for client in clients:
@@ -104,6 +104,18 @@ class TestMultiHeartbeatMonitor(unittest.TestCase):
         self.assertTrue(self.monitor.is_alive(1))
         self.assertFalse(self.monitor.is_alive(2))
 
+    def test_on_death_may_use_the_monitor(self):
+        alive = []
+
+        def on_death(heart_id):
+            alive.append(monitor.is_alive(heart_id))  # Deadlocks if a lock is held
+
+        monitor = MultiHeartbeatMonitor(threshold=0.05, on_death=on_death, shards=4)
+        self.addCleanup(monitor.stop)
+        monitor.add(3)
+        time.sleep(0.15)  # Above the threshold
+        self.assertEqual(alive, [False])
+
 
 # Integration tests
 class TestHeartBeatHeart(unittest.TestCase):
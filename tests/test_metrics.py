@@ -0,0 +1,81 @@
+import unittest
+from urllib.request import urlopen
+from rte import Server, Task, Result, Registry, MetricsServer
+
+
+class TestRegistry(unittest.TestCase):
+    def setUp(self) -> None:
+        self.registry = Registry()
+
+    def test_counter(self) -> None:
+        counter = self.registry.counter("requests_total", "Requests.")
+        counter.inc()
+        counter.inc(2)
+        self.assertEqual(self.registry.stats()["requests_total"], 3)
+
+    def test_same_name_same_metric(self) -> None:
+        a = self.registry.counter("requests_total", "Requests.", {"method": "get"})
+        b = self.registry.counter("requests_total", "Requests.", {"method": "get"})
+        self.assertIs(a, b)
+
+    def test_type_mismatch(self) -> None:
+        self.registry.counter("requests_total", "Requests.")
+        with self.assertRaises(ValueError):
+            self.registry.gauge("requests_total", "Requests.")
+
+    def test_gauge_function(self) -> None:
+        self.registry.gauge("depth", "Depth.", function=lambda: 7)
+        self.assertEqual(self.registry.stats()["depth"], 7)
+
+    def test_histogram(self) -> None:
+        histogram = self.registry.histogram("latency", "Latency.", buckets=(1.0, 2.0))
+        for value in [0.5, 1.5, 1.5, 3.0]:
+            histogram.observe(value)
+        snapshot = histogram.snapshot()
+        self.assertEqual(snapshot["count"], 4)
+        self.assertEqual(snapshot["sum"], 6.5)
+        self.assertEqual(snapshot["buckets"], {1.0: 1, 2.0: 3, float("inf"): 4})
+        self.assertEqual(histogram.quantile(0.5), 2.0)
+
+    def test_exposition(self) -> None:
+        self.registry.counter("requests_total", "Requests.", {"method": "get"}).inc()
+        self.registry.histogram("latency", "Latency.", buckets=(1.0,)).observe(0.5)
+        text = self.registry.exposition()
+        self.assertIn("# TYPE requests_total counter", text)
+        self.assertIn('requests_total{method="get"} 1', text)
+        self.assertIn('latency_bucket{le="1.0"} 1', text)
+        self.assertIn('latency_bucket{le="+Inf"} 1', text)
+        self.assertIn("latency_count 1", text)
+
+    def test_metrics_server(self) -> None:
+        self.registry.counter("requests_total", "Requests.").inc()
+        server = MetricsServer(self.registry, port=0)
+        server.start()
+        try:
+            with urlopen(f"http://localhost:{server.port}/metrics") as response:
+                text = response.read().decode()
+        finally:
+            server.stop()
+        self.assertIn("requests_total 1", text)
+
+
+class TestServerMetrics(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = Server(task_timeout=0.1)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def test_stats(self) -> None:
+        self.server.add_task(Task(0, b"task"))
+        self.server.add_task(Task(1, b"task"))
+        self.server.get_task()
+        self.server.set_result(Result(0, True, b"result"))
+
+        stats = self.server.stats()
+
+        self.assertEqual(stats["rte_tasks_submitted_total"], 2)
+        self.assertEqual(stats["rte_queue_depth"], 1)
+        self.assertEqual(stats["rte_pending_results"], 1)
+        self.assertEqual(stats['rte_tasks_completed_total{outcome="success"}'], 1)
+        self.assertEqual(stats["rte_queue_wait_seconds"]["count"], 1)
@@ -0,0 +1,68 @@
+import threading
+import unittest
+from time import sleep
+from rte import Server, Task
+from rte.profiling import SamplingProfiler, format_collapsed, merge_samples
+from .stubs import LongRunningWorker
+
+
+def busy_function(stop: threading.Event) -> None:
+    while not stop.is_set():
+        sleep(0.001)
+
+
+class TestSamplingProfiler(unittest.TestCase):
+    def test_samples_selected_thread(self) -> None:
+        stop = threading.Event()
+        thread = threading.Thread(target=busy_function, args=(stop,), name="selected")
+        thread.start()
+        profiler = SamplingProfiler(lambda t: t.name == "selected")
+        for _ in range(5):
+            profiler.sample()
+        stop.set()
+        thread.join()
+
+        samples = profiler.samples()
+        self.assertEqual(sum(samples.values()), 5)
+        for stack in samples:
+            self.assertIn("busy_function", stack)
+            self.assertNotIn("test_samples_selected_thread", stack)
+
+    def test_start_stop(self) -> None:
+        profiler = SamplingProfiler(lambda t: t is threading.main_thread(), interval=0.001)
+        profiler.start()
+        sleep(0.05)
+        profiler.stop()
+        self.assertFalse(profiler.running)
+        self.assertGreater(sum(profiler.drain().values()), 0)
+        self.assertEqual(profiler.samples(), {})
+
+    def test_format_collapsed(self) -> None:
+        samples = {"main;run": 2, "main;wait": 1}
+        self.assertEqual(
+            format_collapsed(samples, root="worker"), "worker;main;run 2\nworker;main;wait 1\n"
+        )
+
+    def test_merge_samples(self) -> None:
+        merged = {"a": 1}
+        merge_samples(merged, {"a": 2, "b": 1})
+        self.assertEqual(merged, {"a": 3, "b": 1})
+
+
+class TestWorkerProfiling(unittest.TestCase):
+    def test_worker_samples_are_merged_on_the_server(self) -> None:
+        server = Server(1)
+        worker = LongRunningWorker(server, 0.01)
+        server.set_profiling(True)
+        server.add_task(Task(0, b"task"))
+        worker.run(1)
+        profile = server.get_profile()
+        server.set_profiling(False)
+        server.add_task(Task(1, b"task"))
+        worker.run(1)
+        server.stop()
+
+        self.assertIn("execute_task", profile)
+        for line in profile.splitlines():
+            self.assertTrue(line.startswith("worker;"))
+        self.assertEqual(server.get_profile(), profile)  # No samples without profiling
@@ -0,0 +1,161 @@
+import unittest
+from threading import Thread
+from time import monotonic, sleep
+from rte import Task
+from rte.ready_queue import ReadyQueue
+
+
+class TestReadyQueue(unittest.TestCase):
+    ARENA = False
+
+    def setUp(self) -> None:
+        self.queue = ReadyQueue(affinity_wait=0.2, arena=self.ARENA)
+
+    def test_fifo(self) -> None:
+        self.queue.put(Task(0, b"a"))
+        self.queue.put(Task(1, b"b"))
+        self.assertEqual(self.queue.get().id, 0)
+        self.assertEqual(self.queue.get().id, 1)
+
+    def test_release(self) -> None:
+        results = []
+        thread = Thread(target=lambda: results.append(self.queue.get()))
+        thread.start()
+
+        self.queue.release()
+        thread.join()
+
+        self.assertEqual(results, [None])
+
+    def test_timeout(self) -> None:
+        with self.assertRaises(TimeoutError):
+            self.queue.get(timeout=0.01)
+
+    def test_timeout_while_affinity_task_waits(self) -> None:
+        self.queue.put(Task(0, b"", affinity="key"))
+        self.queue.get("worker_a")
+        self.queue.put(Task(1, b"", affinity="key"))
+
+        with self.assertRaises(TimeoutError):
+            self.queue.get("worker_b", timeout=0.01)
+
+    def test_prefers_worker_of_affinity_key(self) -> None:
+        self.queue.put(Task(0, b"", affinity="key"))
+        self.queue.get("worker_a")
+        self.queue.put(Task(1, b""))
+        self.queue.put(Task(2, b"", affinity="key"))
+
+        self.assertEqual(self.queue.get("worker_a").id, 2)
+        self.assertEqual(self.queue.get("worker_b").id, 1)
+        self.assertEqual(self.queue.affinity_hit_rate(), 0.5)
+
+    def test_other_worker_waits(self) -> None:
+        self.queue.put(Task(0, b"", affinity="key"))
+        self.queue.get("worker_a")
+        self.queue.put(Task(1, b"", affinity="key"))
+        results = []
+        thread = Thread(target=lambda: results.append(self.queue.get("worker_b")))
+        thread.start()
+
+        sleep(0.1)  # Less than the affinity wait
+        self.assertEqual(results, [])
+        thread.join()  # Falls back to worker_b after the affinity wait
+
+        self.assertEqual(results[0].id, 1)
+        self.assertEqual(len(self.queue), 0)
+
+    def test_offer_respects_limits(self) -> None:
+        queue = ReadyQueue(affinity_wait=0.2, max_tasks=2, max_bytes=4, arena=self.ARENA)
+
+        self.assertTrue(queue.offer([Task(0, b"ab")]))
+        self.assertFalse(queue.offer([Task(1, b"abc")]))
+        self.assertTrue(queue.offer([Task(1, b"cd")]))
+        self.assertFalse(queue.offer([Task(2, b"")]))
+        queue.remove({0})
+        self.assertTrue(queue.offer([Task(2, b"")]))
+        self.assertEqual(queue.bytes, 2)
+
+    def test_session_limits(self) -> None:
+        queue = ReadyQueue(affinity_wait=0.2, max_session_tasks=1, arena=self.ARENA)
+
+        self.assertTrue(queue.offer([Task(0, b"", session="a")]))
+        self.assertFalse(queue.offer([Task(1, b"", session="a")]))
+        self.assertTrue(queue.offer([Task(1, b"", session="b")]))
+        queue.get()
+        self.assertTrue(queue.offer([Task(2, b"", session="a")]))
+
+    def test_offer_waits_for_room(self) -> None:
+        queue = ReadyQueue(affinity_wait=0.2, max_tasks=1, arena=self.ARENA)
+        queue.put(Task(0, b""))
+        thread = Thread(target=lambda: (sleep(0.05), queue.get()))
+        thread.start()
+
+        self.assertTrue(queue.offer([Task(1, b"")], timeout=5))
+        thread.join()
+
+    def test_earliest_deadline_first(self) -> None:
+        now = monotonic()
+        self.queue.put(Task(0, b""))
+        self.queue.put(Task(1, b"", deadline=now + 20))
+        self.queue.put(Task(2, b"", deadline=now + 10))
+
+        self.assertEqual([self.queue.get().id for _ in range(3)], [2, 1, 0])
+
+    def test_expired_task_is_not_dispatched(self) -> None:
+        self.queue.put(Task(0, b"", deadline=monotonic() + 0.01))
+        self.queue.put(Task(1, b""))
+        sleep(0.02)
+
+        self.assertEqual(self.queue.get().id, 1)
+        self.assertEqual([task.id for task in self.queue.pop_expired(1)], [0])
+        self.assertEqual(len(self.queue), 0)
+
+    def test_pop_expired_waits_for_deadline(self) -> None:
+        self.queue.put(Task(0, b"", deadline=monotonic() + 0.05))
+
+        self.assertEqual([task.id for task in self.queue.pop_expired(5)], [0])
+
+    def test_remove_skips_entries_lazily(self) -> None:
+        for task_id in range(200):
+            self.queue.put(Task(task_id, b"", deadline=monotonic() + 60 if task_id % 2 else None))
+        self.queue.remove(set(range(1, 101)))  # More than one scan window
+
+        self.assertEqual(len(self.queue), 100)
+        self.assertEqual([self.queue.get().id for _ in range(3)], [101, 103, 105])
+        self.assertEqual(self.queue.get("worker", timeout=0).id, 107)
+
+    def test_remove_does_not_touch_other_tasks(self) -> None:
+        for task_id in range(1000):
+            self.queue.put(Task(task_id, b"a", session="s"))
+        tasks = self.queue._tasks  # pylint: disable=protected-access
+
+        self.assertEqual(self.queue.remove({500, 2000}), [500])
+        self.assertIs(self.queue._tasks, tasks)  # pylint: disable=protected-access
+        self.assertEqual((len(self.queue), self.queue.bytes), (999, 999))
+        ids = [self.queue.get().id for _ in range(999)]
+        self.assertEqual(ids, [task_id for task_id in range(1000) if task_id != 500])
+
+
+class TestArenaReadyQueue(TestReadyQueue):
+    "Runs the tests above with plain tasks in an arena, and tests how it mixes with others."
+
+    ARENA = True
+
+    def test_keeps_fields(self) -> None:
+        self.queue.put(Task(0, b"a", session="s", max_attempts=3))
+        self.assertEqual(self.queue.get(), Task(0, b"a", session="s", max_attempts=3))
+
+    def test_fifo_across_arena(self) -> None:
+        self.queue.put(Task(0, b""))
+        self.queue.put(Task(1, b"", affinity="key"))
+        self.queue.put(Task(2, b""))
+
+        self.assertEqual([self.queue.get("worker").id for _ in range(3)], [0, 1, 2])
+
+    def test_remove(self) -> None:
+        for task_id in range(3):
+            self.queue.put(Task(task_id, b"ab", session="s"))
+
+        self.assertEqual(self.queue.remove({1}), [1])
+        self.assertEqual(self.queue.bytes, 4)
+        self.assertEqual([self.queue.get().id for _ in range(2)], [0, 2])
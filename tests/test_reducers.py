@@ -0,0 +1,31 @@
+import struct
+import unittest
+from rte.reducers import REDUCERS
+
+
+def _int64(*values: int) -> bytes:
+    return struct.pack(f"<{len(values)}q", *values)
+
+
+def _float64(*values: float) -> bytes:
+    return struct.pack(f"<{len(values)}d", *values)
+
+
+class TestReducers(unittest.TestCase):
+    def test_sum_merges_histograms(self) -> None:
+        self.assertEqual(REDUCERS["sum_int64"](_int64(1, 0, 2), _int64(3, 4, 5)), _int64(4, 4, 7))
+
+    def test_min_max(self) -> None:
+        a, b = _float64(1.0, 5.0), _float64(2.0, 3.0)
+        self.assertEqual(REDUCERS["min_float64"](a, b), _float64(1.0, 3.0))
+        self.assertEqual(REDUCERS["max_float64"](a, b), _float64(2.0, 5.0))
+
+    def test_top_k(self) -> None:
+        top = REDUCERS["top_k_float64"](_float64(9.0, 1.0), _float64(4.0, 7.0))
+        self.assertEqual(top, _float64(9.0, 7.0))
+
+    def test_length_mismatch(self) -> None:
+        with self.assertRaises(ValueError):
+            REDUCERS["sum_int64"](_int64(1), _int64(1, 2))
+        with self.assertRaises(ValueError):
+            REDUCERS["sum_int64"](b"\x00" * 3, b"\x00" * 3)
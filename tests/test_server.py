@@ -1,7 +1,10 @@
+import struct
+import time
 import unittest
 from threading import Thread
 from time import sleep
-from rte import Server, Task, Result
+from rte import Server, Task, Result, Timestamps
+from rte.chunking import unpack
 from .stubs import wait_for_next_id
 
 
@@ -55,9 +58,54 @@ class TestServer(ServerTestCase):
 
     def test_cancel_task(self) -> None:
         self.server.add_task(Task(0, b"task"))
+        self.server.get_task()
         self.server.cancel_task(0)
         self.assertTrue(self.server.is_task_canceled(0))
 
+    def test_cancel_queued_tasks(self) -> None:
+        for task_id in range(3):
+            self.server.add_task(Task(task_id, b"task"))
+
+        self.server.cancel_tasks([0, 2])
+
+        self.assertEqual(Task(1, b"task"), self.server.get_task())
+        results = self.server.get_results([0, 2])
+        self.assertEqual([r is not None and not r.success for r in results], [True, True])
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 0)
+
+    def test_cancel_during_retry_backoff(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2, backoff=0.05))
+        self.server.get_task()
+        self.server.set_result(Result(0, False, b""))
+        self.server.cancel_tasks([0])
+        sleep(0.1)  # The retry is due
+
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 0)
+        result = self.server.get_results([0])[0]
+        self.assertIsNotNone(result)
+
+    def test_cancellations_are_pushed_to_the_worker(self) -> None:
+        self.server.register_worker("worker")
+        self.server.add_task(Task(0, b"task"))
+        self.server.add_task(Task(1, b"task"))
+        self.server.get_task("worker")
+        self.server.get_task()
+        canceled = []
+        watch = Thread(
+            target=lambda: canceled.extend(self.server.watch_cancellations("worker"))
+        )
+        watch.start()
+        sleep(0.05)  # Let the watch start
+
+        self.server.cancel_tasks([0, 1])
+        self.server.unregister_worker("worker")
+        watch.join()
+
+        self.assertEqual(canceled, [0])
+
+    def test_watch_of_unknown_worker_ends(self) -> None:
+        self.assertEqual(list(self.server.watch_cancellations("worker")), [])
+
     def test_get_failed_result(self) -> None:
         result = Result(0, False, b"error")
         self.server.set_result(result)
@@ -74,6 +122,471 @@ class TestServer(ServerTestCase):
         if result is not None:
             self.assertFalse(result.success)
 
+    def test_result_before_reported_timeout_is_kept(self) -> None:
+        self.server.add_task(Task(0, b"task"))
+        self.server.get_task()
+        self.server.set_result(Result(0, True, b"result"))
+        self.server._on_task_timeout(0)  # pylint: disable=protected-access
+
+        result = self.server.get_results([0])[0]
+
+        if result is None:
+            self.fail("No result available")
+        self.assertTrue(result.success)
+
+
+class TestAttemptFencing(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = Server(task_timeout=10)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def time_out(self, task_id: int) -> None:
+        self.server._on_task_timeout(task_id)  # pylint: disable=protected-access
+
+    def test_attempts_are_numbered(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        first = self.server.get_task()
+        self.time_out(0)
+        second = self.server.get_task()
+
+        self.assertEqual([first.attempt, second.attempt], [1, 2])
+
+    def test_late_result_completes_queued_retry(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        self.server.get_task()
+        self.time_out(0)
+
+        self.server.set_result(Result(0, True, b"late", attempt=1))
+
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 0)
+        result = self.server.get_results([0])[0]
+        self.assertEqual((result.success, result.data), (True, b"late"))
+
+    def test_late_result_cancels_running_retry(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        self.server.get_task()
+        self.time_out(0)
+        self.server.get_task()
+
+        self.server.set_result(Result(0, True, b"late", attempt=1))
+
+        self.assertTrue(self.server.is_task_canceled(0))
+        self.server.set_result(Result(0, True, b"retry", attempt=2))
+        self.assertFalse(self.server.is_task_canceled(0))
+        self.assertEqual(self.server.get_results([0])[0].data, b"late")
+        self.assertIsNone(self.server.get_results([0])[0])
+
+    def test_late_failure_keeps_retry(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        self.server.get_task()
+        self.time_out(0)
+
+        self.server.set_result(Result(0, False, b"", attempt=1))
+
+        self.assertIsNone(self.server.get_results([0])[0])
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 1)
+
+    def test_late_result_of_complete_task_is_ignored(self) -> None:
+        self.server.add_task(Task(0, b"task"))
+        self.server.get_task()
+        self.time_out(0)
+
+        self.server.set_result(Result(0, True, b"late", attempt=1))
+        self.assertFalse(self.server.get_results([0])[0].success)
+        self.server.set_result(Result(0, True, b"late", attempt=1))
+
+        self.assertIsNone(self.server.get_results([0])[0])
+        self.assertEqual(self.server.stats()["rte_pending_results"], 0)
+
+
+class TestSharding(unittest.TestCase):
+    def test_tasks_across_shards(self) -> None:
+        server = Server(task_timeout=1, shards=4)
+        self.addCleanup(server.stop)
+        for task_id in range(8):
+            server.add_task(Task(task_id, b"task"))
+        for _ in range(8):
+            task = server.get_task()
+            if task is None:
+                self.fail("No task available")
+            server.set_result(Result(task.id, True, bytes([task.id])))
+        server.cancel_task(5)
+
+        results = server.get_results(list(range(8)))
+
+        self.assertEqual([r.data for r in results if r is not None], [bytes([i]) for i in range(8)])
+        self.assertEqual(server.stats()["rte_pending_results"], 0)
+        self.assertTrue(server.is_task_canceled(5))
+        self.assertFalse(server.is_task_canceled(4))
+
+
+class TestQueueAhead(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = Server(task_timeout=0.1, queue_ahead=3)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def test_ids_without_waiting_worker(self) -> None:
+        ids = [self.server.get_next_id() for _ in range(4)]
+        self.assertEqual([0, 1, 2, None], ids)
+
+    def test_returned_id_does_not_release_an_extra_worker(self) -> None:
+        self.server.return_id(self.server.get_next_id())
+        waiting = Thread(target=self.server.get_task)
+        waiting.start()
+        while self.server.stats()["rte_waiting_workers"] == 0:
+            sleep(0.01)
+        self.server.release_waiting_workers()
+        waiting.join()
+
+        self.server.add_task(Task(0, b"task"))
+        results = []
+        worker = Thread(target=lambda: results.append(self.server.get_task()))
+        worker.start()
+        worker.join(1)
+
+        self.assertEqual(results, [Task(0, b"task")])
+
+    def test_returned_id_is_reissued(self) -> None:
+        ids = [self.server.get_next_id() for _ in range(3)]
+        self.server.return_id(ids[0])
+        self.assertEqual(ids[0], self.server.get_next_id())
+        self.assertIsNone(self.server.get_next_id())
+
+    def test_dispatch_frees_capacity(self) -> None:
+        for _ in range(3):
+            task_id = self.server.get_next_id()
+            if task_id is None:
+                self.fail("No task id available")
+            self.server.add_task(Task(task_id, b"task"))
+        self.assertIsNone(self.server.get_next_id())
+
+        self.server.get_task()
+
+        self.assertIsNotNone(self.server.get_next_id())
+
+
+class TestWorkerLeases(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = Server(task_timeout=0.1, worker_lease=0.05)
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def test_get_task_timeout(self) -> None:
+        with self.assertRaises(TimeoutError):
+            self.server.get_task("worker", timeout=0.01)
+
+    def test_registered_worker_attracts_an_id(self) -> None:
+        self.assertIsNone(self.server.get_next_id())
+        self.server.register_worker("worker")
+
+        self.assertIsNotNone(self.server.get_next_id())
+        self.assertIsNone(self.server.get_next_id())
+
+    def test_lease_expires(self) -> None:
+        self.server.register_worker("worker")
+        sleep(0.1)
+
+        self.assertIsNone(self.server.get_next_id())
+        self.assertEqual(self.server.stats()["rte_idle_workers"], 0)
+
+    def test_timed_out_worker_stays_idle(self) -> None:
+        with self.assertRaises(TimeoutError):
+            self.server.get_task("worker", timeout=0.01)
+
+        self.assertEqual(self.server.stats()["rte_idle_workers"], 1)
+        self.assertIsNotNone(self.server.get_next_id())
+
+    def test_unregistered_worker_attracts_no_id(self) -> None:
+        self.server.register_worker("worker")
+        self.server.unregister_worker("worker")
+
+        self.assertIsNone(self.server.get_next_id())
+
+    def test_busy_worker_is_not_idle(self) -> None:
+        self.server.register_worker("worker")
+        self.server.add_task(Task(0, b"task"))
+        self.server.get_task("worker")
+
+        self.assertEqual(self.server.stats()["rte_idle_workers"], 0)
+
+    def test_release_between_requests(self) -> None:
+        self.server.register_worker("worker")
+        self.server.release_waiting_workers()
+
+        self.assertIsNone(self.server.get_task("worker", timeout=1))
+        self.assertIsNone(self.server.get_next_id())
+
+
+class TestAdmission(unittest.TestCase):
+    def setUp(self) -> None:
+        self.server = Server(
+            task_timeout=0.1, max_queued_tasks=2, max_session_bytes=8, retry_after=0.5
+        )
+
+    def tearDown(self) -> None:
+        self.server.stop()
+
+    def test_rejects_beyond_task_limit(self) -> None:
+        self.assertIsNone(self.server.add_task(Task(0, b"")))
+        self.assertIsNone(self.server.add_task(Task(1, b"")))
+
+        self.assertEqual(self.server.add_task(Task(2, b"")), 0.5)
+        self.assertEqual(self.server.stats()["rte_tasks_rejected_total"], 1)
+        self.server.get_task()
+        self.assertIsNone(self.server.add_task(Task(2, b"")))
+
+    def test_rejects_beyond_session_bytes(self) -> None:
+        self.assertIsNone(self.server.add_task(Task(0, b"12345", session="a")))
+
+        self.assertEqual(self.server.add_task(Task(1, b"12345", session="a")), 0.5)
+        self.assertIsNone(self.server.add_task(Task(1, b"12345", session="b")))
+        self.assertEqual(self.server.stats()["rte_queued_bytes"], 10)
+
+    def test_admits_oversized_task_into_empty_session(self) -> None:
+        self.assertIsNone(self.server.add_task(Task(0, bytes(100), session="a")))
+
+    def test_retries_ignore_limits(self) -> None:
+        self.server.add_task(Task(0, b"", max_attempts=2))
+        self.server.get_task()
+        self.server.add_task(Task(1, b""))
+        self.server.add_task(Task(2, b""))
+        self.server.set_result(Result(0, False, b""))
+
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 3)
+
+    def test_blocks_until_admitted(self) -> None:
+        server = Server(task_timeout=0.1, max_queued_tasks=1, admission_wait=5)
+        server.add_task(Task(0, b""))
+        thread = Thread(target=lambda: (sleep(0.05), server.get_task()))
+        thread.start()
+
+        self.assertIsNone(server.add_task(Task(1, b"")))
+        thread.join()
+        server.stop()
+
+    def test_task_canceled_while_rejected_fails(self) -> None:
+        self.server.cancel_tasks([5])
+
+        self.assertIsNone(self.server.add_task(Task(5, b"")))
+        result = self.server.get_results([5])[0]
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 0)
+
+
+class TestDeadlines(ServerTestCase):
+    def test_expires_undispatched_task(self) -> None:
+        self.server.add_task(Task(0, b"", deadline=time.monotonic() + 0.05))
+        result = None
+        for _ in range(100):
+            result = self.server.get_results([0])[0]
+            if result is not None:
+                break
+            sleep(0.01)
+
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+        self.assertTrue(result.expired)
+        self.assertEqual(self.server.stats()["rte_tasks_expired_total"], 1)
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 0)
+
+    def test_expired_on_arrival(self) -> None:
+        self.server.add_task(Task(0, b"", deadline=time.monotonic() - 1))
+
+        result = self.server.get_results([0])[0]
+        if result is None:
+            self.fail("No result available")
+        self.assertTrue(result.expired)
+
+    def test_retry_after_deadline_expires(self) -> None:
+        self.server.add_task(Task(0, b"", max_attempts=2, deadline=time.monotonic() + 0.05))
+        self.server.get_task()
+        sleep(0.06)
+        self.server.set_result(Result(0, False, b""))
+
+        result = self.server.get_results([0])[0]
+        if result is None:
+            self.fail("No result available")
+        self.assertTrue(result.expired)
+        self.assertEqual(result.attempts, 1)
+
+
+class TestGraphs(ServerTestCase):
+    def test_chain(self) -> None:
+        self.server.add_graph([Task(0, b"a"), Task(1, b"b:", dependencies=[0])])
+        self.server.get_task()
+        self.server.set_result(Result(0, True, b"x"))
+
+        task = self.server.get_task()
+        self.assertEqual((task.id, task.data), (1, b"b:x"))
+        self.server.set_result(Result(1, True, b"y"))
+        self.assertEqual([r and r.data for r in self.server.get_results([0, 1])], [None, b"y"])
+
+    def test_fan_in(self) -> None:
+        self.server.add_graph([Task(0, b""), Task(1, b""), Task(2, b"c", dependencies=[0, 1])])
+        for task_id in (1, 0):
+            self.server.get_task()
+            self.server.set_result(Result(task_id, True, bytes([task_id])))
+
+        task = self.server.get_task()
+        self.assertEqual(unpack(task.data), [b"c", b"\x00", b"\x01"])
+
+    def test_failure_fails_dependents(self) -> None:
+        self.server.add_graph(
+            [Task(0, b""), Task(1, b"", dependencies=[0]), Task(2, b"", dependencies=[1])]
+        )
+        self.server.get_task()
+        self.server.set_result(Result(0, False, b""))
+
+        results = self.server.get_results([0, 1, 2])
+        self.assertIsNone(results[0])
+        self.assertIsNone(results[1])
+        if results[2] is None:
+            self.fail("No result available")
+        self.assertFalse(results[2].success)
+
+    def test_cancel_waiting_task(self) -> None:
+        self.server.add_graph([Task(0, b""), Task(1, b"", dependencies=[0])])
+        self.server.cancel_tasks([1])
+        self.server.get_task()
+        self.server.set_result(Result(0, True, b""))
+
+        results = self.server.get_results([0, 1])
+        self.assertIsNone(results[0])
+        if results[1] is None:
+            self.fail("No result available")
+        self.assertFalse(results[1].success)
+        self.assertEqual(self.server.stats()["rte_queue_depth"], 0)
+
+    def test_dependency_must_come_first(self) -> None:
+        with self.assertRaises(ValueError):
+            self.server.add_graph([Task(1, b"", dependencies=[0]), Task(0, b"")])
+
+    def test_invalid_graph_releases_its_ids(self) -> None:
+        server = Server(task_timeout=0.1, queue_ahead=2)
+        first, second = server.reserve_ids(2)
+        self.assertIsNone(server.get_next_id())
+
+        with self.assertRaises(ValueError):
+            server.add_graph([Task(second, b"", dependencies=[first]), Task(first, b"")])
+        self.assertIn(server.get_next_id(), (first, second))
+        server.stop()
+
+    def test_reserved_ids_count_until_dispatched(self) -> None:
+        server = Server(task_timeout=0.1, queue_ahead=1)
+        (task_id,) = server.reserve_ids(1)
+
+        self.assertIsNone(server.get_next_id())
+        server.add_graph([Task(task_id, b"")])
+        server.get_task()
+        self.assertIsNotNone(server.get_next_id())
+        server.stop()
+
+
+class TestBlobs(ServerTestCase):
+    def test_put_get_blob(self) -> None:
+        blob_id = self.server.put_blob(b"blob")
+        self.assertEqual(b"blob", self.server.get_blob(blob_id))
+
+    def test_blob_id_is_content_address(self) -> None:
+        self.assertEqual(self.server.put_blob(b"blob"), self.server.put_blob(b"blob"))
+        self.assertNotEqual(self.server.put_blob(b"blob"), self.server.put_blob(b"other"))
+
+    def test_delete_blob(self) -> None:
+        blob_id = self.server.put_blob(b"blob")
+        self.server.delete_blob(blob_id)
+        self.assertIsNone(self.server.get_blob(blob_id))
+
+
+class TestRetry(ServerTestCase):
+    def test_failed_task_is_requeued(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        self.server.get_task()
+        self.server.set_result(Result(0, False, b""))
+
+        self.assertIsNone(self.server.get_results([0])[0])
+        self.assertEqual(Task(0, b"task", max_attempts=2), self.server.get_task())
+
+    def test_final_result_counts_attempts(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        for _ in range(2):
+            self.server.get_task()
+            self.server.set_result(Result(0, False, b""))
+
+        result = self.server.get_results([0])[0]
+
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+        self.assertEqual(2, result.attempts)
+
+    def test_timed_out_task_is_requeued(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        self.server.get_task()
+
+        sleep(0.2)  # Wait for the task to time out
+
+        self.assertIsNone(self.server.get_results([0])[0])
+        self.assertEqual(Task(0, b"task", max_attempts=2), self.server.get_task())
+
+    def test_backoff(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2, backoff=0.2))
+        self.server.get_task()
+        self.server.set_result(Result(0, False, b""))
+
+        start = time.perf_counter()
+        self.server.get_task()
+
+        self.assertGreaterEqual(time.perf_counter() - start, 0.15)
+
+    def test_canceled_task_is_not_requeued(self) -> None:
+        self.server.add_task(Task(0, b"task", max_attempts=2))
+        self.server.get_task()
+        self.server.cancel_task(0)
+        self.server.set_result(Result(0, False, b""))
+
+        result = self.server.get_results([0])[0]
+
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+
+
+class TestTimestamps(ServerTestCase):
+    def test_timed_result_carries_timestamps(self) -> None:
+        self.server.add_task(Task(0, b"task", timed=True))
+        self.server.get_task()
+        started = time.monotonic()
+        self.server.set_result(Result(0, True, b"", timestamps=Timestamps(started=started)))
+
+        result = self.server.get_results([0])[0]
+
+        if result is None or result.timestamps is None:
+            self.fail("No timestamps available")
+        ts = result.timestamps
+        self.assertEqual(started, ts.started)
+        self.assertLessEqual(ts.submitted, ts.dispatched)
+        self.assertLessEqual(ts.dispatched, started)
+        self.assertLessEqual(started, ts.stored)
+
+    def test_untimed_result_has_no_timestamps(self) -> None:
+        self.server.add_task(Task(0, b"task"))
+        self.server.get_task()
+        self.server.set_result(Result(0, True, b""))
+
+        result = self.server.get_results([0])[0]
+
+        if result is None:
+            self.fail("No result available")
+        self.assertIsNone(result.timestamps)
+
 
 # Integration Server Client Worker
 # 1 - 1
@@ -85,3 +598,87 @@ class TestServer(ServerTestCase):
 # test many tasks
 # n - n
 # test mayhem
+
+
+class TestReductions(ServerTestCase):
+    def _reduce(self, results: list[Result]) -> tuple[int, list[int]]:
+        "Runs one task per result in a reduction of them, and returns the IDs."
+        reduction_id, *task_ids = self.server.reserve_ids(len(results) + 1)
+        self.server.add_reduction(reduction_id, "sum_int64", len(results))
+        self.server.add_graph([Task(i, b"", reduction=reduction_id) for i in task_ids])
+        for task_id, result in zip(task_ids, results):
+            self.server.get_task()
+            result.task_id = task_id
+            self.server.set_result(result)
+        return reduction_id, task_ids
+
+    def test_sum(self) -> None:
+        reduction_id, task_ids = self._reduce(
+            [Result(0, True, struct.pack("<q", i)) for i in (1, 2, 3)]
+        )
+
+        self.assertEqual(self.server.get_results(task_ids), [None] * 3)
+        (result,) = self.server.get_results([reduction_id])
+        if result is None:
+            self.fail("No result available")
+        self.assertTrue(result.success)
+        self.assertEqual(struct.unpack("<q", result.data), (6,))
+
+    def test_failure_fails_reduction(self) -> None:
+        reduction_id, _ = self._reduce(
+            [Result(0, True, struct.pack("<q", 1)), Result(0, False, b"error")]
+        )
+
+        (result,) = self.server.get_results([reduction_id])
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+
+    def test_reducer_error_fails_reduction(self) -> None:
+        reduction_id, _ = self._reduce([Result(0, True, b"\x00" * 8), Result(0, True, b"")])
+
+        (result,) = self.server.get_results([reduction_id])
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+
+    def test_unknown_reducer(self) -> None:
+        first, second = self.server.reserve_ids(2)
+        with self.assertRaises(ValueError):
+            self.server.add_reduction(first, "unknown", 1)
+        with self.assertRaises(ValueError):
+            self.server.add_reduction(second, "sum_int64", 0)
+
+    def test_invalid_reduction_returns_its_id(self) -> None:
+        server = Server(task_timeout=0.1, queue_ahead=1)
+        (reduction_id,) = server.reserve_ids(1)
+        self.assertIsNone(server.get_next_id())
+
+        with self.assertRaises(ValueError):
+            server.add_reduction(reduction_id, "unknown", 1)
+        self.assertEqual(reduction_id, server.get_next_id())
+        server.stop()
+
+    def test_custom_reducer(self) -> None:
+        server = Server(task_timeout=0.1, reducers={"concat": lambda a, b: a + b})
+        (reduction_id, task_id) = server.reserve_ids(2)
+        server.add_reduction(reduction_id, "concat", 1)
+        server.add_graph([Task(task_id, b"", reduction=reduction_id)])
+        server.get_task()
+        server.set_result(Result(task_id, True, b"x"))
+
+        (result,) = server.get_results([reduction_id])
+        self.assertEqual(result and result.data, b"x")
+        server.stop()
+
+
+class TestArena(unittest.TestCase):
+    def test_dispatches_in_order(self) -> None:
+        server = Server(task_timeout=0.1, arena=True)
+        tasks = [Task(0, b"a", session="s"), Task(1, b"", affinity="k"), Task(2, b"", blobs=["x"])]
+        for task in tasks:
+            server.add_task(task)
+
+        self.assertEqual([server.get_task() for _ in tasks], tasks)
+        self.assertEqual(server.stats()["rte_queue_depth"], 0)
+        server.stop()
@@ -81,18 +81,45 @@ class TestServerWorker(unittest.TestCase):
             self.fail("No result available")
         self.assertEqual(result.data, b"test")
 
+    def wait_until_running(self, server: Server) -> None:
+        for _ in range(100):
+            if server.stats()["rte_tasks_in_flight"] == 1:
+                return
+            sleep(0.01)
+        self.fail("Task was not dispatched")
+
     def test_cancellable_task_with_cancel(self) -> None:
         worker = CancellableWorker(self.server, 0.05)
+        worker_thread = Thread(target=worker.run, args=(1,))
+        worker_thread.start()
 
         self.server.add_task(Task(0, b"test"))
+        self.wait_until_running(self.server)
         self.server.cancel_task(0)
-        worker.run(1)
+        worker_thread.join()
         result = self.server.get_results([0])[0]
 
         if result is None:
             self.fail("No result available")
         self.assertFalse(result.success)
 
+    def test_cancellation_is_pushed(self) -> None:
+        server = Server(task_timeout=60)
+        self.addCleanup(server.stop)
+        worker = CancellableWorker(server, 60)  # Would not poll before the task ends
+        worker_thread = Thread(target=worker.run, args=(1,))
+        worker_thread.start()
+
+        server.add_task(Task(0, b"test"))
+        self.wait_until_running(server)
+        server.cancel_tasks([0])
+        worker_thread.join()
+        result = server.get_results([0])[0]
+
+        if result is None:
+            self.fail("No result available")
+        self.assertFalse(result.success)
+
     def test_dying_worker(self) -> None:
         worker = DyingWorker(self.server, 0.05)
         worker_thread = Thread(target=worker.run, args=(1,))
@@ -1,7 +1,35 @@
+import struct
+import time
 import unittest
 from threading import Thread
-from rte import Server
-from .stubs import TrivialClient, TrivialWorker
+from typing import Optional, Union
+from rte import Server, BatchClient, Task, Result
+from rte.codecs import NumpyCodec, numpy
+from .stubs import TrivialClient, TrivialWorker, StragglingWorker
+
+
+class CancelingClient(BatchClient):
+    "Aborts the batch after the first result."
+
+    def on_result(self, result: Result) -> None:
+        super().on_result(result)
+        self.cancel_session()
+
+
+class PipelineClient(TrivialClient):
+    "Prefixes every task with '>' in a second stage on the server."
+
+    def on_request(self, task_id: int) -> Union[Task, list[Task], None]:
+        task: Optional[Task] = super().on_request(task_id)  # type: ignore[assignment]
+        if task is None:
+            return None
+        (second,) = self.reserve_ids(1)
+        return [task, Task(second, b">", dependencies=[task_id])]
+
+
+class DoublingWorker(TrivialWorker):
+    def execute_task(self, task):
+        return task * 2
 
 
 class TestSystem(unittest.TestCase):
@@ -78,3 +106,163 @@ class TestSystem(unittest.TestCase):
                     self.fail("Result is None")
                 self.assertEqual(result.success, True)
                 self.assertEqual(result.data, b"task")
+
+    def test_chunked_map(self) -> None:
+        server = Server(0.02)
+        client = BatchClient(server, 0.01)
+        tasks = [bytes([i]) for i in range(100)]
+        workers = [TrivialWorker(server, 0.01) for _ in range(3)]
+
+        worker_threads = [Thread(target=worker.run) for worker in workers]
+        for worker_thread in worker_threads:
+            worker_thread.start()
+
+        fixed = client.map(tasks, chunksize=7)
+        auto = client.map(tasks, chunksize="auto")
+        server.release_waiting_workers()
+        server.stop()
+        for worker_thread in worker_threads:
+            worker_thread.join()
+
+        self.assertEqual(fixed, tasks)
+        self.assertEqual(auto, tasks)
+
+    def test_speculative_execution(self) -> None:
+        server = Server(0.5)
+        client = BatchClient(server, 0.01, speculation=3)
+        tasks = [bytes([i]) for i in range(20)]
+        worker_threads = [
+            Thread(target=StragglingWorker(server, 0.01).run, args=(1,)),
+            Thread(target=TrivialWorker(server, 0.01).run),
+        ]
+        for worker_thread in worker_threads:
+            worker_thread.start()
+
+        start = time.perf_counter()
+        results = client.solve(tasks)
+        elapsed = time.perf_counter() - start
+        server.release_waiting_workers()
+        for worker_thread in worker_threads:
+            worker_thread.join()
+        server.stop()
+
+        self.assertEqual(results, tasks)
+        self.assertLess(elapsed, 0.9)
+
+    def test_timing_report(self) -> None:
+        server = Server(0.5)
+        client = BatchClient(server, 0.01, timed=True)
+        tasks = [bytes([i]) for i in range(20)]
+        worker_thread = Thread(target=TrivialWorker(server, 0.01).run)
+        worker_thread.start()
+
+        client.solve(tasks)
+        server.release_waiting_workers()
+        worker_thread.join()
+        server.stop()
+
+        report = client.timing_report()
+        self.assertEqual(["queue", "dispatch", "execute", "report", "collect"], list(report))
+        for phase in report.values():
+            self.assertEqual(20, phase["count"])
+            self.assertGreaterEqual(phase["p50"], 0.0)
+            self.assertLessEqual(phase["p50"], phase["p95"])
+            self.assertLessEqual(phase["p95"], phase["p99"])
+
+    def test_cancel_session(self) -> None:
+        server = Server(0.5, queue_ahead=5)
+        client = CancelingClient(server, 0.01)
+        tasks = [bytes([i]) for i in range(100)]
+        worker_thread = Thread(target=TrivialWorker(server, 0.01).run)
+        worker_thread.start()
+
+        results = client.solve(tasks)
+        server.release_waiting_workers()
+        worker_thread.join()
+        server.stop()
+
+        self.assertEqual(len(results), 100)
+        self.assertEqual(results[0], tasks[0])
+        self.assertIsNone(results[-1])
+        self.assertEqual(server.stats()["rte_queue_depth"], 0)
+
+    def test_pipeline(self) -> None:
+        server = Server(0.5)
+        client = PipelineClient(server, 0.01)
+        client.tasks = [bytes([i]) for i in range(20)]
+        worker_thread = Thread(target=TrivialWorker(server, 0.01).run)
+        worker_thread.start()
+
+        client.run()
+        server.release_waiting_workers()
+        worker_thread.join()
+        server.stop()
+
+        expected = [b">" + bytes([i]) for i in range(20)]
+        self.assertEqual(sorted(result.data for result in client.results), expected)
+        self.assertEqual(server.stats()["rte_pending_results"], 0)
+
+    def test_reduce(self) -> None:
+        server = Server(0.5)
+        client = BatchClient(server, 0.01)
+        worker_thread = Thread(target=TrivialWorker(server, 0.01).run)
+        worker_thread.start()
+
+        total = client.reduce([struct.pack("<q", i) for i in range(20)], "sum_int64")
+        server.release_waiting_workers()
+        worker_thread.join()
+        server.stop()
+
+        self.assertEqual(total, struct.pack("<q", sum(range(20))))
+        self.assertEqual(server.stats()["rte_pending_results"], 0)
+
+    def test_invalid_reduce_leaves_client_usable(self) -> None:
+        server = Server(0.5)
+        client = BatchClient(server, 0.01)
+        worker_thread = Thread(target=TrivialWorker(server, 0.01).run)
+        worker_thread.start()
+
+        self.assertIsNone(client.reduce([], "sum_int64"))
+        with self.assertRaises(ValueError):
+            client.reduce([b"task"], "unknown")
+        results = client.solve([b"task"])
+        server.release_waiting_workers()
+        worker_thread.join()
+        server.stop()
+
+        self.assertEqual(results, [b"task"])
+
+    @unittest.skipUnless(numpy is not None, "needs numpy")
+    def test_numpy_codec(self) -> None:
+        server = Server(0.5)
+        client = BatchClient(server, 0.01, codec=NumpyCodec())
+        worker_thread = Thread(target=DoublingWorker(server, 0.01, codec=NumpyCodec()).run)
+        worker_thread.start()
+
+        arrays = [numpy.full((2, 3), i, numpy.int32) for i in range(5)]
+        results = client.map(arrays, chunksize=2)
+        server.release_waiting_workers()
+        worker_thread.join()
+        server.stop()
+
+        for array, result in zip(arrays, results):
+            numpy.testing.assert_array_equal(result, array * 2)
+
+    def test_solve_iter_stopped_early(self) -> None:
+        server = Server(0.5, queue_ahead=8)
+        client = BatchClient(server, 0.01)
+        worker_thread = Thread(target=TrivialWorker(server, 0.01).run, args=(1,))
+        worker_thread.start()
+
+        def tasks():
+            while True:
+                yield b"task"
+
+        for _ in client.solve_iter(tasks(), max_in_flight=4):
+            break
+        worker_thread.join()
+
+        self.assertEqual(server.stats()["rte_queue_depth"], 0)
+        self.assertEqual(server.stats()["rte_tasks_in_flight"], 0)
+        self.assertEqual(client._pending_task_ids, set())  # pylint: disable=protected-access
+        server.stop()
@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+import unittest
+from threading import Thread
+from time import sleep
+from rte import Server, BatchClient, Tracer
+from .stubs import TrivialWorker
+
+
+class TestTracer(unittest.TestCase):
+    def setUp(self) -> None:
+        self.tracer = Tracer()
+
+    def test_span(self) -> None:
+        with self.tracer.span("execute", "worker", task=1):
+            sleep(0.01)
+        (event,) = [e for e in self.tracer.chrome_trace()["traceEvents"] if e["ph"] == "X"]
+        self.assertEqual(event["name"], "execute")
+        self.assertEqual(event["args"], {"task": 1})
+        self.assertGreaterEqual(event["dur"], 10_000)
+
+    def test_ring_buffer(self) -> None:
+        tracer = Tracer(capacity=3)
+        for i in range(5):
+            tracer.instant("queued", "server", task=i)
+        events = tracer.chrome_trace()["traceEvents"]
+        tasks = [e["args"]["task"] for e in events if e["ph"] == "i"]
+        self.assertEqual(tasks, [2, 3, 4])
+
+    def test_one_thread_per_track(self) -> None:
+        self.tracer.instant("queued", "server")
+        for track in ["worker a", "worker b", "worker a"]:
+            with self.tracer.span("execute", track):
+                pass
+        events = self.tracer.chrome_trace()["traceEvents"]
+        names = {e["tid"]: e["args"]["name"] for e in events if e["ph"] == "M"}
+        self.assertEqual(sorted(names.values()), ["server", "worker a", "worker b"])
+        for event in events:
+            if event["ph"] == "X":
+                self.assertTrue(names[event["tid"]].startswith("worker"))
+
+    def test_summary(self) -> None:
+        with self.tracer.span("get_task", "worker"):
+            sleep(0.02)
+        with self.tracer.span("execute", "worker"):
+            pass
+        summary = self.tracer.summary()["worker"]
+        self.assertGreater(summary["get_task"], summary["execute"])
+
+    def test_dump(self) -> None:
+        self.tracer.instant("queued", "server")
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "trace.json")
+            self.tracer.dump(path)
+            with open(path, encoding="utf-8") as file:
+                self.assertEqual(json.load(file), self.tracer.chrome_trace())
+
+
+class TestTracingSystem(unittest.TestCase):
+    def test_workers_and_server_are_traced(self) -> None:
+        tracer = Tracer()
+        server = Server(0.5, tracer=tracer)
+        client = BatchClient(server, 0.01)
+        workers = [TrivialWorker(server, 0.01, tracer=tracer) for _ in range(2)]
+        worker_threads = [Thread(target=worker.run) for worker in workers]
+        for worker_thread in worker_threads:
+            worker_thread.start()
+
+        client.solve([b"task"] * 10)
+        server.release_waiting_workers()
+        for worker_thread in worker_threads:
+            worker_thread.join()
+        server.stop()
+
+        summary = tracer.summary()
+        for worker in workers:
+            self.assertIn("get_task", summary[f"worker {worker.worker_id[:8]}"])
+        executed = sum(spans.get("execute", 0) > 0 for spans in summary.values())
+        self.assertGreaterEqual(executed, 1)
+        events = tracer.chrome_trace()["traceEvents"]
+        stored = [e for e in events if e["name"] == "stored"]
+        self.assertEqual(len(stored), 10)
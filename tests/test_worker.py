@@ -1,7 +1,10 @@
+import time
 import unittest
-from typing import Optional
+from typing import Iterator, Optional
 from rte import WorkerInterface, Task, Result
-from .stubs import TrivialWorker, LongRunningWorker, RaisingWorker, CancellableWorker
+from rte.chunking import pack, unpack_results
+from rte.codecs import PickleCodec
+from .stubs import TrivialWorker, LongRunningWorker, RaisingWorker, CancellableWorker, BlobWorker
 
 
 class FakeServer(WorkerInterface):
@@ -9,9 +12,19 @@ class FakeServer(WorkerInterface):
         self.result: Result
         self.refreshs = 0
         self.cancel = False
+        self.task = Task(0, b"task")
+        self.blob_requests = 0
 
-    def get_task(self) -> Optional[Task]:
-        return Task(0, b"task")
+    def register_worker(self, worker_id: str) -> None:
+        pass
+
+    def unregister_worker(self, worker_id: str) -> None:
+        pass
+
+    def get_task(
+        self, worker_id: Optional[str] = None, timeout: Optional[float] = None
+    ) -> Optional[Task]:
+        return self.task
 
     def set_result(self, result: Result) -> None:
         self.result = result
@@ -20,6 +33,23 @@ class FakeServer(WorkerInterface):
         self.refreshs += 1
         return self.cancel
 
+    def watch_cancellations(self, worker_id: str) -> Iterator[int]:
+        return iter(())
+
+    def get_blob(self, blob_id: str) -> Optional[bytes]:
+        self.blob_requests += 1
+        return b"blob" if blob_id == "blob_id" else None
+
+
+class DeadlineWorker(TrivialWorker):
+    def execute_task(self, task: bytes) -> bytes:
+        return str(self.time_left()).encode()
+
+
+class DictWorker(TrivialWorker):
+    def execute_task(self, task: dict) -> dict:
+        return {"sum": sum(task["values"])}
+
 
 class TestWorker(unittest.TestCase):
     def setUp(self) -> None:
@@ -30,6 +60,13 @@ class TestWorker(unittest.TestCase):
         worker.run(1)
         self.assertEqual(self.server.result.data, b"task")
 
+    def test_codec(self) -> None:
+        codec = PickleCodec()
+        self.server.task = Task(0, codec.encode({"values": [1, 2]}))
+        worker = DictWorker(self.server, 0.05, codec=codec)
+        worker.run(1)
+        self.assertEqual(codec.decode(self.server.result.data), {"sum": 3})
+
     def test_long_task_refreshes(self) -> None:
         worker = LongRunningWorker(self.server, 0.05)
         worker.run(1)
@@ -46,3 +83,49 @@ class TestWorker(unittest.TestCase):
         worker = CancellableWorker(self.server, 0.05)
         worker.run(1)
         self.assertFalse(self.server.result.success)
+
+    def test_result_carries_attempt(self) -> None:
+        self.server.task = Task(0, b"task", attempt=2)
+        worker = TrivialWorker(self.server, 0.05)
+        worker.run(1)
+        self.assertEqual(self.server.result.attempt, 2)
+
+    def test_skips_expired_task(self) -> None:
+        self.server.task = Task(0, b"task", deadline=time.monotonic() - 1)
+        worker = RaisingWorker(self.server, 0.05)
+        worker.run(1)
+        self.assertTrue(self.server.result.expired)
+
+    def test_time_left(self) -> None:
+        self.server.task = Task(0, b"task", deadline=time.monotonic() + 10)
+        worker = DeadlineWorker(self.server, 0.05)
+        worker.run(1)
+        self.assertGreater(float(self.server.result.data), 9)
+
+    def test_chunked_task(self) -> None:
+        self.server.task = Task(0, pack([b"a", b"b"]), chunked=True)
+        worker = TrivialWorker(self.server, 0.05)
+        worker.run(1)
+        results, _ = unpack_results(self.server.result.data)
+        self.assertEqual(results, [b"a", b"b"])
+
+    def test_chunked_task_fails_items(self) -> None:
+        self.server.task = Task(0, pack([b"a", b"b"]), chunked=True)
+        worker = RaisingWorker(self.server, 0.05)
+        worker.run(1)
+        self.assertTrue(self.server.result.success)
+        results, _ = unpack_results(self.server.result.data)
+        self.assertEqual(results, [None, None])
+
+    def test_blob(self) -> None:
+        self.server.task = Task(0, b"blob_id", blobs=["blob_id"])
+        worker = BlobWorker(self.server, 0.05)
+        worker.run(2)
+        self.assertEqual(self.server.result.data, b"blob")
+        self.assertEqual(self.server.blob_requests, 1)
+
+    def test_missing_blob(self) -> None:
+        self.server.task = Task(0, b"missing", blobs=["missing"])
+        worker = BlobWorker(self.server, 0.05)
+        worker.run(1)
+        self.assertFalse(self.server.result.success)